@@ -12,35 +12,69 @@ __version__ = "1.1.7"
 __author__ = "PyCDN Team"
 __description__ = "Revolutionary CDN-based Python package delivery with hybrid import system"
 
-from .client import (
+import importlib
+
+# Public names resolved on first access (PEP 562), so a client-only program
+# never pays for FastAPI/uvicorn and nothing heavy loads at import time
+_lazy_attributes = {
     # Core client functionality
-    CDNClient, 
-    pkg,
-    
+    "CDNClient": ".client",
+    "AsyncCDNClient": ".client",
+    "pkg": ".client",
+
     # Lazy loading system
-    LazyPackage,
-    LazyModule,
-    LazyFunction, 
-    LazyClass,
-    LazyInstance,
-    
+    "LazyPackage": ".client",
+    "LazyModule": ".client",
+    "LazyFunction": ".client",
+    "LazyClass": ".client",
+    "LazyInstance": ".client",
+
     # Hybrid import system - unified natural & classic syntax
-    register_hybrid_cdn,
-    unregister_hybrid_cdn,
-    get_hybrid_mappings,
-    clear_hybrid_mappings,
-    install_hybrid_finder,
-    uninstall_hybrid_finder,
-    HybridCDNProxy,
-    
+    "register_hybrid_cdn": ".client",
+    "unregister_hybrid_cdn": ".client",
+    "get_hybrid_mappings": ".client",
+    "clear_hybrid_mappings": ".client",
+    "install_hybrid_finder": ".client",
+    "uninstall_hybrid_finder": ".client",
+    "HybridCDNProxy": ".client",
+
     # Legacy compatibility (for backward compatibility)
-    register_cdn_client,
-    unregister_cdn_client, 
-    get_cdn_mappings,
-    clear_cdn_mappings
-)
+    "register_cdn_client": ".client",
+    "unregister_cdn_client": ".client",
+    "get_cdn_mappings": ".client",
+    "clear_cdn_mappings": ".client",
 
-from .server import CDNServer, PackageDeployer
+    # Server components
+    "CDNServer": ".server",
+    "PackageDeployer": ".server",
+
+    # Result serialization
+    "register_codec": ".utils",
+}
+
+_lazy_submodules = {"client", "server", "utils", "cli"}
+
+
+def __getattr__(name):
+    """Import submodules and their public names on first access."""
+    if name in _lazy_submodules:
+        return importlib.import_module(f".{name}", __name__)
+
+    if name == "connect":
+        # Alternative name for pkg()
+        value = __getattr__("pkg")
+    elif name in _lazy_attributes:
+        module = importlib.import_module(_lazy_attributes[name], __name__)
+        value = getattr(module, name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_attributes) | _lazy_submodules | {"connect"})
 
 # Export everything for easy access
 __all__ = [
@@ -51,6 +85,7 @@ __all__ = [
     
     # Core client
     "CDNClient",
+    "AsyncCDNClient",
     "pkg",
     
     # Lazy loading system  
@@ -77,12 +112,12 @@ __all__ = [
     
     # Server components
     "CDNServer",
-    "PackageDeployer"
+    "PackageDeployer",
+    
+    # Result serialization
+    "register_codec"
 ]
 
-# Convenience shortcuts
-connect = pkg  # Alternative name for pkg()
-
 def info():
     """Display PyCDN information and capabilities."""
     return {
@@ -91,6 +126,7 @@ def info():
         "features": [
             "🎯 Classic access: cdn.openai.OpenAI()",
             "🌟 Natural imports: from cdn.openai import OpenAI", 
+            "🔀 Async namespace: await cdn.aio.numpy.sum(x)",
             "⚡ Lazy loading with intelligent caching",
             "📊 Built-in profiling and performance monitoring",
             "🔄 Package aliasing and reload capabilities",
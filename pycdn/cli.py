@@ -7,7 +7,6 @@ import sys
 import json
 from typing import Any, Dict, List, Optional
 
-from .server.core import CDNServer, PackageDeployer
 from .client.core import CDNClient, connect
 from .utils.common import set_debug_mode, get_version
 
@@ -58,6 +57,7 @@ Examples:
     start_parser.add_argument("--host", default="localhost", help="Server host")
     start_parser.add_argument("--port", type=int, default=8000, help="Server port")
     start_parser.add_argument("--allowed-packages", nargs="*", help="Allowed packages")
+    start_parser.add_argument("--http2", action="store_true", help="Serve HTTP/2 via hypercorn")
     
     # Client commands
     client_parser = subparsers.add_parser("client", help="Client operations")
@@ -86,6 +86,9 @@ Examples:
 
 def handle_server_start(args: argparse.Namespace) -> int:
     """Handle server start command."""
+    # Server stack (FastAPI, uvicorn) is only loaded for server commands
+    from .server.core import CDNServer
+
     try:
         print(f"Starting PyCDN server on {args.host}:{args.port}")
         
@@ -93,7 +96,8 @@ def handle_server_start(args: argparse.Namespace) -> int:
             host=args.host,
             port=args.port,
             debug=args.debug,
-            allowed_packages=args.allowed_packages
+            allowed_packages=args.allowed_packages,
+            http2=args.http2
         )
         
         print(f"Server running at http://{args.host}:{args.port}")
@@ -164,6 +168,8 @@ def handle_client_stats(args: argparse.Namespace) -> int:
 
 def handle_deploy(args: argparse.Namespace) -> int:
     """Handle deploy command."""
+    from .server.core import PackageDeployer
+
     try:
         deployer = PackageDeployer(args.url)
         
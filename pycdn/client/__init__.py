@@ -6,6 +6,11 @@ Provides both classic CDN access (cdn.package.Class) and natural imports
 """
 
 from .core import CDNClient, pkg
+from .aio import AsyncCDNClient
+from .resilience import RetryPolicy, RetryBudget, CircuitBreaker, CircuitOpenError
+from .hedging import HedgingPolicy
+from .balancer import Endpoint, EndpointPool
+from .rpc import RpcChannel
 from .lazy_loader import LazyPackage, LazyModule, LazyFunction, LazyClass, LazyInstance
 from .import_hook import (
     # Hybrid import system
@@ -26,8 +31,19 @@ from .import_hook import (
 __all__ = [
     # Core client
     'CDNClient',
+    'AsyncCDNClient',
     'pkg',
     
+    # Resilience policies
+    'RetryPolicy',
+    'RetryBudget',
+    'CircuitBreaker',
+    'CircuitOpenError',
+    'HedgingPolicy',
+    'Endpoint',
+    'EndpointPool',
+    'RpcChannel',
+    
     # Lazy loading classes
     'LazyPackage',
     'LazyModule', 
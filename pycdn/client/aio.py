@@ -0,0 +1,613 @@
+"""
+Async proxy layer for the hybrid import system.
+
+Mirrors the synchronous proxies in import_hook.py, but every remote call
+returns an awaitable served by a shared AsyncCDNClient:
+
+    from cdn.aio.openai import OpenAI
+    client = OpenAI(api_key="...")
+    response = await client.chat.completions.create(...)
+
+    total = await cdn.aio.numpy.sum([1, 2, 3])
+
+Attribute access never touches the network, so resolving symbols is safe
+inside a running event loop.
+"""
+
+import sys
+import time
+import asyncio
+from typing import Any, Dict, List, Optional
+import httpx
+
+from ..utils.common import serialize_args, deserialize_result, log_debug
+from ..utils.transfer import ChecksumError, TransferError, is_spilled
+from .import_hook import PyCDNRemoteError
+from .resilience import CircuitOpenError
+from .credentials import EXPIRED_ERROR_TYPE
+from .rpc import RpcUnavailable
+from .transfer import ChunkedDownload, RESUME_ATTEMPTS, merge_envelope, resume_delay
+
+
+class AsyncCDNClient:
+    """
+    Async transport sharing configuration and response cache with a CDNClient.
+    """
+
+    def __init__(self, cdn_client: "CDNClient"):
+        """
+        Initialize async transport.
+
+        Args:
+            cdn_client: Synchronous client providing URL, headers and cache
+        """
+        self._cdn_client = cdn_client
+        self.url = cdn_client.url
+        # httpx connection pools are tied to the loop that opened them
+        self._http_clients: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """HTTP client bound to the running event loop."""
+        loop = asyncio.get_running_loop()
+        client = self._http_clients.get(loop)
+        if client is None:
+            # A closed loop's client cannot be closed any more; dropping it
+            # lets its sockets be collected instead of piling up
+            for closed in [other for other in self._http_clients if other.is_closed()]:
+                del self._http_clients[closed]
+            client = self._http_clients[loop] = httpx.AsyncClient(
+                timeout=self._cdn_client.timeout,
+                headers=self._cdn_client.headers,
+                follow_redirects=True,
+                **self._cdn_client.transport_options(asynchronous=True)
+            )
+        return client
+
+    async def _execute_request(
+        self,
+        package_name: str,
+        function_name: str,
+        serialized_args: Dict[str, str],
+        idempotent: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Execute a remote function request without blocking the event loop.
+
+        Args:
+            package_name: Name of the package
+            function_name: Name of the function
+            serialized_args: Serialized function arguments
+            idempotent: Whether the call may safely be executed twice
+
+        Returns:
+            Response dictionary
+        """
+        client = self._cdn_client
+        client._connection_stats["requests_made"] += 1
+
+        cache_key = client._get_cache_key(package_name, function_name, serialized_args)
+        if cache_key in client._response_cache:
+            client._connection_stats["cache_hits"] += 1
+            log_debug(f"Cache hit for {package_name}.{function_name}")
+            return client._response_cache[cache_key]
+
+        client._connection_stats["cache_misses"] += 1
+
+        request_data = {
+            "package_name": package_name,
+            "function_name": function_name,
+            **serialized_args
+        }
+
+        result = await self._send_with_retries(
+            request_data, f"{package_name}.{function_name}", idempotent
+        )
+
+        if result.get("success", True):
+            client._cache_response(cache_key, result)
+
+        return result
+
+    async def _send_with_retries(
+        self,
+        request_data: Dict[str, Any],
+        label: str,
+        idempotent: bool
+    ) -> Dict[str, Any]:
+        """Async counterpart of CDNClient._send_with_retries."""
+        client = self._cdn_client
+        client.retry_budget.record_request()
+        tried = []
+        attempt = 0
+
+        while True:
+            attempt += 1
+            endpoint = client._select_endpoint(request_data["package_name"], tried)
+            try:
+                client.circuit_breakers.get(endpoint.url).before_call()
+                result = await self._send_attempt(request_data, endpoint, idempotent)
+            except CircuitOpenError:
+                client._connection_stats["circuit_rejections"] += 1
+                client._connection_stats["errors"] += 1
+                raise
+            except Exception as e:
+                tried.append(endpoint)
+                log_debug(f"Async request attempt {attempt} for {label} on {endpoint.url} failed: {e}")
+                delay = client.retry_policy.next_delay(e, attempt, idempotent, client.retry_budget)
+                if delay is None:
+                    client._connection_stats["errors"] += 1
+                    raise ConnectionError(f"Failed to execute {label}: {e}") from e
+                client._connection_stats["retries"] += 1
+                await asyncio.sleep(delay)
+            else:
+                return result
+
+    async def _send_attempt(self, request_data: Dict[str, Any], endpoint: "Endpoint",
+                            idempotent: bool) -> Dict[str, Any]:
+        """Make one attempt, hedged when the call is idempotent and hedging is on."""
+        if self._cdn_client.hedging is not None and idempotent:
+            return await self._send_hedged(request_data, endpoint)
+        return await self._send_once(request_data, endpoint)
+
+    async def _send_once(self, request_data: Dict[str, Any], endpoint: "Endpoint") -> Dict[str, Any]:
+        """Make a single execute request to one endpoint."""
+        client = self._cdn_client
+        breaker = client.circuit_breakers.get(endpoint.url)
+        channel = client._rpc_channel(endpoint)
+        start = time.perf_counter()
+        try:
+            with client.endpoints.track(endpoint):
+                result = None
+                if channel is not None:
+                    try:
+                        result = await channel.call_async(request_data, timeout=client.timeout)
+                        client._connection_stats["rpc_calls"] += 1
+                    except RpcUnavailable as e:
+                        client._rpc_unavailable(endpoint, e)
+                if result is None:
+                    response = await self.http_client.post(f"{endpoint.url}/execute",
+                                                           **client._execute_body(request_data, endpoint))
+                    response.raise_for_status()
+                    client._note_features(endpoint, response)
+                    result = client._execute_result(response)
+        except Exception as e:
+            client._record_outcome(breaker, e)
+            raise
+        breaker.record_success()
+        client._record_latency(time.perf_counter() - start)
+        if is_spilled(result):
+            result = await self._fetch_spilled(endpoint, result)
+        return result
+
+    async def _fetch_spilled(self, endpoint: "Endpoint", envelope: Dict[str, Any]) -> Dict[str, Any]:
+        """Async counterpart of CDNClient._fetch_spilled."""
+        url = f"{endpoint.url}/results/{envelope['transfer']['id']}"
+        failures = 0
+        with ChunkedDownload(envelope["transfer"]) as download:
+            while not download.complete:
+                position = download.position
+                try:
+                    async with self.http_client.stream("GET", url,
+                                                       headers=download.range_header()) as response:
+                        download.check_response(response.status_code,
+                                                response.headers.get("content-range"))
+                        async for data in response.aiter_bytes():
+                            download.write(data)
+                except (httpx.TransportError, ChecksumError) as e:
+                    failures = 1 if download.position > position else failures + 1
+                    if failures > RESUME_ATTEMPTS:
+                        raise TransferError(f"Download of result from {endpoint.url} failed: {e}") from e
+                    log_debug(f"Resuming result download at byte {download.position}: {e}")
+                    await asyncio.sleep(resume_delay(failures))
+            fields = download.fields()
+        try:
+            await self.http_client.delete(url)
+        except httpx.HTTPError as e:
+            log_debug(f"Could not delete spilled result: {e}")
+        return merge_envelope(envelope, fields)
+
+    async def _send_hedged(self, request_data: Dict[str, Any], endpoint: "Endpoint") -> Dict[str, Any]:
+        """Race a primary request against a delayed hedge, cancelling the loser."""
+        client = self._cdn_client
+        primary = asyncio.ensure_future(self._send_once(request_data, endpoint))
+        done, _ = await asyncio.wait({primary}, timeout=client.hedging.hedge_delay())
+        if done:
+            return primary.result()
+
+        if not client.retry_budget.try_acquire():
+            return await primary
+
+        client._connection_stats["hedges_sent"] += 1
+        hedge_endpoint = client._select_endpoint(exclude=[endpoint])
+        hedge = asyncio.ensure_future(self._send_once(request_data, hedge_endpoint))
+        pending = {primary, hedge}
+        error = None
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            client._connection_stats["hedges_won"] += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            # Cancelling aborts the in-flight HTTP exchange of the loser
+            for task in pending:
+                task.cancel()
+
+    async def call_function(self, package_name: str, function_name: str,
+                            args: tuple = (), kwargs: dict = None,
+                            idempotent: bool = False) -> Any:
+        """Call a function on the CDN server."""
+        if kwargs is None:
+            kwargs = {}
+
+        call_args, call_kwargs, used_handles = await self._substitute_credentials(args, kwargs)
+        serialized_args = serialize_args(*call_args, **call_kwargs)
+        result = await self._execute_request(package_name, function_name, serialized_args,
+                                             idempotent=idempotent)
+
+        if used_handles and result.get("error_type") == EXPIRED_ERROR_TYPE:
+            self._cdn_client.credentials.invalidate()
+            call_args, call_kwargs, _ = await self._substitute_credentials(args, kwargs)
+            serialized_args = serialize_args(*call_args, **call_kwargs)
+            result = await self._execute_request(package_name, function_name, serialized_args,
+                                                 idempotent=idempotent)
+
+        if result.get("stdout"):
+            print(result["stdout"], end="")
+        if result.get("stderr"):
+            print(result["stderr"], end="", file=sys.stderr)
+
+        return deserialize_result(result)
+
+    async def _substitute_credentials(self, args: tuple, kwargs: dict):
+        """Swap secrets for credential handles without blocking the event loop."""
+        registry = self._cdn_client.credentials
+        if registry is None:
+            return args, kwargs, False
+
+        found = registry.find_secrets(args, kwargs)
+        if not found:
+            return args, kwargs, False
+        missing = registry.missing(found)
+        if missing:
+            # Registration is rare and uses the blocking client, so run it off-loop
+            await asyncio.get_running_loop().run_in_executor(None, registry.register_all, missing)
+        return registry.apply(args, kwargs)
+
+    async def aclose(self) -> None:
+        """Close the async HTTP clients of all event loops that used this client."""
+        current = asyncio.get_running_loop()
+        clients, self._http_clients = self._http_clients, {}
+        for loop, client in clients.items():
+            if loop is current:
+                await client.aclose()
+            elif loop.is_running():
+                # Connections must be closed on the loop that opened them
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(client.aclose(), loop))
+            elif not loop.is_closed():
+                log_debug("Async HTTP client left open: its event loop is not running")
+
+    async def __aenter__(self):
+        """Async context manager entry."""
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Async context manager exit."""
+        await self.aclose()
+
+
+class AsyncHybridCDNProxy:
+    """
+    Module proxy for the cdn.aio namespace.
+
+    Registers itself in sys.modules so 'from cdn.aio.package import Symbol'
+    resolves through the regular hybrid meta path finder.
+    """
+
+    def __init__(self, async_client: AsyncCDNClient, module_path: str = "",
+                 prefix: str = "cdn"):
+        object.__setattr__(self, '_async_client', async_client)
+        object.__setattr__(self, '_module_path', module_path)
+        object.__setattr__(self, '_prefix', prefix)
+        object.__setattr__(self, '_cached_attrs', {})
+
+        full_module_name = f"{prefix}.aio.{module_path}" if module_path else f"{prefix}.aio"
+
+        # Package attributes for the Python import system
+        object.__setattr__(self, '__path__', [])
+        object.__setattr__(self, '__package__', full_module_name)
+        object.__setattr__(self, '__name__', full_module_name)
+        object.__setattr__(self, '__spec__', None)
+
+        sys.modules[full_module_name] = self
+        log_debug(f"Registered async proxy for {full_module_name}")
+
+    def __getattr__(self, name: str) -> Any:
+        """Resolve symbols with the same heuristics as the sync fallback path."""
+        if name.startswith('_'):
+            raise AttributeError(f"'{self.__name__}' has no attribute '{name}'")
+
+        if name in self._cached_attrs:
+            return self._cached_attrs[name]
+
+        if self._module_path:
+            full_path = f"{self._module_path}.{name}"
+            package_name = self._module_path
+        else:
+            full_path = name
+            package_name = name
+
+        if not self._module_path:
+            # Top-level package access (e.g., cdn.aio.openai)
+            result = AsyncHybridCDNProxy(self._async_client, full_path, self._prefix)
+        elif name[0].isupper():
+            result = AsyncCDNClassProxy(self._async_client, package_name, name, full_path)
+        elif name.islower():
+            result = AsyncCDNFunctionProxy(self._async_client, package_name, name, full_path)
+        else:
+            result = AsyncCDNCallableProxy(self._async_client, package_name, name, full_path)
+
+        self._cached_attrs[name] = result
+        return result
+
+    def __dir__(self) -> List[str]:
+        """Return resolved attributes."""
+        return sorted(self._cached_attrs.keys())
+
+    def __repr__(self):
+        path = self._module_path or "aio"
+        return f"<AsyncHybridCDNModule '{path}' from '{self._async_client.url}'>"
+
+
+class AsyncCDNFunctionProxy:
+    """Async proxy for remote CDN functions."""
+
+    def __init__(self, async_client: AsyncCDNClient, package_name: str,
+                 function_name: str, full_path: str):
+        self._async_client = async_client
+        self._package_name = package_name
+        self._function_name = function_name
+        self._full_path = full_path
+        self._call_count = 0
+        self._total_time = 0
+
+        self.__name__ = function_name
+        self.__qualname__ = full_path
+        self.__module__ = package_name
+
+    async def __call__(self, *args, **kwargs):
+        """Execute the remote function with timing."""
+        start_time = time.time()
+        self._call_count += 1
+
+        try:
+            return await self._async_client.call_function(
+                self._package_name,
+                self._function_name,
+                args,
+                kwargs
+            )
+        finally:
+            self._total_time += time.time() - start_time
+
+    def __repr__(self):
+        avg_time = self._total_time / max(1, self._call_count)
+        return f"<AsyncCDNFunction '{self._full_path}' calls={self._call_count} avg={avg_time:.3f}s>"
+
+
+class AsyncCDNClassProxy:
+    """Async proxy for remote CDN classes."""
+
+    def __init__(self, async_client: AsyncCDNClient, package_name: str,
+                 class_name: str, full_path: str):
+        self._async_client = async_client
+        self._package_name = package_name
+        self._class_name = class_name
+        self._full_path = full_path
+        self._instance_count = 0
+
+        self.__name__ = class_name
+        self.__qualname__ = full_path
+        self.__module__ = package_name
+
+    def __call__(self, *args, **kwargs) -> "AsyncCDNInstanceProxy":
+        """
+        Create an instance proxy.
+
+        Construction is local; 'await OpenAI(...)' additionally verifies
+        that the remote class accepts the arguments.
+        """
+        self._instance_count += 1
+        return AsyncCDNInstanceProxy(
+            self._async_client,
+            self._package_name,
+            self._class_name,
+            self._full_path,
+            args,
+            kwargs,
+            instance_id=f"{self._full_path}_{self._instance_count}"
+        )
+
+    def __getattr__(self, name: str):
+        """Access class methods/attributes."""
+        if name.startswith('_'):
+            raise AttributeError(f"'{self._class_name}' has no attribute '{name}'")
+
+        return AsyncCDNCallableProxy(
+            self._async_client,
+            self._package_name,
+            f"{self._class_name}.{name}",
+            f"{self._full_path}.{name}"
+        )
+
+    def __repr__(self):
+        return f"<AsyncCDNClass '{self._full_path}' instances={self._instance_count}>"
+
+
+class AsyncCDNInstanceProxy:
+    """Async proxy for instances of remote CDN classes."""
+
+    def __init__(self, async_client: AsyncCDNClient, package_name: str, class_name: str,
+                 full_path: str, init_args: tuple, init_kwargs: dict, instance_id: str):
+        object.__setattr__(self, '_async_client', async_client)
+        object.__setattr__(self, '_package_name', package_name)
+        object.__setattr__(self, '_class_name', class_name)
+        object.__setattr__(self, '_full_path', full_path)
+        object.__setattr__(self, '_init_args', init_args)
+        object.__setattr__(self, '_init_kwargs', init_kwargs)
+        object.__setattr__(self, '_instance_id', instance_id)
+        object.__setattr__(self, '_method_cache', {})
+
+    async def _create_instance(self) -> "AsyncCDNInstanceProxy":
+        """Create the instance on the remote server."""
+        try:
+            await self._async_client.call_function(
+                self._package_name,
+                self._class_name,
+                self._init_args,
+                self._init_kwargs
+            )
+            log_debug(f"Created remote instance: {self._instance_id}")
+        except Exception as e:
+            raise PyCDNRemoteError(
+                f"Failed to create instance of {self._class_name}: {e}",
+                package_name=self._package_name
+            )
+        return self
+
+    def __await__(self):
+        return self._create_instance().__await__()
+
+    def __getattr__(self, name: str):
+        """Access instance methods/attributes with caching."""
+        if name.startswith('_'):
+            raise AttributeError(f"'{self._class_name}' instance has no attribute '{name}'")
+
+        if name in self._method_cache:
+            return self._method_cache[name]
+
+        method_proxy = AsyncCDNMethodProxy(
+            self._async_client,
+            self._package_name,
+            self._class_name,
+            name,
+            self._instance_id,
+            instance_proxy=self
+        )
+
+        self._method_cache[name] = method_proxy
+        return method_proxy
+
+    def __repr__(self):
+        return f"<AsyncCDNInstance '{self._full_path}' id={self._instance_id}>"
+
+
+class AsyncCDNMethodProxy:
+    """Async proxy for remote instance methods with chained attribute support."""
+
+    def __init__(self, async_client: AsyncCDNClient, package_name: str, class_name: str,
+                 method_name: str, instance_id: str, instance_proxy=None):
+        self._async_client = async_client
+        self._package_name = package_name
+        self._class_name = class_name
+        self._method_name = method_name
+        self._instance_id = instance_id
+        self._call_count = 0
+        self._instance_proxy = instance_proxy
+
+    async def __call__(self, *args, **kwargs):
+        """Execute the remote method using the server's instance call mechanism."""
+        self._call_count += 1
+
+        init_args = self._instance_proxy._init_args if self._instance_proxy else []
+        init_kwargs = self._instance_proxy._init_kwargs if self._instance_proxy else {}
+
+        call_data = {
+            "class_name": self._class_name,
+            "init_args": list(init_args),
+            "init_kwargs": init_kwargs,
+            "method_path": self._method_name,
+            "method_args": list(args),
+            "method_kwargs": kwargs
+        }
+
+        return await self._async_client.call_function(
+            self._package_name,
+            "__instance_call__",
+            (call_data,),
+            {}
+        )
+
+    def __getattr__(self, name: str):
+        """Support chained attribute access like client.chat.completions.create()."""
+        if name.startswith('_'):
+            raise AttributeError(f"'{self.__class__.__name__}' has no attribute '{name}'")
+
+        return AsyncCDNMethodProxy(
+            self._async_client,
+            self._package_name,
+            self._class_name,
+            f"{self._method_name}.{name}",
+            self._instance_id,
+            instance_proxy=self._instance_proxy
+        )
+
+    def __repr__(self):
+        return f"<AsyncCDNMethod '{self._class_name}.{self._method_name}' calls={self._call_count}>"
+
+
+class AsyncCDNCallableProxy:
+    """Async proxy for generic CDN callables with chained attribute support."""
+
+    def __init__(self, async_client: AsyncCDNClient, package_name: str,
+                 callable_name: str, full_path: str):
+        self._async_client = async_client
+        self._package_name = package_name
+        self._callable_name = callable_name
+        self._full_path = full_path
+        self._call_count = 0
+
+    async def __call__(self, *args, **kwargs):
+        """Execute the remote callable."""
+        self._call_count += 1
+        return await self._async_client.call_function(
+            self._package_name,
+            self._callable_name,
+            args,
+            kwargs
+        )
+
+    def __getattr__(self, name: str):
+        """Support chained attribute access for nested callables."""
+        if name.startswith('_'):
+            raise AttributeError(f"'{self.__class__.__name__}' has no attribute '{name}'")
+
+        return AsyncCDNCallableProxy(
+            self._async_client,
+            self._package_name,
+            f"{self._callable_name}.{name}",
+            f"{self._full_path}.{name}"
+        )
+
+    def __repr__(self):
+        return f"<AsyncCDNCallable '{self._full_path}' calls={self._call_count}>"
+
+
+def create_async_root(cdn_client: "CDNClient", prefix: str = "cdn") -> AsyncHybridCDNProxy:
+    """
+    Create the cdn.aio namespace root for a client.
+
+    Args:
+        cdn_client: Synchronous CDN client whose async transport is shared
+        prefix: Import prefix of the owning hybrid root
+
+    Returns:
+        AsyncHybridCDNProxy registered as '<prefix>.aio'
+    """
+    return AsyncHybridCDNProxy(cdn_client.async_client, "", prefix)
@@ -0,0 +1,237 @@
+"""
+Endpoint selection for clients talking to several PyCDN servers.
+
+An EndpointPool tracks in-flight requests and EWMA latency per server,
+refreshes health in a background probe thread and routes each call with
+least-outstanding-requests or latency-weighted selection. Optional
+consistent-hash affinity pins a package to one node so its warm caches
+and remote instances are reused.
+"""
+
+import bisect
+import hashlib
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional
+
+from ..utils.common import log_debug
+
+
+STRATEGIES = ("least_outstanding", "ewma")
+
+
+class Endpoint:
+    """
+    A single server and its live routing statistics.
+    """
+
+    def __init__(self, url: str, alpha: float = 0.3):
+        """
+        Initialize endpoint.
+
+        Args:
+            url: Server base URL
+            alpha: Weight of the newest sample in the latency EWMA
+        """
+        self.url = url.rstrip('/')
+        self.alpha = alpha
+        self.outstanding = 0
+        self.ewma: Optional[float] = None
+        self.healthy = True
+        self.requests = 0
+        self.failures = 0
+
+    def observe(self, seconds: float) -> None:
+        """Fold a latency sample into the EWMA."""
+        if self.ewma is None:
+            self.ewma = seconds
+        else:
+            self.ewma = self.alpha * seconds + (1 - self.alpha) * self.ewma
+
+    def score(self) -> float:
+        """Expected wait: latency weighted by queue depth (unprobed endpoints go first)."""
+        return (self.ewma or 0.0) * (self.outstanding + 1)
+
+    def snapshot(self) -> Dict[str, object]:
+        """Routing statistics for get_stats()."""
+        return {
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "ewma_ms": round(self.ewma * 1000, 3) if self.ewma is not None else None,
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+    def __repr__(self) -> str:
+        return f"Endpoint({self.url!r})"
+
+
+class EndpointPool:
+    """
+    Load balancer over a fixed list of endpoints.
+    """
+
+    def __init__(self, urls: Iterable[str], strategy: str = "least_outstanding",
+                 affinity: bool = False, probe_interval: float = 30.0,
+                 replicas: int = 64):
+        """
+        Initialize endpoint pool.
+
+        Args:
+            urls: Server base URLs; the first is the primary
+            strategy: "least_outstanding" or "ewma"
+            affinity: Route each package to a stable node by consistent hashing
+            probe_interval: Seconds between background health probes
+            replicas: Virtual nodes per endpoint on the hash ring
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown balancing strategy '{strategy}', expected one of {STRATEGIES}")
+
+        self.endpoints: List[Endpoint] = []
+        for url in urls:
+            if all(e.url != url.rstrip('/') for e in self.endpoints):
+                self.endpoints.append(Endpoint(url))
+        if not self.endpoints:
+            raise ValueError("At least one endpoint URL is required")
+
+        self.strategy = strategy
+        self.affinity = affinity
+        self.probe_interval = probe_interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._probe_thread: Optional[threading.Thread] = None
+
+        self._ring: List[int] = []
+        self._ring_nodes: Dict[int, Endpoint] = {}
+        for endpoint in self.endpoints:
+            for i in range(replicas):
+                point = _hash(f"{endpoint.url}#{i}")
+                self._ring_nodes[point] = endpoint
+                self._ring.append(point)
+        self._ring.sort()
+
+    @property
+    def primary(self) -> Endpoint:
+        """First configured endpoint."""
+        return self.endpoints[0]
+
+    def __len__(self) -> int:
+        return len(self.endpoints)
+
+    def select(self, package_name: Optional[str] = None, exclude: Iterable[Endpoint] = (),
+               available: Optional[Callable[[Endpoint], bool]] = None) -> Endpoint:
+        """
+        Pick an endpoint for a call.
+
+        Args:
+            package_name: Package being called, used for affinity
+            exclude: Endpoints already tried for this call
+            available: Extra filter, e.g. "circuit not open"
+
+        Returns:
+            Chosen endpoint
+        """
+        if len(self.endpoints) == 1:
+            return self.endpoints[0]
+
+        excluded = set(exclude)
+        candidates = [e for e in self.endpoints
+                      if e not in excluded and e.healthy and (available is None or available(e))]
+        if not candidates:
+            # Everything looks down: prefer untried endpoints, then anything
+            candidates = [e for e in self.endpoints if e not in excluded] or self.endpoints
+
+        if self.affinity and package_name:
+            return self._ring_lookup(package_name, candidates)
+
+        with self._lock:
+            if self.strategy == "ewma":
+                best = min(e.score() for e in candidates)
+                candidates = [e for e in candidates if e.score() == best]
+            else:
+                fewest = min(e.outstanding for e in candidates)
+                candidates = [e for e in candidates if e.outstanding == fewest]
+        return random.choice(candidates)
+
+    def _ring_lookup(self, key: str, candidates: List[Endpoint]) -> Endpoint:
+        """Walk the hash ring clockwise to the first candidate endpoint."""
+        allowed = set(candidates)
+        start = bisect.bisect(self._ring, _hash(key))
+        for offset in range(len(self._ring)):
+            endpoint = self._ring_nodes[self._ring[(start + offset) % len(self._ring)]]
+            if endpoint in allowed:
+                return endpoint
+        return candidates[0]
+
+    @contextmanager
+    def track(self, endpoint: Endpoint):
+        """Count a request as outstanding and record its latency on success."""
+        start = time.perf_counter()
+        with self._lock:
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+        try:
+            yield endpoint
+        except Exception:
+            with self._lock:
+                endpoint.failures += 1
+            raise
+        else:
+            with self._lock:
+                endpoint.observe(time.perf_counter() - start)
+        finally:
+            with self._lock:
+                endpoint.outstanding -= 1
+
+    def probe(self, http_get: Callable[[str], object]) -> None:
+        """
+        Check /health on every endpoint once.
+
+        Args:
+            http_get: Callable performing a GET and returning an httpx.Response
+        """
+        for endpoint in self.endpoints:
+            start = time.perf_counter()
+            try:
+                response = http_get(f"{endpoint.url}/health")
+                healthy = response.status_code == 200
+            except Exception as e:
+                log_debug(f"Health probe for {endpoint.url} failed: {e}")
+                healthy = False
+            with self._lock:
+                endpoint.healthy = healthy
+                if healthy:
+                    endpoint.observe(time.perf_counter() - start)
+
+    def start_probing(self, http_get: Callable[[str], object]) -> None:
+        """Probe endpoints in a daemon thread every probe_interval seconds."""
+        if len(self.endpoints) < 2 or self._probe_thread is not None or self._stop.is_set():
+            return
+
+        def loop():
+            while not self._stop.is_set():
+                self.probe(http_get)
+                self._stop.wait(self.probe_interval)
+
+        with self._lock:
+            if self._probe_thread is not None:
+                return
+            self._probe_thread = threading.Thread(target=loop, name="pycdn-probe", daemon=True)
+        self._probe_thread.start()
+
+    def stop_probing(self) -> None:
+        """Stop the background probe thread."""
+        self._stop.set()
+        self._probe_thread = None
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        """Routing statistics for every endpoint."""
+        with self._lock:
+            return {e.url: e.snapshot() for e in self.endpoints}
+
+
+def _hash(key: str) -> int:
+    """Stable 64-bit position on the hash ring."""
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
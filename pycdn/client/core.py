@@ -4,24 +4,44 @@ Core client SDK for PyCDN package consumption.
 
 import os
 import time
+import importlib.util
 import threading
 import queue
 import json
 from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from typing import Any, Dict, List, Optional, Union, Callable
 import httpx
 from urllib.parse import urljoin, urlparse
 import asyncio
-import websockets
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 
 from .lazy_loader import LazyPackage, LazyModule
+from .resilience import (
+    RetryPolicy, RetryBudget, CircuitBreaker, CircuitBreakerRegistry, CircuitOpenError
+)
+from .hedging import HedgingPolicy
+from .balancer import Endpoint, EndpointPool
+from .credentials import CredentialRegistry, EXPIRED_ERROR_TYPE
+from .io_loop import BackgroundLoop
+from .transfer import ChunkedDownload, RESUME_ATTEMPTS, merge_envelope, resume_delay
+from .rpc import RpcChannel, RpcUnavailable, advertised_features, RPC_FEATURE, RPC_RETRY_INTERVAL
 from ..utils.common import (
     serialize_args, deserialize_result, log_debug, parse_size, 
     deserialize_from_transport, serialize_for_transport, parse_cache_size
 )
+from ..utils import type_codecs
+# Importing encryption installs its os.getenv hook, so sensitive values read
+# from the environment are encrypted or sent as credential handles
+from ..utils import encryption
+from ..utils.transfer import CHUNKED, TRANSFER_HEADER, ChecksumError, TransferError, is_spilled
+from ..utils.compression import DEFAULT_THRESHOLD, CompressionStats, compress_if_smaller, supported_encodings
+from ..utils.wire import (
+    CALL, FRAME_CONTENT_TYPE, FRAME_FEATURE, binary_fields, decode_frame, encode_frame, text_fields
+)
+
+# Accept header of /execute requests: frames preferred, JSON from older servers
+EXECUTE_ACCEPT = f"{FRAME_CONTENT_TYPE}, application/json"
 
 
 class CDNClient:
@@ -31,45 +51,136 @@ class CDNClient:
     
     def __init__(
         self,
-        url: str,
+        url: Union[str, List[str]],
         timeout: int = 30,
         api_key: Optional[str] = None,
         region: Optional[str] = None,
         cache_size: Union[str, int] = "50MB",
         max_retries: int = 3,
-        debug: bool = False
+        debug: bool = False,
+        http2: Optional[bool] = None,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        retry_budget: Optional[RetryBudget] = None,
+        circuit_breakers: Optional[CircuitBreakerRegistry] = None,
+        hedging: Optional[HedgingPolicy] = None,
+        balancing: str = "least_outstanding",
+        package_affinity: bool = False,
+        probe_interval: float = 30.0,
+        eager_connect: bool = False,
+        credential_handles: bool = True,
+        rpc: bool = True,
+        compression_threshold: Optional[int] = DEFAULT_THRESHOLD
     ):
         """
         Initialize CDN client.
-        
+
         Args:
-            url: CDN server URL
+            url: CDN server URL, or a list of equivalent server URLs to
+                balance across (the first is the primary)
             timeout: Request timeout in seconds
             api_key: API key for authentication
             region: Preferred region
             cache_size: Local cache size
-            max_retries: Maximum retry attempts
+            max_retries: Maximum attempts per call (ignored when retry_policy is given)
             debug: Enable debug mode
+            http2: Multiplex calls over HTTP/2 (requires the 'h2' package).
+                Plain http:// URLs use prior knowledge, so the server must
+                be started with CDNServer(http2=True)
+            max_connections: Maximum number of pooled connections
+            max_keepalive_connections: Idle connections kept open for reuse
+            keepalive_expiry: Seconds an idle connection stays in the pool
+            retry_policy: Error classification and backoff for failed attempts
+            retry_budget: Token bucket capping retries across all calls
+            circuit_breakers: Per-endpoint breakers that fail fast while a
+                server is unhealthy
+            hedging: Send a second copy of slow idempotent calls and take
+                whichever response arrives first
+            balancing: Endpoint selection, "least_outstanding" or "ewma"
+            package_affinity: Pin each package to one endpoint by consistent
+                hashing so its warm caches and instances are reused
+            probe_interval: Seconds between background health probes when
+                several endpoints are configured
+            eager_connect: Check /health before returning instead of
+                connecting on the first call
+            credential_handles: Upload secrets such as api_key once and send
+                only an opaque server-side handle on later calls
+            rpc: Once a server advertises it, send calls over one persistent
+                multiplexed WebSocket with binary frames instead of a
+                request per call
+            compression_threshold: Smallest /execute body compressed, in
+                bytes, for servers that advertise gzip or zstd (None to
+                disable); responses are decompressed regardless
+
+        Transport options left as None fall back to the global configure() values.
         """
-        self.url = url.rstrip('/')
+        urls = [url] if isinstance(url, str) else list(url)
+        self.endpoints = EndpointPool(
+            urls, strategy=balancing, affinity=package_affinity,
+            probe_interval=probe_interval
+        )
+        self.url = self.endpoints.primary.url
         self.timeout = timeout
         self.api_key = api_key
         self.region = region
         self.cache_size = parse_cache_size(cache_size)
         self.max_retries = max_retries
         self.debug = debug
+        self.http2 = _resolve_option(http2, "http2")
+        self.limits = httpx.Limits(
+            max_connections=_resolve_option(max_connections, "max_connections"),
+            max_keepalive_connections=_resolve_option(
+                max_keepalive_connections, "max_keepalive_connections"
+            ),
+            keepalive_expiry=_resolve_option(keepalive_expiry, "keepalive_expiry")
+        )
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=max_retries)
+        self.retry_budget = retry_budget or RetryBudget()
+        self.circuit_breakers = circuit_breakers or CircuitBreakerRegistry(
+            failure_threshold=_global_config["breaker_failure_threshold"],
+            reset_timeout=_global_config["breaker_reset_timeout"]
+        )
+        self.hedging = hedging
+        self._hedge_executor: Optional[ThreadPoolExecutor] = None
+        self._idempotent_names = set()
+        self.credentials = CredentialRegistry(self) if credential_handles else None
+        self.rpc = rpc
+        self._rpc_channels: Dict[str, RpcChannel] = {}
+        self._rpc_retry_at: Dict[str, float] = {}
+        # Endpoints known to take frame-encoded /execute bodies
+        self._frame_endpoints: set = set()
+        self.compression_threshold = compression_threshold
+        # Content-Encoding to send each endpoint, from its advertised features
+        self._request_encodings: Dict[str, str] = {}
+        self.compression_stats = {"requests": CompressionStats(), "responses": CompressionStats()}
         
+        # One event loop thread for RPC channels, monitors and streaming calls
+        self._io_loop: Optional[BackgroundLoop] = None
+        self._io_lock = threading.Lock()
+        self._monitors: List["PackageMonitor"] = []
+
         # Initialize HTTP client
         headers = {"User-Agent": "PyCDN-Client/0.1.0"}
         if api_key:
             headers["Authorization"] = f"Bearer {api_key}"
         if region:
             headers["X-Region"] = region
-            
+        # Type codecs this process can decode; servers tag results only with these
+        headers[type_codecs.CODECS_HEADER] = type_codecs.registry.header()
+        # Very large results are downloaded in resumable chunks
+        headers[TRANSFER_HEADER] = CHUNKED
+        self.headers = headers
+
+        # Async transport is created on first use of the cdn.aio namespace
+        self._async_client = None
+
         self.http_client = httpx.Client(
             timeout=timeout,
             headers=headers,
-            follow_redirects=True
+            follow_redirects=True,
+            **self.transport_options()
         )
         
         # Initialize caches and state
@@ -79,7 +190,12 @@ class CDNClient:
             "requests_made": 0,
             "cache_hits": 0,
             "cache_misses": 0,
-            "errors": 0
+            "errors": 0,
+            "retries": 0,
+            "circuit_rejections": 0,
+            "hedges_sent": 0,
+            "hedges_won": 0,
+            "rpc_calls": 0
         }
         
         # WebSocket connections
@@ -87,11 +203,38 @@ class CDNClient:
         self._output_handlers = {}
         self._running_streams = set()
         
-        # Test connection
-        self._test_connection()
+        # Connection is deferred to the first call unless asked for
+        if eager_connect:
+            self._test_connection()
         
         log_debug(f"CDN client initialized for {self.url}")
     
+    def transport_options(self, asynchronous: bool = False) -> Dict[str, Any]:
+        """
+        Connection pool and protocol options shared by the sync and async transports.
+
+        Args:
+            asynchronous: Build options for httpx.AsyncClient
+
+        Returns:
+            Keyword arguments for httpx.Client / httpx.AsyncClient
+        """
+        options: Dict[str, Any] = {"limits": self.limits}
+
+        if self.http2:
+            if importlib.util.find_spec("h2") is None:
+                log_debug("HTTP/2 requested but the 'h2' package is missing, using HTTP/1.1")
+            else:
+                options["http2"] = True
+                # Without TLS there is no ALPN, so plain http:// endpoints get
+                # their own pool speaking HTTP/2 with prior knowledge
+                transport = httpx.AsyncHTTPTransport if asynchronous else httpx.HTTPTransport
+                options["mounts"] = {
+                    "http://": transport(http1=False, http2=True, limits=self.limits)
+                }
+
+        return options
+
     def _test_connection(self) -> None:
         """Test connection to CDN server."""
         try:
@@ -106,7 +249,8 @@ class CDNClient:
         self,
         package_name: str,
         function_name: str,
-        serialized_args: Dict[str, str]
+        serialized_args: Dict[str, str],
+        idempotent: bool = False
     ) -> Dict[str, Any]:
         """
         Execute a remote function request.
@@ -115,11 +259,13 @@ class CDNClient:
             package_name: Name of the package
             function_name: Name of the function
             serialized_args: Serialized function arguments
+            idempotent: Whether the call may safely be executed twice
             
         Returns:
             Response dictionary
         """
         self._connection_stats["requests_made"] += 1
+        idempotent = idempotent or self.is_idempotent(package_name, function_name)
         
         # Check cache first
         cache_key = self._get_cache_key(package_name, function_name, serialized_args)
@@ -137,29 +283,274 @@ class CDNClient:
             **serialized_args
         }
         
-        # Make request with retries
-        for attempt in range(self.max_retries):
+        result = self._send_with_retries(
+            request_data, f"{package_name}.{function_name}", idempotent
+        )
+        
+        # Cache successful responses
+        if result.get("success", True):
+            self._cache_response(cache_key, result)
+        
+        return result
+    
+    def _send_with_retries(
+        self,
+        request_data: Dict[str, Any],
+        label: str,
+        idempotent: bool
+    ) -> Dict[str, Any]:
+        """Send an execute request under the retry policy, budget and breakers."""
+        package_name = request_data["package_name"]
+        self.retry_budget.record_request()
+        tried: List[Endpoint] = []
+        attempt = 0
+        
+        while True:
+            attempt += 1
+            # Retries fail over to endpoints not yet tried for this call
+            endpoint = self._select_endpoint(package_name, tried)
             try:
-                response = self.http_client.post(
-                    f"{self.url}/execute",
-                    json=request_data
-                )
-                response.raise_for_status()
-                
-                result = response.json()
-                
-                # Cache successful responses
-                if result.get("success", True):
-                    self._cache_response(cache_key, result)
-                
-                return result
-                
+                self.circuit_breakers.get(endpoint.url).before_call()
+                result = self._send_attempt(request_data, endpoint, idempotent)
+            except CircuitOpenError:
+                self._connection_stats["circuit_rejections"] += 1
+                self._connection_stats["errors"] += 1
+                raise
             except Exception as e:
-                log_debug(f"Request attempt {attempt + 1} failed: {e}")
-                if attempt == self.max_retries - 1:
+                tried.append(endpoint)
+                log_debug(f"Request attempt {attempt} for {label} on {endpoint.url} failed: {e}")
+                delay = self.retry_policy.next_delay(e, attempt, idempotent, self.retry_budget)
+                if delay is None:
                     self._connection_stats["errors"] += 1
-                    raise ConnectionError(f"Failed to execute {package_name}.{function_name}: {e}")
-                time.sleep(0.5 * (attempt + 1))  # Exponential backoff
+                    raise ConnectionError(f"Failed to execute {label}: {e}") from e
+                self._connection_stats["retries"] += 1
+                time.sleep(delay)
+            else:
+                return result
+    
+    def _select_endpoint(self, package_name: Optional[str] = None,
+                         exclude: Optional[List[Endpoint]] = None) -> Endpoint:
+        """Pick an endpoint whose circuit is not open."""
+        # Health probing starts with the first request, not at construction
+        self.endpoints.start_probing(self.http_client.get)
+        return self.endpoints.select(
+            package_name, exclude=exclude or (),
+            available=lambda e: self.circuit_breakers.get(e.url).state != CircuitBreaker.OPEN
+        )
+    
+    def _send_attempt(self, request_data: Dict[str, Any], endpoint: Endpoint,
+                      idempotent: bool) -> Dict[str, Any]:
+        """Make one attempt, hedged when the call is idempotent and hedging is on."""
+        if self.hedging is not None and idempotent:
+            return self._send_hedged(request_data, endpoint)
+        return self._send_once(request_data, endpoint)
+    
+    def _send_once(self, request_data: Dict[str, Any], endpoint: Endpoint) -> Dict[str, Any]:
+        """Make a single execute request to one endpoint."""
+        breaker = self.circuit_breakers.get(endpoint.url)
+        channel = self._rpc_channel(endpoint)
+        start = time.perf_counter()
+        try:
+            with self.endpoints.track(endpoint):
+                result = None
+                if channel is not None:
+                    try:
+                        result = channel.call(request_data, timeout=self.timeout)
+                        self._connection_stats["rpc_calls"] += 1
+                    except RpcUnavailable as e:
+                        self._rpc_unavailable(endpoint, e)
+                if result is None:
+                    response = self.http_client.post(f"{endpoint.url}/execute",
+                                                     **self._execute_body(request_data, endpoint))
+                    response.raise_for_status()
+                    self._note_features(endpoint, response)
+                    result = self._execute_result(response)
+        except Exception as e:
+            self._record_outcome(breaker, e)
+            raise
+        breaker.record_success()
+        self._record_latency(time.perf_counter() - start)
+        if is_spilled(result):
+            result = self._fetch_spilled(endpoint, result)
+        return result
+    
+    def _fetch_spilled(self, endpoint: Endpoint, envelope: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Download a result the server spilled to disk, one checksummed chunk at a time.
+        
+        Dropped connections and corrupt chunks are resumed from the last
+        good byte; the download fails after RESUME_ATTEMPTS tries in a row
+        make no progress.
+        
+        Raises:
+            TransferError: If the result cannot be downloaded
+        """
+        url = f"{endpoint.url}/results/{envelope['transfer']['id']}"
+        failures = 0
+        with ChunkedDownload(envelope["transfer"]) as download:
+            while not download.complete:
+                position = download.position
+                try:
+                    with self.http_client.stream("GET", url, headers=download.range_header()) as response:
+                        download.check_response(response.status_code,
+                                                response.headers.get("content-range"))
+                        for data in response.iter_bytes():
+                            download.write(data)
+                except (httpx.TransportError, ChecksumError) as e:
+                    failures = 1 if download.position > position else failures + 1
+                    if failures > RESUME_ATTEMPTS:
+                        raise TransferError(f"Download of result from {endpoint.url} failed: {e}") from e
+                    log_debug(f"Resuming result download at byte {download.position}: {e}")
+                    time.sleep(resume_delay(failures))
+            fields = download.fields()
+        try:
+            self.http_client.delete(url)
+        except httpx.HTTPError as e:
+            log_debug(f"Could not delete spilled result: {e}")
+        return merge_envelope(envelope, fields)
+    
+    def _execute_body(self, request_data: Dict[str, Any], endpoint: Endpoint) -> Dict[str, Any]:
+        """
+        Keyword arguments posting request_data to an endpoint's /execute.
+        
+        The first request to an endpoint is JSON; once its responses
+        advertise frame support, requests go as CALL frames whose pickled
+        fields and buffers are raw bytes rather than base64 text. Bodies
+        over compression_threshold are compressed if the endpoint
+        advertised an encoding this client supports.
+        """
+        encoding = self._request_encodings.get(endpoint.url)
+        if self.compression_threshold is None:
+            encoding = None
+        if endpoint.url in self._frame_endpoints:
+            content = encode_frame(CALL, 0, binary_fields(request_data))
+            content_type = FRAME_CONTENT_TYPE
+        elif encoding is not None:
+            content = json.dumps(text_fields(request_data)).encode()
+            content_type = "application/json"
+        else:
+            return {"json": text_fields(request_data), "headers": {"Accept": EXECUTE_ACCEPT}}
+        
+        headers = {"Content-Type": content_type, "Accept": EXECUTE_ACCEPT}
+        if encoding is not None and len(content) >= self.compression_threshold:
+            start = time.thread_time()
+            encoded = compress_if_smaller(content, encoding)
+            cpu_seconds = time.thread_time() - start
+            if encoded is not None:
+                self.compression_stats["requests"].record(len(content), len(encoded), cpu_seconds)
+                return {"content": encoded, "headers": {**headers, "Content-Encoding": encoding}}
+        if encoding is not None:
+            self.compression_stats["requests"].record_skipped()
+        return {"content": content, "headers": headers}
+    
+    def _execute_result(self, response: Any) -> Dict[str, Any]:
+        """Result envelope of an /execute response, frame-encoded or JSON."""
+        headers = getattr(response, "headers", None)
+        content_type = headers.get("content-type") if headers is not None else None
+        content_encoding = headers.get("content-encoding") if headers is not None else None
+        if isinstance(content_encoding, str) and isinstance(response.num_bytes_downloaded, int):
+            # httpx has already decoded the body; only its sizes are counted
+            self.compression_stats["responses"].record(len(response.content),
+                                                       response.num_bytes_downloaded)
+        if isinstance(content_type, str) and content_type.startswith(FRAME_CONTENT_TYPE):
+            return decode_frame(response.content).fields
+        return response.json()
+    
+    def _note_features(self, endpoint: Endpoint, response: Any) -> None:
+        """Record what an endpoint's responses advertise, opening an RPC channel if /rpc is."""
+        features = advertised_features(response)
+        if FRAME_FEATURE in features:
+            self._frame_endpoints.add(endpoint.url)
+        encodings = [e for e in supported_encodings() if e in features]
+        if encodings:
+            self._request_encodings[endpoint.url] = encodings[0]
+        if self.rpc and endpoint.url not in self._rpc_channels and RPC_FEATURE in features:
+            log_debug(f"{endpoint.url} supports RPC, moving calls to a persistent channel")
+            self._rpc_channels[endpoint.url] = RpcChannel(
+                endpoint.url, connect_timeout=self.timeout, headers=self.headers,
+                io_loop=self.io_loop
+            )
+    
+    def _rpc_channel(self, endpoint: Endpoint) -> Optional[RpcChannel]:
+        """RPC channel to use for an endpoint, or None for plain HTTP."""
+        if not self.rpc or time.monotonic() < self._rpc_retry_at.get(endpoint.url, 0.0):
+            return None
+        return self._rpc_channels.get(endpoint.url)
+    
+    def _rpc_unavailable(self, endpoint: Endpoint, error: Exception) -> None:
+        """Fall back to HTTP for an endpoint whose channel cannot be opened."""
+        log_debug(f"RPC channel to {endpoint.url} unavailable, using HTTP for now: {error}")
+        self._rpc_retry_at[endpoint.url] = time.monotonic() + RPC_RETRY_INTERVAL
+    
+    def _send_hedged(self, request_data: Dict[str, Any], endpoint: Endpoint) -> Dict[str, Any]:
+        """Race a primary request against a delayed hedge sent to another endpoint."""
+        executor = self._get_hedge_executor()
+        primary = executor.submit(self._send_once, request_data, endpoint)
+        try:
+            return primary.result(timeout=self.hedging.hedge_delay())
+        except FutureTimeoutError:
+            pass
+        
+        # Hedges are extra load, so they share the retry budget
+        if not self.retry_budget.try_acquire():
+            return primary.result()
+        
+        self._connection_stats["hedges_sent"] += 1
+        hedge_endpoint = self._select_endpoint(exclude=[endpoint])
+        hedge = executor.submit(self._send_once, request_data, hedge_endpoint)
+        pending = {primary, hedge}
+        error = None
+        
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._connection_stats["hedges_won"] += 1
+                    # A blocking request cannot be interrupted; its response is discarded
+                    for loser in pending:
+                        loser.cancel()
+                    return future.result()
+                error = error or future.exception()
+        
+        raise error
+    
+    def _get_hedge_executor(self) -> ThreadPoolExecutor:
+        """Worker pool racing hedged requests, created on first use."""
+        if self._hedge_executor is None:
+            self._hedge_executor = ThreadPoolExecutor(
+                max_workers=8, thread_name_prefix="pycdn-hedge"
+            )
+        return self._hedge_executor
+    
+    def _record_latency(self, seconds: float) -> None:
+        """Feed a successful request latency into the hedging tracker."""
+        if self.hedging is not None:
+            self.hedging.latency.record(seconds)
+    
+    def mark_idempotent(self, *names: str) -> None:
+        """
+        Mark packages or functions as safe to retry and hedge.
+        
+        Args:
+            names: Package names ("numpy") or qualified functions ("math.sqrt")
+        """
+        self._idempotent_names.update(names)
+    
+    def is_idempotent(self, package_name: str, function_name: str) -> bool:
+        """Whether a call was marked idempotent via mark_idempotent()."""
+        names = self._idempotent_names
+        return bool(names) and (
+            package_name in names or f"{package_name}.{function_name}" in names
+        )
+    
+    def _record_outcome(self, breaker, error: Exception) -> None:
+        """Feed a failed attempt into the endpoint's breaker."""
+        if self.retry_policy.is_server_failure(error):
+            breaker.record_failure()
+        else:
+            # The server answered (4xx, bad payload), so it is reachable
+            breaker.record_success()
     
     def _get_cache_key(
         self,
@@ -170,10 +561,19 @@ class CDNClient:
         """Generate cache key for request."""
         import hashlib
         key_data = f"{package_name}.{function_name}.{serialized_args['args']}.{serialized_args['kwargs']}"
-        return hashlib.md5(key_data.encode()).hexdigest()
+        digest = hashlib.md5(key_data.encode())
+        # Out-of-band data is not in the pickles: equal-shaped arrays pickle alike
+        for buffer in serialized_args.get("buffers") or ():
+            digest.update(buffer.encode() if isinstance(buffer, str) else buffer)
+        return digest.hexdigest()
     
     def _cache_response(self, cache_key: str, response: Dict[str, Any]) -> None:
         """Cache a response."""
+        # Downloaded results reach the spill threshold, and their buffers
+        # keep the download's memory map alive; fetch them again instead
+        if response.get("downloaded"):
+            return
+        
         # Simple cache management - in production would be more sophisticated
         if len(self._response_cache) > 1000:  # Simple limit
             # Remove oldest entries
@@ -198,7 +598,8 @@ class CDNClient:
             return self._package_info_cache[package_name]
         
         try:
-            response = self.http_client.get(f"{self.url}/packages/{package_name}/info")
+            endpoint = self._select_endpoint(package_name)
+            response = self.http_client.get(f"{endpoint.url}/packages/{package_name}/info")
             response.raise_for_status()
             
             info = response.json()
@@ -239,11 +640,19 @@ class CDNClient:
             # Combine with client stats
             return {
                 "server": server_stats,
-                "client": self._connection_stats.copy()
+                "client": self._connection_stats.copy(),
+                "endpoints": self.endpoints.snapshot(),
+                "compression": self._compression_snapshot()
             }
         except Exception as e:
             log_debug(f"Failed to get stats: {e}")
-            return {"client": self._connection_stats.copy()}
+            return {"client": self._connection_stats.copy(),
+                    "endpoints": self.endpoints.snapshot(),
+                    "compression": self._compression_snapshot()}
+    
+    def _compression_snapshot(self) -> Dict[str, Any]:
+        """Request compression and response decompression statistics."""
+        return {direction: stats.snapshot() for direction, stats in self.compression_stats.items()}
     
     def clear_cache(self) -> None:
         """Clear local cache."""
@@ -268,14 +677,28 @@ class CDNClient:
     def call_function(self, package_name: str, function_name: str, 
                      args: tuple = (), kwargs: dict = None, 
                      stream_output: bool = False, 
-                     output_handler: Optional[Callable] = None) -> Any:
+                     output_handler: Optional[Callable] = None,
+                     idempotent: bool = False) -> Any:
         """Call a function on the CDN server with optional output streaming."""
         if kwargs is None:
             kwargs = {}
             
-        # Use regular execution for now (streaming can be added later)
-        serialized_args = serialize_args(*args, **kwargs)
-        result = self._execute_request(package_name, function_name, serialized_args)
+        if stream_output and output_handler:
+            # Output arrives through output_handler while the function runs
+            send = lambda serialized: self._call_with_streaming(
+                package_name, function_name, serialized, output_handler)
+        else:
+            send = lambda serialized: self._execute_request(
+                package_name, function_name, serialized, idempotent=idempotent)
+        
+        call_args, call_kwargs, used_handles = self._substitute_credentials(args, kwargs)
+        result = send(serialize_args(*call_args, **call_kwargs))
+        
+        if used_handles and result.get("error_type") == EXPIRED_ERROR_TYPE:
+            # Handle lapsed or the server restarted: register again and retry once
+            self.credentials.invalidate()
+            call_args, call_kwargs, _ = self._substitute_credentials(args, kwargs)
+            result = send(serialize_args(*call_args, **call_kwargs))
         
         # Handle captured output if present
         if result.get("stdout"):
@@ -285,8 +708,155 @@ class CDNClient:
         
         return deserialize_result(result)
 
+    def _call_with_streaming(self, package_name: str, function_name: str,
+                             serialized_args: Dict[str, str],
+                             output_handler: Callable) -> Dict[str, Any]:
+        """
+        Execute over the /stream WebSocket, passing output chunks to output_handler.
+        
+        Returns:
+            The same result envelope /execute returns
+        """
+        import websockets
+        
+        endpoint = self._select_endpoint(package_name)
+        channel = self._rpc_channel(endpoint)
+        if channel is not None:
+            request_data = {"package_name": package_name, "function_name": function_name,
+                            **serialized_args}
+            try:
+                with self.endpoints.track(endpoint):
+                    result = channel.call(request_data, output_handler=output_handler)
+                self._connection_stats["rpc_calls"] += 1
+                return self._fetch_spilled(endpoint, result) if is_spilled(result) else result
+            except RpcUnavailable as e:
+                self._rpc_unavailable(endpoint, e)
+        
+        ws_url = endpoint.url.replace("http://", "ws://", 1).replace("https://", "wss://", 1)
+        
+        async def stream_call():
+            async with websockets.connect(f"{ws_url}/stream/{package_name}") as websocket:
+                await websocket.send(json.dumps({
+                    "type": "execute",
+                    "package": package_name,
+                    "function": function_name,
+                    "serialized_args": text_fields(serialized_args),
+                    "codecs": type_codecs.registry.header(),
+                    "transfer": CHUNKED
+                }))
+                async for response in websocket:
+                    data = json.loads(response)
+                    if data["type"] in ("stdout", "stderr"):
+                        output_handler(data["type"], data["data"])
+                    elif data["type"] == "result":
+                        return data
+                    elif data["type"] == "error":
+                        raise RuntimeError(data["message"])
+            raise ConnectionError("Stream closed before the result arrived")
+        
+        try:
+            with self.endpoints.track(endpoint):
+                result = self.io_loop.run(stream_call())
+        except (OSError, websockets.exceptions.WebSocketException) as e:
+            raise ConnectionError(f"Failed to stream {package_name}.{function_name}: {e}") from e
+        return self._fetch_spilled(endpoint, result) if is_spilled(result) else result
+    
+    def _substitute_credentials(self, args: tuple, kwargs: dict):
+        """Swap secrets in call arguments for registered credential handles."""
+        if self.credentials is None:
+            return args, kwargs, False
+        return self.credentials.substitute(args, kwargs)
+
+    @property
+    def io_loop(self) -> BackgroundLoop:
+        """Background event loop owning this client's WebSocket connections."""
+        with self._io_lock:
+            if self._io_loop is None:
+                self._io_loop = BackgroundLoop()
+            return self._io_loop
+
+    def monitor_package(self, package_name: str,
+                        output_handler: Optional[Callable] = None) -> "PackageMonitor":
+        """
+        Follow a package's output as other callers run it.
+        
+        Monitors are tasks on the client's I/O loop, so any number of them
+        share one thread.
+        
+        Args:
+            package_name: Package to monitor
+            output_handler: Called with (stream, text); prints by default
+            
+        Returns:
+            Started PackageMonitor; call stop() to end it
+        """
+        if output_handler is None:
+            output_handler = self._default_output_handler
+        
+        monitor = PackageMonitor(self.url, package_name, output_handler, io_loop=self.io_loop)
+        monitor.start()
+        self._monitors.append(monitor)
+        return monitor
+
+    def interactive_session(self, package_name: str, session_id: Optional[str] = None,
+                            output_handler: Optional[Callable] = None) -> "InteractiveSession":
+        """
+        Open a shell session for a CLI package.
+        
+        The session runs on the client's I/O loop and connects to the same
+        endpoint streaming calls for the package would use.
+        
+        Args:
+            package_name: Package whose environment the shell runs in
+            session_id: Resume a session an earlier connection left running
+            output_handler: Called with (stream, text); prints by default
+            
+        Returns:
+            Connected InteractiveSession; call run() for commands and close() to detach
+            
+        Raises:
+            ConnectionError: If the session cannot be started
+        """
+        endpoint = self._select_endpoint(package_name)
+        session = InteractiveSession(endpoint.url, package_name, session_id,
+                                     output_handler=output_handler, io_loop=self.io_loop)
+        if not session.connect():
+            raise ConnectionError(f"Failed to start interactive session for {package_name}")
+        return session
+
+    def _default_output_handler(self, stream_type: str, data: str):
+        """Default output handler that prints to console."""
+        if stream_type == "stdout":
+            print(data, end="")
+        elif stream_type == "stderr":
+            print(data, end="", file=__import__("sys").stderr)
+
+    @property
+    def async_client(self) -> "AsyncCDNClient":
+        """
+        Shared async transport for this client.
+
+        Returns:
+            AsyncCDNClient sharing configuration and cache with this client
+        """
+        if self._async_client is None:
+            from .aio import AsyncCDNClient
+            self._async_client = AsyncCDNClient(self)
+        return self._async_client
+
     def close(self) -> None:
         """Close the HTTP client."""
+        self.endpoints.stop_probing()
+        for monitor in self._monitors:
+            monitor.stop()
+        self._monitors.clear()
+        for channel in self._rpc_channels.values():
+            channel.close()
+        if self._io_loop is not None:
+            self._io_loop.stop()
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False)
+            self._hedge_executor = None
         self.http_client.close()
     
     def __enter__(self):
@@ -304,10 +874,23 @@ _global_config = {
     "default_url": "http://localhost:8000",
     "timeout": 30,
     "cache_size": "100MB",
-    "max_retries": 3
+    "max_retries": 3,
+    "http2": False,
+    "max_connections": 100,
+    "max_keepalive_connections": 20,
+    # Kept below CDNServer's keep-alive timeout so the server never closes
+    # a connection the pool is about to reuse
+    "keepalive_expiry": 20.0,
+    "breaker_failure_threshold": 5,
+    "breaker_reset_timeout": 30.0
 }
 
 
+def _resolve_option(value: Any, name: str) -> Any:
+    """Return an explicit client option or its global default."""
+    return _global_config[name] if value is None else value
+
+
 def pkg(url: str, prefix: str = None, **kwargs) -> LazyPackage:
     """
     Connect to a CDN server and return a lazy package namespace with import system integration.
@@ -395,18 +978,28 @@ def set_global_client(client: CDNClient) -> None:
 class InteractiveSession:
     """Interactive session for CLI packages."""
     
-    def __init__(self, base_url: str, package_name: str):
+    def __init__(self, base_url: str, package_name: str, session_id: Optional[str] = None,
+                 output_handler: Optional[Callable] = None,
+                 io_loop: Optional[BackgroundLoop] = None):
         self.base_url = base_url
         self.package_name = package_name
         self.ws_url = base_url.replace("http://", "ws://").replace("https://", "wss://")
         self.websocket = None
-        self.session_id = None
+        # Set to resume a session a previous connection left running
+        self.session_id = session_id
+        self.output_handler = output_handler
+        # Set when the session belongs to a CDNClient; enables the blocking methods
+        self._io = io_loop
         self._output_queue = queue.Queue()
         self._running = False
 
     async def _connect(self):
         """Connect to interactive session."""
+        import websockets
+
         uri = f"{self.ws_url}/interactive/{self.package_name}"
+        if self.session_id:
+            uri += f"?session_id={self.session_id}"
         
         try:
             self.websocket = await websockets.connect(uri)
@@ -445,11 +1038,9 @@ class InteractiveSession:
                     response = await self.websocket.recv()
                     data = json.loads(response)
                     
-                    if data["type"] == "stdout":
-                        print(data["data"], end="")
-                    elif data["type"] == "stderr":
-                        print(data["data"], end="", file=__import__("sys").stderr)
-                    elif data["type"] == "command_complete":
+                    if data["type"] in ("stdout", "stderr"):
+                        self._emit(data["type"], data["data"])
+                    elif data["type"] in ("command_complete", "session_end"):
                         return data["return_code"]
                     elif data["type"] == "error":
                         print(f"Error: {data['message']}")
@@ -461,6 +1052,29 @@ class InteractiveSession:
             print(f"Command execution failed: {e}")
             return -1
 
+    def _emit(self, stream_type: str, data: str):
+        """Pass command output to the handler, printing it by default."""
+        if self.output_handler is not None:
+            self.output_handler(stream_type, data)
+        elif stream_type == "stdout":
+            print(data, end="")
+        else:
+            print(data, end="", file=__import__("sys").stderr)
+
+    def _schedule(self, coro):
+        """Run a coroutine on the session's I/O loop, or the caller's running loop."""
+        if self._io is not None:
+            return self._io.submit(coro)
+        return asyncio.create_task(coro)
+
+    def connect(self) -> bool:
+        """Connect from synchronous code; requires an io_loop."""
+        return self._io.run(self._connect())
+
+    def run(self, command: str, stream_output: bool = True):
+        """Execute a command from synchronous code and return its exit code."""
+        return self._io.run(self.execute_command(command, stream_output))
+
     def send_input(self, input_data: str):
         """Send input to the interactive process."""
         if self.websocket:
@@ -468,84 +1082,90 @@ class InteractiveSession:
                 "type": "input",
                 "data": input_data
             }
-            asyncio.create_task(self.websocket.send(json.dumps(message)))
+            self._schedule(self.websocket.send(json.dumps(message)))
+
+    def interrupt(self):
+        """Send Ctrl-C to the running command."""
+        if self.websocket:
+            self._schedule(self.websocket.send(json.dumps({"type": "interrupt"})))
 
     def close(self):
-        """Close the interactive session."""
+        """
+        Close the connection.
+        
+        The server keeps the shell running, so a new session created with
+        this session_id picks up where this one left off.
+        """
         self._running = False
         if self.websocket:
-            asyncio.create_task(self.websocket.close())
+            if self._io is not None:
+                self._io.run(self.websocket.close())
+            else:
+                asyncio.create_task(self.websocket.close())
+            self.websocket = None
 
 
 class PackageMonitor:
     """Monitor real-time output from a package."""
     
-    def __init__(self, base_url: str, package_name: str, output_handler: Callable):
+    def __init__(self, base_url: str, package_name: str, output_handler: Callable,
+                 io_loop: Optional[BackgroundLoop] = None):
         self.base_url = base_url
         self.package_name = package_name
         self.output_handler = output_handler
         self.ws_url = base_url.replace("http://", "ws://").replace("https://", "wss://")
         self.websocket = None
         self._running = False
-        self._thread = None
+        self._owns_loop = io_loop is None
+        self._io = io_loop or BackgroundLoop("pycdn-monitor")
+        self._task = None
 
     def start(self):
-        """Start monitoring."""
+        """Start monitoring on the background I/O loop."""
         self._running = True
-        self._thread = threading.Thread(target=self._monitor_loop)
-        self._thread.daemon = True
-        self._thread.start()
+        self._task = self._io.submit(self._monitor())
 
     def stop(self):
         """Stop monitoring."""
         self._running = False
-        if self._thread:
-            self._thread.join(timeout=5)
-
-    def _monitor_loop(self):
-        """Main monitoring loop."""
-        asyncio.set_event_loop(asyncio.new_event_loop())
-        loop = asyncio.get_event_loop()
-        
-        try:
-            loop.run_until_complete(self._monitor())
-        except Exception as e:
-            print(f"Monitor error: {e}")
-        finally:
-            loop.close()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._owns_loop:
+            self._io.stop()
 
     async def _monitor(self):
         """Async monitoring function."""
+        import websockets
+
         uri = f"{self.ws_url}/stream/{self.package_name}"
         
         try:
+            # websockets keeps the connection alive with protocol-level pings
             async with websockets.connect(uri) as websocket:
                 self.websocket = websocket
                 
-                while self._running:
-                    try:
-                        response = await asyncio.wait_for(websocket.recv(), timeout=1.0)
-                        data = json.loads(response)
-                        
-                        if data["type"] in ["stdout", "stderr"]:
-                            self.output_handler(data["type"], data["data"])
-                        elif data["type"] == "output":
-                            if data.get("stdout"):
-                                self.output_handler("stdout", data["stdout"])
-                            if data.get("stderr"):
-                                self.output_handler("stderr", data["stderr"])
-                        elif data["type"] == "error":
-                            self.output_handler("error", data.get("error", "Unknown error"))
-                            
-                    except asyncio.TimeoutError:
-                        # Send ping to keep connection alive
-                        await websocket.send(json.dumps({"type": "ping"}))
-                    except websockets.exceptions.ConnectionClosed:
-                        print(f"Connection to {self.package_name} monitor closed")
-                        break
+                async for response in websocket:
+                    data = json.loads(response)
+                    
+                    if data["type"] in ["stdout", "stderr"]:
+                        self.output_handler(data["type"], data["data"])
+                    elif data["type"] == "output":
+                        if data.get("stdout"):
+                            self.output_handler("stdout", data["stdout"])
+                        if data.get("stderr"):
+                            self.output_handler("stderr", data["stderr"])
+                    elif data["type"] == "error":
+                        self.output_handler("error", data.get("error", "Unknown error"))
+                
+                print(f"Connection to {self.package_name} monitor closed")
                         
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             print(f"Monitor connection failed: {e}")
+        finally:
+            self.websocket = None
 
     def call_function(self, package_name: str, function_name: str, 
                      args: tuple = (), kwargs: dict = None, 
@@ -600,7 +1220,7 @@ class PackageMonitor:
             
             return result
             
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             raise ConnectionError(f"Failed to call {package_name}.{function_name}: {e}")
         except Exception as e:
             raise RuntimeError(f"Error executing {package_name}.{function_name}: {e}")
@@ -612,6 +1232,8 @@ class PackageMonitor:
         import asyncio
         
         async def stream_call():
+            import websockets
+
             ws_url = self.url.replace("http://", "ws://").replace("https://", "wss://")
             uri = f"{ws_url}/stream/{package_name}"
             
@@ -661,9 +1283,9 @@ class PackageMonitor:
             loop.close()
 
     @contextmanager
-    def interactive_session(self, package_name: str):
-        """Create an interactive session for CLI packages."""
-        session = InteractiveSession(self.url, package_name)
+    def interactive_session(self, package_name: str, session_id: Optional[str] = None):
+        """Create (or resume) an interactive session for CLI packages."""
+        session = InteractiveSession(self.url, package_name, session_id)
         try:
             yield session
         finally:
@@ -0,0 +1,155 @@
+"""
+Client-side credential handles for PyCDN.
+
+Secrets found in call arguments (api_key=..., token=...) are encrypted and
+uploaded once per session via POST /credentials. Later calls, including
+every CDNMethodProxy call that re-sends a class's init_kwargs, carry only
+{"__pycdn_credential__": handle}.
+"""
+
+import hashlib
+import secrets
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..utils.common import log_debug
+
+CREDENTIAL_MARKER = "__pycdn_credential__"
+
+# error_type the server reports when a handle has expired or was never seen
+EXPIRED_ERROR_TYPE = "CredentialExpiredError"
+
+
+class CredentialRegistry:
+    """
+    Maps secrets to server-side handles for one CDNClient.
+    """
+
+    def __init__(self, cdn_client: "CDNClient", ttl: float = 3600.0,
+                 refresh_margin: float = 60.0):
+        """
+        Initialize credential registry.
+
+        Args:
+            cdn_client: Client whose endpoints hold the credentials
+            ttl: Requested handle lifetime in seconds
+            refresh_margin: Re-register this many seconds before expiry
+        """
+        self._cdn_client = cdn_client
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.enabled = True
+        # sha256(secret) -> (handle, monotonic expiry)
+        self._handles: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def substitute(self, args: tuple, kwargs: dict) -> Tuple[tuple, dict, bool]:
+        """
+        Replace secrets in call arguments with handles, registering new ones.
+
+        Returns:
+            Tuple of (args, kwargs, whether anything was replaced)
+        """
+        found = self.find_secrets(args, kwargs)
+        if not found:
+            return args, kwargs, False
+        missing = self.missing(found)
+        if missing:
+            self.register_all(missing)
+        return self.apply(args, kwargs)
+
+    def find_secrets(self, args: tuple, kwargs: dict) -> List[str]:
+        """Collect secrets anywhere in call arguments, including nested call data."""
+        if not self.enabled:
+            return []
+        from ..utils.encryption import map_sensitive_arguments
+
+        found: List[str] = []
+
+        def collect(value: str) -> str:
+            found.append(value)
+            return value
+
+        # Each secret costs a round trip and a server entry, so ordinary strings
+        # must not qualify: no long letter/digit heuristic, keyword names only
+        # as whole words, and list items are judged by their content
+        map_sensitive_arguments(args, kwargs, collect, generic_patterns=False,
+                                strict_names=True)
+        return found
+
+    def missing(self, found: List[str]) -> List[str]:
+        """Secrets without a handle that is valid for at least refresh_margin."""
+        deadline = time.monotonic() + self.refresh_margin
+        with self._lock:
+            return [s for s in dict.fromkeys(found)
+                    if self._handles.get(_digest(s), ("", 0.0))[1] <= deadline]
+
+    def register_all(self, found: List[str]) -> None:
+        """
+        Upload secrets to every endpoint under one client-chosen handle each.
+
+        An endpoint that misses the registration reports the handle as
+        expired on first use, which triggers re-registration.
+        """
+        from ..utils.encryption import get_global_encryption
+
+        encryption = get_global_encryption()
+        client = self._cdn_client
+
+        for secret in found:
+            handle = secrets.token_urlsafe(32)
+            payload = {"secret": encryption.encrypt_data(secret), "ttl": self.ttl,
+                       "handle": handle}
+            expires_in = None
+
+            for endpoint in client.endpoints.endpoints:
+                try:
+                    response = client.http_client.post(f"{endpoint.url}/credentials", json=payload)
+                    if response.status_code in (404, 405):
+                        # Server predates credential handles, keep sending secrets inline
+                        log_debug(f"{endpoint.url} has no /credentials endpoint, disabling handles")
+                        self.enabled = False
+                        return
+                    response.raise_for_status()
+                    granted = float(response.json()["expires_in"])
+                    expires_in = granted if expires_in is None else min(expires_in, granted)
+                except Exception as e:
+                    log_debug(f"Credential registration on {endpoint.url} failed: {e}")
+
+            if expires_in is None:
+                raise ConnectionError("Failed to register credential with any endpoint")
+
+            with self._lock:
+                self._handles[_digest(secret)] = (handle, time.monotonic() + expires_in)
+
+    def apply(self, args: tuple, kwargs: dict) -> Tuple[tuple, dict, bool]:
+        """Replace registered secrets with handle markers."""
+        from ..utils.encryption import map_sensitive_arguments
+
+        if not self.enabled:
+            return args, kwargs, False
+        with self._lock:
+            handles = {digest: handle for digest, (handle, _) in self._handles.items()}
+        replaced = []
+
+        def swap(value: str) -> Any:
+            handle = handles.get(_digest(value))
+            if handle is None:
+                return value
+            replaced.append(handle)
+            return {CREDENTIAL_MARKER: handle}
+
+        new_args, new_kwargs = map_sensitive_arguments(args, kwargs, swap, generic_patterns=False,
+                                                       strict_names=True)
+        return new_args, new_kwargs, bool(replaced)
+
+    def invalidate(self) -> None:
+        """Forget every handle so the next call re-registers."""
+        with self._lock:
+            self._handles.clear()
+
+
+def _digest(secret: str) -> str:
+    """Registry key that avoids holding secrets as dictionary keys."""
+    return hashlib.sha256(secret.encode()).hexdigest()
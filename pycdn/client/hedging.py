@@ -0,0 +1,92 @@
+"""
+Request hedging for tail-latency reduction.
+
+When an idempotent call has not answered within a high percentile of
+recently observed latency, a second copy is sent and whichever response
+arrives first wins. Hedges draw from the client's RetryBudget so they
+cannot amplify load during an incident.
+"""
+
+import threading
+from collections import deque
+from typing import Optional
+
+
+class LatencyTracker:
+    """
+    Sliding window of recent call latencies with percentile queries.
+    """
+
+    def __init__(self, window: int = 256):
+        """
+        Initialize latency tracker.
+
+        Args:
+            window: Number of most recent samples kept
+        """
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        """Add a latency sample."""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """
+        Latency at the given percentile.
+
+        Args:
+            pct: Percentile between 0 and 100
+
+        Returns:
+            Latency in seconds, or None without samples
+        """
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * pct / 100.0))
+        return ordered[index]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+
+class HedgingPolicy:
+    """
+    Decides when a hedge is sent for an idempotent call.
+
+    The hedge delay is the configured percentile of observed latency,
+    clamped to [min_delay, max_delay]. Until min_samples latencies have
+    been seen the fixed initial_delay is used.
+    """
+
+    def __init__(self, percentile: float = 95.0, min_delay: float = 0.005,
+                 max_delay: float = 2.0, initial_delay: float = 0.1,
+                 min_samples: int = 20, window: int = 256):
+        """
+        Initialize hedging policy.
+
+        Args:
+            percentile: Latency percentile after which a hedge is sent
+            min_delay: Lower bound for the hedge delay in seconds
+            max_delay: Upper bound for the hedge delay in seconds
+            initial_delay: Delay used before enough samples exist
+            min_samples: Samples needed before the percentile is trusted
+            window: Number of recent latencies tracked
+        """
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self.latency = LatencyTracker(window)
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for the first response before hedging."""
+        if len(self.latency) < self.min_samples:
+            return self.initial_delay
+        observed = self.latency.percentile(self.percentile)
+        return min(self.max_delay, max(self.min_delay, observed))
@@ -96,7 +96,14 @@ class HybridCDNProxy:
         # Check dev mode fallbacks
         if self._dev_mode and name in self._local_fallbacks:
             return self._local_fallbacks[name]
-        
+
+        # Async namespace: cdn.aio.<package> mirrors cdn.<package> with awaitable calls
+        if name == "aio" and self._parent is None:
+            from .aio import create_async_root
+            aio_root = create_async_root(self._cdn_client, self._prefix)
+            self._cached_attrs[cache_key] = aio_root
+            return aio_root
+
         # Build full path
         if self._module_path and self._module_path != "cdn":
             full_path = f"{self._module_path}.{name}"
@@ -132,7 +139,8 @@ class HybridCDNProxy:
             response = self._cdn_client._execute_request(
                 package_name=package_name,
                 function_name="__getattr__",
-                serialized_args={"args": f'["{symbol_name}"]', "kwargs": "{}"}
+                serialized_args={"args": f'["{symbol_name}"]', "kwargs": "{}"},
+                idempotent=True
             )
             
             if not response.get("success", False):
@@ -267,7 +275,8 @@ class HybridCDNProxy:
             response = self._cdn_client._execute_request(
                 package_name="__system__",
                 function_name="list_packages",
-                serialized_args={"args": "[]", "kwargs": "{}"}
+                serialized_args={"args": "[]", "kwargs": "{}"},
+                idempotent=True
             )
             if response.get("success", False):
                 return response.get("result", [])
@@ -287,7 +296,8 @@ class HybridCDNProxy:
             response = self._cdn_client._execute_request(
                 package_name=package_name,
                 function_name="__describe__",
-                serialized_args={"args": f'["{symbol_name}"]', "kwargs": "{}"}
+                serialized_args={"args": f'["{symbol_name}"]', "kwargs": "{}"},
+                idempotent=True
             )
             
             if response.get("success", False):
@@ -356,7 +366,8 @@ class CDNFunctionProxy:
             response = self._cdn_client._execute_request(
                 package_name=self._package_name,
                 function_name="__doc__",
-                serialized_args={"args": f'["{self._function_name}"]', "kwargs": "{}"}
+                serialized_args={"args": f'["{self._function_name}"]', "kwargs": "{}"},
+                idempotent=True
             )
             if response.get("success", False):
                 return response.get("result", "")
@@ -416,7 +427,8 @@ class CDNClassProxy:
             response = self._cdn_client._execute_request(
                 package_name=self._package_name,
                 function_name="__doc__",
-                serialized_args={"args": f'["{self._class_name}"]', "kwargs": "{}"}
+                serialized_args={"args": f'["{self._class_name}"]', "kwargs": "{}"},
+                idempotent=True
             )
             if response.get("success", False):
                 return response.get("result", "")
@@ -669,7 +681,13 @@ class HybridModuleLoader(importlib.abc.Loader):
                 package_proxy = self._cdn_root
                 for part in package_path.split('.'):
                     package_proxy = getattr(package_proxy, part)
-                
+
+                # Async proxies register themselves in sys.modules and resolve
+                # symbols on demand, so there is nothing to copy eagerly
+                from .aio import AsyncHybridCDNProxy
+                if isinstance(package_proxy, AsyncHybridCDNProxy):
+                    return
+
                 # Get all attributes from the package proxy
                 # This ensures 'from cdn.openai import OpenAI' gets the actual OpenAI class
                 package_dir = dir(package_proxy)
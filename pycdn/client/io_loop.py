@@ -0,0 +1,109 @@
+"""
+Shared background event loop for a PyCDN client's WebSocket work.
+
+RPC channels, package monitors and streaming calls all run as tasks on one
+loop in one daemon thread per client, instead of each creating (and
+tearing down) its own loop or thread. Synchronous code hands coroutines to
+the loop and gets concurrent.futures.Future objects back.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Coroutine, Optional
+
+from ..utils.common import log_debug
+
+
+class BackgroundLoop:
+    """
+    An asyncio event loop running in a daemon thread, started on first use.
+    """
+
+    def __init__(self, name: str = "pycdn-io"):
+        """
+        Initialize background loop.
+
+        Args:
+            name: Thread name, shown in debuggers and thread dumps
+        """
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The running loop, starting its thread if needed."""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=loop.run_forever, name=self.name,
+                                                daemon=True)
+                self._thread.start()
+                self._loop = loop
+            return self._loop
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None
+
+    def in_loop_thread(self) -> bool:
+        """Whether the caller is running on this loop's thread."""
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro: Coroutine) -> Future:
+        """
+        Schedule a coroutine on the loop from any thread.
+
+        Returns:
+            Future for the coroutine's result; cancelling it cancels the task
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """
+        Run a coroutine on the loop and wait for its result.
+
+        Raises:
+            RuntimeError: If called from the loop's own thread, which would deadlock
+            concurrent.futures.TimeoutError: If timeout expires (the task is cancelled)
+        """
+        if self.in_loop_thread():
+            coro.close()
+            raise RuntimeError("BackgroundLoop.run() called from its own loop; await instead")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def call_soon(self, callback: Callable, *args: Any) -> None:
+        """Call a function on the loop thread."""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """Cancel outstanding tasks, stop the loop and join its thread."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+
+        async def shutdown():
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if thread is not threading.current_thread():
+            try:
+                asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout)
+            except Exception as e:
+                log_debug(f"Background loop shutdown incomplete: {e!r}")
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+            if not thread.is_alive():
+                loop.close()
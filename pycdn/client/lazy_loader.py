@@ -9,7 +9,6 @@ from typing import Any, Dict, Optional, List, Callable, Union
 import httpx
 
 from ..utils.common import serialize_args, deserialize_result, log_debug
-from ..utils.encryption import get_global_encryption
 from .import_hook import register_hybrid_cdn, HybridCDNProxy
 
 
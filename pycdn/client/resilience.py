@@ -0,0 +1,299 @@
+"""
+Retry and failure-isolation policies for the PyCDN client.
+
+Shared by the sync CDNClient and the AsyncCDNClient so both transports
+classify errors, back off and trip breakers the same way. Only the sleep
+differs (time.sleep vs asyncio.sleep).
+"""
+
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from ..utils.common import log_debug
+
+
+# Statuses where the server rejected the request before running it
+REJECTED_STATUSES = frozenset({429, 503})
+
+# Statuses that indicate a transient server or gateway fault
+RETRYABLE_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+# Transport errors raised before the request reached the server
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# Transport errors where the server may or may not have executed the call
+AMBIGUOUS_ERRORS = (httpx.ReadTimeout, httpx.WriteTimeout, httpx.ReadError,
+                    httpx.WriteError, httpx.RemoteProtocolError)
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised when a call is refused because the endpoint's circuit is open."""
+
+
+class RetryPolicy:
+    """
+    Decides whether a failed attempt is retried and how long to wait.
+
+    Non-idempotent calls are only retried when the request provably never
+    executed (connection refused, pool exhausted, 429/503). Delays use
+    full-jitter exponential backoff, honouring Retry-After when present.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.1,
+                 max_delay: float = 5.0):
+        """
+        Initialize retry policy.
+
+        Args:
+            max_attempts: Total attempts per call, including the first
+            base_delay: Backoff ceiling for the first retry in seconds
+            max_delay: Upper bound for any single backoff in seconds
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def is_retryable(self, error: Exception, idempotent: bool) -> bool:
+        """
+        Classify an attempt failure.
+
+        Args:
+            error: Exception raised by the attempt
+            idempotent: Whether the call is safe to execute twice
+
+        Returns:
+            True if another attempt may be made
+        """
+        if isinstance(error, CircuitOpenError):
+            return False
+        if isinstance(error, httpx.HTTPStatusError):
+            status = error.response.status_code
+            if idempotent:
+                return status in RETRYABLE_STATUSES
+            return status in REJECTED_STATUSES
+        if isinstance(error, NOT_SENT_ERRORS):
+            return True
+        if isinstance(error, AMBIGUOUS_ERRORS):
+            return idempotent
+        # Decoding errors and anything unexpected will not fix themselves
+        return False
+
+    def is_server_failure(self, error: Exception) -> bool:
+        """Whether an error says the endpoint is unhealthy (breaker input)."""
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code >= 500
+        return isinstance(error, httpx.TransportError)
+
+    def backoff(self, attempt: int, error: Optional[Exception] = None) -> float:
+        """
+        Delay before the next attempt.
+
+        Args:
+            attempt: Number of attempts made so far (1 for the first retry)
+            error: Failure that triggered the retry
+
+        Returns:
+            Delay in seconds
+        """
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        delay = random.uniform(0, ceiling)
+
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def next_delay(self, error: Exception, attempt: int, idempotent: bool,
+                   budget: Optional["RetryBudget"] = None) -> Optional[float]:
+        """
+        Combine classification, attempt cap and budget into one decision.
+
+        Args:
+            error: Failure of the latest attempt
+            attempt: Number of attempts made so far
+            idempotent: Whether the call is safe to execute twice
+            budget: Shared retry budget to draw from
+
+        Returns:
+            Seconds to wait before retrying, or None to give up
+        """
+        if attempt >= self.max_attempts or not self.is_retryable(error, idempotent):
+            return None
+        if budget is not None and not budget.try_acquire():
+            log_debug("Retry budget exhausted, failing fast")
+            return None
+        return self.backoff(attempt, error)
+
+
+class RetryBudget:
+    """
+    Token bucket limiting retries to a fraction of overall traffic.
+
+    Every call deposits `ratio` tokens and every retry spends one, so in
+    steady state at most `ratio` extra requests are sent per call. A small
+    reserve refilling over time keeps low-traffic clients able to retry.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0,
+                 capacity: float = 10.0):
+        """
+        Initialize retry budget.
+
+        Args:
+            ratio: Tokens earned per call
+            min_per_second: Tokens earned per second regardless of traffic
+            capacity: Maximum tokens held
+        """
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity,
+                           self._tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def record_request(self) -> None:
+        """Deposit tokens for a new call."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + self.ratio)
+
+    def try_acquire(self) -> bool:
+        """Spend a token for one retry, returning False if none are left."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+    @property
+    def available(self) -> float:
+        """Tokens currently available."""
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+class CircuitBreaker:
+    """
+    Per-endpoint breaker that fails fast while a server is unhealthy.
+
+    Closed: calls flow; consecutive server failures are counted.
+    Open: calls raise CircuitOpenError until reset_timeout has passed.
+    Half-open: a single probe call is let through; success closes the
+    circuit, failure reopens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, endpoint: str, failure_threshold: int = 5,
+                 reset_timeout: float = 30.0):
+        """
+        Initialize circuit breaker.
+
+        Args:
+            endpoint: Endpoint URL, used in error messages
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds to stay open before probing again
+        """
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Current state, moving open circuits to half-open once they cool down."""
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self) -> None:
+        if (self._state == self.OPEN
+                and time.monotonic() - self._opened_at >= self.reset_timeout):
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+
+    def before_call(self) -> None:
+        """Admit a call or raise CircuitOpenError."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == self.CLOSED:
+                return
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+            raise CircuitOpenError(
+                f"Circuit open for {self.endpoint}, retry in {retry_in:.1f}s"
+            )
+
+    def record_success(self) -> None:
+        """Close the circuit after a healthy response."""
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """Count a server failure, opening the circuit at the threshold."""
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    log_debug(f"Circuit opened for {self.endpoint}")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+
+class CircuitBreakerRegistry:
+    """Lazily creates one CircuitBreaker per endpoint."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, endpoint: str) -> CircuitBreaker:
+        """Return the breaker guarding an endpoint."""
+        with self._lock:
+            breaker = self._breakers.get(endpoint)
+            if breaker is None:
+                breaker = CircuitBreaker(endpoint, self.failure_threshold, self.reset_timeout)
+                self._breakers[endpoint] = breaker
+            return breaker
+
+    def states(self) -> Dict[str, str]:
+        """Current state of every known endpoint."""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.endpoint: breaker.state for breaker in breakers}
+
+
+def _retry_after(error: Optional[Exception]) -> Optional[float]:
+    """Extract a numeric Retry-After header from an HTTP error."""
+    if not isinstance(error, httpx.HTTPStatusError):
+        return None
+    value = error.response.headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
@@ -0,0 +1,243 @@
+"""
+Client side of the persistent /rpc WebSocket.
+
+One RpcChannel per endpoint keeps a socket open on the client's background
+event loop. Calls from any thread (or from asyncio code) are sent as CALL
+frames with a fresh request ID, and a reader task routes RESULT and output
+frames back to the waiting caller, so many calls can be outstanding at
+once. Errors are raised as httpx transport errors so the retry policy
+classifies them like their HTTP equivalents.
+"""
+
+import asyncio
+import itertools
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+import httpx
+
+from ..utils.common import log_debug
+from .io_loop import BackgroundLoop
+from ..utils.wire import (
+    CALL, CANCEL, RESULT, STDERR, STDOUT, WireError, binary_fields, decode_frame,
+    encode_frame
+)
+
+# Token in X-PyCDN-Features announcing the /rpc endpoint
+RPC_FEATURE = "rpc"
+
+# Seconds a client uses plain HTTP after a channel failed to open
+RPC_RETRY_INTERVAL = 30.0
+
+
+class RpcUnavailable(httpx.ConnectError):
+    """The channel could not be opened; nothing was sent."""
+
+
+class RpcConnectionLost(httpx.ReadError):
+    """The socket closed while a call was outstanding."""
+
+
+def advertised_features(response: Any) -> Set[str]:
+    """Feature tokens in an HTTP response's X-PyCDN-Features header."""
+    headers = getattr(response, "headers", None)
+    try:
+        features = headers.get("x-pycdn-features") if headers is not None else None
+    except Exception:
+        return set()
+    if not isinstance(features, str):
+        return set()
+    return {f.strip() for f in features.split(",")}
+
+
+def advertises_rpc(response: Any) -> bool:
+    """Whether an HTTP response says its server accepts /rpc connections."""
+    return RPC_FEATURE in advertised_features(response)
+
+
+class RpcChannel:
+    """
+    A multiplexed RPC connection to one server.
+    """
+
+    def __init__(self, base_url: str, connect_timeout: float = 10.0,
+                 headers: Optional[Dict[str, str]] = None,
+                 io_loop: Optional[BackgroundLoop] = None):
+        """
+        Initialize RPC channel. Nothing is connected until the first call.
+
+        Args:
+            base_url: Server HTTP base URL
+            connect_timeout: Seconds allowed for the WebSocket handshake
+            headers: Extra handshake headers (e.g. Authorization)
+            io_loop: Loop the socket lives on; a private one if not given
+        """
+        self.url = base_url.replace("http://", "ws://", 1).replace("https://", "wss://", 1) + "/rpc"
+        self.connect_timeout = connect_timeout
+        self.headers = headers or {}
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, Tuple[Future, Optional[Callable]]] = {}
+        self._lock = threading.Lock()
+        self._owns_loop = io_loop is None
+        self._io = io_loop or BackgroundLoop("pycdn-rpc")
+        self._websocket = None
+
+    @property
+    def connected(self) -> bool:
+        return self._websocket is not None
+
+    def connect(self) -> None:
+        """
+        Open the socket if it is not open.
+
+        Raises:
+            RpcUnavailable: If the handshake fails
+        """
+        with self._lock:
+            if self._websocket is not None:
+                return
+            try:
+                self._websocket = self._io.run(self._open(), timeout=self.connect_timeout)
+            except Exception as e:
+                raise RpcUnavailable(f"Cannot open {self.url}: {e}") from e
+
+    async def _open(self):
+        try:
+            from websockets.asyncio.client import connect
+            header_option = "additional_headers"
+        except ImportError:  # websockets < 13
+            from websockets import connect
+            header_option = "extra_headers"
+
+        websocket = await connect(self.url, max_size=None, compression=None,
+                                  **{header_option: self.headers})
+        asyncio.get_running_loop().create_task(self._read(websocket))
+        return websocket
+
+    async def _read(self, websocket) -> None:
+        """Route incoming frames to their callers until the socket closes."""
+        error: Exception = RpcConnectionLost("RPC connection closed")
+        try:
+            async for data in websocket:
+                try:
+                    frame = decode_frame(data)
+                except WireError as e:
+                    log_debug(f"Ignoring malformed RPC frame: {e}")
+                    continue
+                if frame.kind == RESULT:
+                    with self._lock:
+                        future, _ = self._pending.pop(frame.request_id, (None, None))
+                    if future is not None and not future.done():
+                        future.set_result(frame.fields)
+                elif frame.kind in (STDOUT, STDERR):
+                    _, handler = self._pending.get(frame.request_id, (None, None))
+                    if handler is not None:
+                        handler("stdout" if frame.kind == STDOUT else "stderr",
+                                frame.fields["data"])
+        except Exception as e:
+            error = RpcConnectionLost(f"RPC connection lost: {e}")
+        finally:
+            with self._lock:
+                if self._websocket is websocket:
+                    self._websocket = None
+                pending, self._pending = self._pending, {}
+            for future, _ in pending.values():
+                if not future.done():
+                    future.set_exception(error)
+
+    def submit(self, request_data: Dict[str, Any],
+               output_handler: Optional[Callable] = None) -> Tuple[int, Future]:
+        """
+        Send a call without waiting for it.
+
+        Args:
+            request_data: /execute request body
+            output_handler: Called with (stream, text) as output arrives; the
+                server then streams output instead of returning it in the result
+
+        Returns:
+            Tuple of (request ID, future resolving to the result envelope)
+        """
+        self.connect()
+        request_id = next(self._ids)
+        future: Future = Future()
+        fields = binary_fields(request_data)
+        if output_handler is not None:
+            fields = {**fields, "stream": True}
+        frame = encode_frame(CALL, request_id, fields)
+
+        with self._lock:
+            websocket = self._websocket
+            if websocket is None:
+                raise RpcUnavailable("RPC connection closed before the call was sent")
+            self._pending[request_id] = (future, output_handler)
+
+        sent = self._io.submit(websocket.send(frame))
+
+        def on_sent(done):
+            if not done.cancelled() and done.exception() is not None:
+                self._fail(request_id, RpcConnectionLost(f"RPC send failed: {done.exception()}"))
+
+        sent.add_done_callback(on_sent)
+        return request_id, future
+
+    def call(self, request_data: Dict[str, Any], timeout: Optional[float] = None,
+             output_handler: Optional[Callable] = None) -> Dict[str, Any]:
+        """
+        Execute a call and wait for its result envelope.
+
+        Raises:
+            httpx.ReadTimeout: If no result arrives within timeout (the call is cancelled)
+        """
+        if self._io.in_loop_thread():
+            raise RuntimeError("RpcChannel.call() would block the I/O loop; use call_async()")
+        request_id, future = self.submit(request_data, output_handler)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            self.cancel(request_id)
+            raise httpx.ReadTimeout(f"RPC call {request_id} timed out")
+
+    async def call_async(self, request_data: Dict[str, Any],
+                         timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Like call(), awaiting the result on the caller's event loop."""
+        if not self.connected:
+            await asyncio.get_running_loop().run_in_executor(None, self.connect)
+        request_id, future = self.submit(request_data)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            self.cancel(request_id)
+            raise httpx.ReadTimeout(f"RPC call {request_id} timed out")
+        except asyncio.CancelledError:
+            self.cancel(request_id)
+            raise
+
+    def cancel(self, request_id: int) -> None:
+        """Abandon a call locally and ask the server to stop it."""
+        self._fail(request_id, None)
+        websocket = self._websocket
+        if websocket is not None:
+            self._io.submit(websocket.send(encode_frame(CANCEL, request_id, {})))
+
+    def _fail(self, request_id: int, error: Optional[Exception]) -> None:
+        with self._lock:
+            future, _ = self._pending.pop(request_id, (None, None))
+        if future is not None and not future.done():
+            if error is None:
+                future.cancel()
+            else:
+                future.set_exception(error)
+
+    def close(self) -> None:
+        """Close the socket, and the loop too if the channel created it."""
+        with self._lock:
+            websocket, self._websocket = self._websocket, None
+        if websocket is not None and self._io.running:
+            try:
+                self._io.run(websocket.close(), timeout=1.0)
+            except Exception as e:
+                log_debug(f"Error closing RPC socket: {e!r}")
+        if self._owns_loop:
+            self._io.stop()
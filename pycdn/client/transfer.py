@@ -0,0 +1,151 @@
+"""
+Client side of chunked result downloads.
+
+A ChunkedDownload writes a spilled result (see pycdn.utils.transfer) to an
+anonymous temporary file as its bytes arrive, checking each chunk against
+its checksum. Only the bytes of one read are in memory at a time. An
+interrupted download resumes at the first byte not yet written, and a
+chunk that fails its checksum is fetched again. The finished file is
+memory-mapped and decoded in place, so array buffers in the result are
+views of the mapping rather than copies.
+"""
+
+import hashlib
+import mmap
+import tempfile
+from typing import Any, Dict, Optional, Tuple
+
+from ..utils.transfer import CHECKSUM, ChecksumError, TransferError
+from ..utils.wire import RESULT, WireError, decode_frame
+
+# Consecutive failed attempts without progress before a download is abandoned
+RESUME_ATTEMPTS = 5
+
+# Seconds before the first resume attempt; doubled for each further one
+RESUME_DELAY = 0.5
+
+
+class ChunkedDownload:
+    """
+    One spilled result being downloaded.
+    """
+
+    def __init__(self, transfer: Dict[str, Any], directory: Optional[str] = None):
+        """
+        Args:
+            transfer: The "transfer" descriptor of a spilled result's envelope
+            directory: Where the temporary file is created (None for the default)
+        """
+        if transfer.get("checksum", CHECKSUM) != CHECKSUM:
+            raise TransferError(f"Unsupported checksum: {transfer.get('checksum')}")
+        self.result_id = transfer["id"]
+        self.size = int(transfer["size"])
+        self.chunk_size = int(transfer["chunk_size"])
+        self.checksums = list(transfer["checksums"])
+        self.position = 0
+        self._hasher = hashlib.new(CHECKSUM)
+        self._file = tempfile.TemporaryFile(dir=directory)
+
+    def __enter__(self) -> "ChunkedDownload":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    @property
+    def complete(self) -> bool:
+        return self.position >= self.size
+
+    def next_range(self) -> Tuple[int, int]:
+        """First and last byte to request next: the rest of the current chunk."""
+        chunk_end = min(self._chunk_start() + self.chunk_size, self.size)
+        return self.position, chunk_end - 1
+
+    def range_header(self) -> Dict[str, str]:
+        """Request headers asking for next_range()."""
+        start, end = self.next_range()
+        return {"Range": f"bytes={start}-{end}", "Accept-Encoding": "identity"}
+
+    def check_response(self, status_code: int, content_range: Optional[str]) -> None:
+        """
+        Reject a response that is not the range requested.
+
+        Raises:
+            TransferError: If the server did not answer with that range
+        """
+        start, _ = self.next_range()
+        if status_code == 404:
+            raise TransferError(f"Spilled result {self.result_id} expired before it was downloaded")
+        if status_code != 206 or not (content_range or "").startswith(f"bytes {start}-"):
+            raise TransferError(f"Unexpected response to a range request: {status_code} {content_range}")
+
+    def write(self, data: bytes) -> None:
+        """
+        Append received bytes, verifying each chunk as it completes.
+
+        Raises:
+            ChecksumError: If a chunk is corrupt; the download rewinds to
+                the start of that chunk
+            TransferError: If more bytes arrive than the result holds
+        """
+        view = memoryview(data)
+        while view:
+            if self.complete:
+                raise TransferError("Received more bytes than the result holds")
+            chunk_start = self._chunk_start()
+            piece = view[:min(chunk_start + self.chunk_size, self.size) - self.position]
+            self._file.write(piece)
+            self._hasher.update(piece)
+            self.position += len(piece)
+            view = view[len(piece):]
+
+            if self.position == min(chunk_start + self.chunk_size, self.size):
+                index = chunk_start // self.chunk_size
+                digest, self._hasher = self._hasher.hexdigest(), hashlib.new(CHECKSUM)
+                if digest != self.checksums[index]:
+                    self.position = chunk_start
+                    self._file.seek(chunk_start)
+                    self._file.truncate()
+                    raise ChecksumError(f"Chunk {index} of result {self.result_id} is corrupt")
+
+    def fields(self) -> Dict[str, Any]:
+        """
+        Result fields of the finished download, as serialize_result made them.
+
+        Raises:
+            TransferError: If the download is incomplete or not a result
+        """
+        if not self.complete:
+            raise TransferError(f"Download of result {self.result_id} is incomplete")
+        self._file.flush()
+        # The mapping outlives the file; buffers decoded from it keep it open
+        data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            frame = decode_frame(data)
+        except WireError as e:
+            raise TransferError(f"Spilled result {self.result_id} is malformed: {e}") from e
+        if frame.kind != RESULT:
+            raise TransferError(f"Spilled result {self.result_id} is not a result frame")
+        fields = frame.fields
+        if fields.pop("text", False) and fields.get("serialization_method") != "json":
+            fields["result"] = fields["result"].decode()
+        return fields
+
+    def close(self) -> None:
+        self._file.close()
+
+    def _chunk_start(self) -> int:
+        return self.position - self.position % self.chunk_size
+
+
+def resume_delay(failures: int) -> float:
+    """Seconds to wait before resuming after this many failed attempts."""
+    return RESUME_DELAY * (2 ** (failures - 1))
+
+
+def merge_envelope(envelope: Dict[str, Any], fields: Dict[str, Any]) -> Dict[str, Any]:
+    """The result envelope a downloaded result stands for."""
+    result = {key: value for key, value in envelope.items() if key != "transfer"}
+    result.update(fields)
+    result["downloaded"] = True
+    return result
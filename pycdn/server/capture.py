@@ -0,0 +1,128 @@
+"""
+Per-request stdout/stderr capture for PyCDN executions.
+
+redirect_stdout swaps the process-wide sys.stdout, so two executions running
+in different threads overwrite and then mis-restore each other's streams.
+Instead, sys.stdout and sys.stderr are replaced once by routing proxies that
+look up the current request's sink in a context variable. Writes outside a
+capture go straight to the original stream at the cost of one
+ContextVar.get(); nothing is installed until the first capture.
+
+Threads started by the executed function do not inherit the context, so
+their output goes to the server's own streams.
+"""
+
+import io
+import sys
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, TextIO
+
+# Characters kept per stream for an /execute response
+DEFAULT_CAPTURE_LIMIT = 64 * 1024
+
+# Sink for the current execution: anything with write(stream, text)
+_current_sink: ContextVar[Optional[Any]] = ContextVar("pycdn_output_sink", default=None)
+_install_lock = threading.Lock()
+
+
+class RoutingStream(io.TextIOBase):
+    """
+    Stand-in for sys.stdout/sys.stderr that writes to the current sink.
+    """
+
+    def __init__(self, name: str, fallback: TextIO):
+        """
+        Initialize routing stream.
+
+        Args:
+            name: "stdout" or "stderr", passed to the sink
+            fallback: Original stream used outside a capture
+        """
+        self.name = name
+        self.fallback = fallback
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        sink = _current_sink.get()
+        if sink is None:
+            return self.fallback.write(text)
+        sink.write(self.name, text)
+        return len(text)
+
+    def flush(self) -> None:
+        if _current_sink.get() is None:
+            self.fallback.flush()
+
+    def isatty(self) -> bool:
+        return _current_sink.get() is None and self.fallback.isatty()
+
+    def __getattr__(self, attr: str) -> Any:
+        # encoding, fileno, buffer, ... come from the real stream
+        return getattr(self.fallback, attr)
+
+
+class OutputBuffer:
+    """
+    Bounded capture of one execution's stdout and stderr.
+    """
+
+    def __init__(self, limit: int = DEFAULT_CAPTURE_LIMIT):
+        """
+        Initialize output buffer.
+
+        Args:
+            limit: Characters kept per stream; the rest is counted and dropped
+        """
+        self.limit = limit
+        self._parts: Dict[str, list] = {"stdout": [], "stderr": []}
+        self._sizes = {"stdout": 0, "stderr": 0}
+        self.dropped = {"stdout": 0, "stderr": 0}
+
+    def write(self, stream: str, text: str) -> None:
+        room = self.limit - self._sizes[stream]
+        if room < len(text):
+            self.dropped[stream] += len(text) - max(room, 0)
+            text = text[:max(room, 0)]
+        if text:
+            self._parts[stream].append(text)
+            self._sizes[stream] += len(text)
+
+    def getvalue(self, stream: str) -> Optional[str]:
+        """Captured text for a stream, or None if nothing was written."""
+        text = "".join(self._parts[stream])
+        if self.dropped[stream]:
+            text += f"\n[pycdn: {self.dropped[stream]} characters of {stream} truncated]\n"
+        return text or None
+
+
+def install() -> None:
+    """Put routing proxies in place of sys.stdout/sys.stderr if they are not already."""
+    with _install_lock:
+        if not isinstance(sys.stdout, RoutingStream):
+            sys.stdout = RoutingStream("stdout", sys.stdout)
+        if not isinstance(sys.stderr, RoutingStream):
+            sys.stderr = RoutingStream("stderr", sys.stderr)
+
+
+@contextmanager
+def capture_output(sink: Any) -> Iterator[Any]:
+    """
+    Route print() and other stdout/stderr writes in this context to sink.
+
+    Args:
+        sink: Object with write(stream, text), e.g. OutputBuffer or OutputChannel
+
+    Yields:
+        The sink
+    """
+    if not (isinstance(sys.stdout, RoutingStream) and isinstance(sys.stderr, RoutingStream)):
+        install()
+    token = _current_sink.set(sink)
+    try:
+        yield sink
+    finally:
+        _current_sink.reset(token)
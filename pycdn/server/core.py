@@ -9,17 +9,31 @@ import threading
 import time
 import traceback
 import subprocess
-from contextlib import redirect_stdout, redirect_stderr
-from io import StringIO
-from typing import Any, Dict, List, Optional, Set
-from fastapi import FastAPI, HTTPException, BackgroundTasks, WebSocket, WebSocketDisconnect
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Set, Union
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
 import uvicorn
 import json
 
 from .runtime import PackageRuntime
-from ..utils.common import log_debug, validate_package_name, serialize_for_transport, deserialize_from_transport
+from .credentials import CredentialConflictError
+from .capture import OutputBuffer, capture_output, DEFAULT_CAPTURE_LIMIT
+from .fanout import FanoutHub
+from .middleware import CompressionMiddleware, FeatureHeaderMiddleware
+from .results import RangeNotSatisfiable, ResultStore
+from .rpc import RpcSession, SERVER_FEATURES
+from .sessions import SessionError, SessionManager, ShellSession
+from ..utils.wire import (
+    CALL, FRAME_CONTENT_TYPE, RESULT, WireError, binary_fields, decode_frame, encode_frame, text_fields
+)
+from .streaming import OutputChannel, pump_output, DEFAULT_FLUSH_INTERVAL, DEFAULT_MAX_BUFFER
+from ..utils.compression import DEFAULT_THRESHOLD, CompressionStats, supported_encodings
+from ..utils.transfer import CHUNKED, DEFAULT_CHUNK_SIZE, DEFAULT_SPILL_THRESHOLD, TRANSFER_HEADER
+from ..utils.type_codecs import CODECS_HEADER, parse_codecs
+from ..utils.common import log_debug, parse_size, validate_package_name, serialize_for_transport, deserialize_from_transport
 
 
 # Pydantic models for API requests/responses
@@ -30,6 +44,7 @@ class ExecuteRequest(BaseModel):
     args: str
     kwargs: str
     serialization_method: str = "json"
+    buffers: Optional[List[str]] = None
 
 
 class ExecuteResponse(BaseModel):
@@ -39,6 +54,23 @@ class ExecuteResponse(BaseModel):
     serialization_method: str
     error: Optional[str] = None
     error_type: Optional[str] = None
+    stdout: Optional[str] = None
+    stderr: Optional[str] = None
+    buffers: Optional[List[str]] = None
+    transfer: Optional[Dict[str, Any]] = None
+
+
+class CredentialRequest(BaseModel):
+    """Request model for registering a credential."""
+    secret: Union[Dict[str, Any], str]
+    ttl: Optional[float] = None
+    handle: Optional[str] = None
+
+
+class CredentialResponse(BaseModel):
+    """Response model for a registered credential."""
+    handle: str
+    expires_in: float
 
 
 class PackageInfo(BaseModel):
@@ -154,7 +186,23 @@ class CDNServer:
         host: str = "localhost",
         port: int = 8000,
         debug: bool = False,
-        allowed_packages: Optional[List[str]] = None
+        allowed_packages: Optional[List[str]] = None,
+        http2: bool = False,
+        keepalive_timeout: float = 30.0,
+        stream_flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        stream_buffer_size: int = DEFAULT_MAX_BUFFER,
+        capture_output: bool = True,
+        capture_limit: int = DEFAULT_CAPTURE_LIMIT,
+        fanout_queue_size: int = 256,
+        fanout_overflow: str = "drop_oldest",
+        session_idle_timeout: float = 300.0,
+        max_sessions: int = 32,
+        memory_budget: Optional[Union[int, str]] = None,
+        max_message_size: int = 1024 ** 3,
+        compression_threshold: Optional[int] = DEFAULT_THRESHOLD,
+        spill_threshold: Optional[int] = DEFAULT_SPILL_THRESHOLD,
+        spill_chunk_size: int = DEFAULT_CHUNK_SIZE,
+        spill_directory: Optional[str] = None
     ):
         """
         Initialize CDN server.
@@ -164,11 +212,49 @@ class CDNServer:
             port: Server port
             debug: Enable debug mode
             allowed_packages: List of allowed packages (None for all)
+            http2: Serve HTTP/2 (including cleartext h2c) through hypercorn
+                instead of uvicorn; requires the 'http2' extra
+            keepalive_timeout: Seconds an idle client connection is kept open
+            stream_flush_interval: Seconds WebSocket output is coalesced before sending
+            stream_buffer_size: Characters of output buffered per streamed
+                execution before the function is made to wait for the socket
+            capture_output: Return what /execute calls print as stdout/stderr
+            capture_limit: Characters of each stream kept per /execute call
+            fanout_queue_size: Output messages queued per /stream subscriber
+            fanout_overflow: What to do when a subscriber falls behind:
+                "drop_oldest", "drop_newest" or "disconnect"
+            session_idle_timeout: Seconds a detached interactive session is
+                kept before its shell is closed
+            max_sessions: Interactive sessions allowed at once
+            memory_budget: Memory loaded packages may use, in bytes or as a
+                size string like "2GB"; least recently used packages are
+                evicted beyond it (None for no limit)
+            max_message_size: Largest WebSocket message accepted, in bytes;
+                RPC calls carrying large arrays need it above the server
+                library's 16MB default
+            compression_threshold: Smallest response body compressed when
+                the client accepts gzip or zstd, in bytes (None to disable);
+                compressed request bodies are accepted either way
+            spill_threshold: Smallest result payload, in bytes, written to
+                disk and downloaded in chunks by clients that support it
+                (None to always send results inline)
+            spill_chunk_size: Bytes per checksummed download chunk
+            spill_directory: Where spilled results are kept (None for a
+                temporary directory)
         """
         self.host = host
         self.port = port
         self.debug = debug
         self.allowed_packages = set(allowed_packages) if allowed_packages else None
+        self.http2 = http2
+        self.keepalive_timeout = keepalive_timeout
+        self.max_message_size = max_message_size
+        self.compression_threshold = compression_threshold
+        self.compression_stats = {"responses": CompressionStats(), "requests": CompressionStats()}
+        self.stream_flush_interval = stream_flush_interval
+        self.stream_buffer_size = stream_buffer_size
+        self.capture_output = capture_output
+        self.capture_limit = capture_limit
         
         # Initialize FastAPI app
         self.app = FastAPI(
@@ -179,11 +265,15 @@ class CDNServer:
         )
         
         # Initialize package runtime
-        self.runtime = PackageRuntime()
+        if isinstance(memory_budget, str):
+            memory_budget = parse_size(memory_budget)
+        self.runtime = PackageRuntime(memory_budget=memory_budget)
+        self.results = ResultStore(spill_directory, spill_threshold, spill_chunk_size)
         
         # WebSocket connections for streaming output
         self.active_connections: Set[WebSocket] = set()
-        self.session_streams: Dict[str, List[WebSocket]] = {}
+        self.hub = FanoutHub(max_queue=fanout_queue_size, overflow=fanout_overflow)
+        self.sessions = SessionManager(idle_timeout=session_idle_timeout, max_sessions=max_sessions)
         
         self.stats = {
             "requests_served": 0,
@@ -205,6 +295,17 @@ class CDNServer:
             allow_credentials=True,
             allow_methods=["*"],
             allow_headers=["*"],
+            expose_headers=["X-PyCDN-Features"],
+        )
+        # Request encodings are advertised so clients know what they may send
+        features = ", ".join([SERVER_FEATURES, *supported_encodings()])
+        self.app.add_middleware(FeatureHeaderMiddleware, features=features)
+        self.app.add_middleware(
+            CompressionMiddleware,
+            threshold=self.compression_threshold,
+            max_body_size=self.max_message_size,
+            response_stats=self.compression_stats["responses"],
+            request_stats=self.compression_stats["requests"],
         )
     
     def _setup_routes(self) -> None:
@@ -225,30 +326,89 @@ class CDNServer:
             return {"status": "healthy", "server": "pycdn"}
         
         @self.app.post("/execute", response_model=ExecuteResponse)
-        async def execute_function(request: ExecuteRequest):
-            """Execute a function on a package."""
+        async def execute_function(http_request: Request):
+            """
+            Execute a function on a package.
+            
+            Takes an ExecuteRequest as JSON, or as a CALL frame with content
+            type application/x-pycdn-frame; answers with a RESULT frame if
+            the client accepts that type.
+            """
+            request = await self._read_execute_request(http_request)
+            package_name = request["package_name"]
             
             # Validate package access
-            if self.allowed_packages and request.package_name not in self.allowed_packages:
+            if self.allowed_packages and package_name not in self.allowed_packages:
                 raise HTTPException(
                     status_code=403,
-                    detail=f"Package {request.package_name} not allowed"
+                    detail=f"Package {package_name} not allowed"
                 )
             
             # Execute function
             serialized_args = {
-                "args": request.args,
-                "kwargs": request.kwargs,
-                "serialization_method": request.serialization_method
+                "args": request["args"],
+                "kwargs": request["kwargs"],
+                "serialization_method": request.get("serialization_method") or "json",
+                "buffers": request.get("buffers")
             }
             
-            result = self.runtime.execute_remote_function(
-                request.package_name,
-                request.function_name,
-                serialized_args
+            # Run in a worker so slow functions don't block the event loop
+            result = await asyncio.get_running_loop().run_in_executor(
+                None,
+                self._execute_captured,
+                package_name,
+                request["function_name"],
+                serialized_args,
+                parse_codecs(http_request.headers.get(CODECS_HEADER)),
+                http_request.headers.get(TRANSFER_HEADER) == CHUNKED
             )
+            self._broadcast_output(package_name, result)
             
-            return ExecuteResponse(**result)
+            if FRAME_CONTENT_TYPE in http_request.headers.get("accept", ""):
+                return Response(encode_frame(RESULT, 0, binary_fields(result)),
+                                media_type=FRAME_CONTENT_TYPE)
+            return ExecuteResponse(**text_fields(result))
+        
+        @self.app.get("/results/{result_id}")
+        async def download_result(result_id: str, http_request: Request):
+            """Serve a spilled result, or the byte range of it the Range header asks for."""
+            range_header = http_request.headers.get("range")
+            try:
+                body, start, end, size = self.results.open_range(result_id, range_header)
+            except KeyError:
+                raise HTTPException(status_code=404, detail="Result expired or unknown")
+            except RangeNotSatisfiable as e:
+                return Response(str(e), status_code=416, headers={"Content-Range": f"bytes */{e.size}"})
+            headers = {"Content-Length": str(end - start + 1), "Accept-Ranges": "bytes"}
+            if range_header:
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            return StreamingResponse(body, status_code=206 if range_header else 200,
+                                     headers=headers, media_type="application/octet-stream")
+        
+        @self.app.delete("/results/{result_id}")
+        async def delete_result(result_id: str):
+            """Delete a spilled result once it has been downloaded."""
+            return {"deleted": self.results.discard(result_id)}
+        
+        @self.app.post("/credentials", response_model=CredentialResponse)
+        async def register_credential(request: CredentialRequest):
+            """Store a secret once and return a handle for later calls."""
+            try:
+                handle, expires_in = self.runtime.credentials.register(
+                    request.secret, request.ttl, request.handle
+                )
+            except CredentialConflictError as e:
+                raise HTTPException(status_code=409, detail=str(e))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            return CredentialResponse(handle=handle, expires_in=expires_in)
+        
+        @self.app.delete("/credentials/{handle}")
+        async def revoke_credential(handle: str):
+            """Forget a credential handle."""
+            if not self.runtime.credentials.revoke(handle):
+                raise HTTPException(status_code=404, detail="Unknown credential handle")
+            return {"message": "Credential revoked"}
         
         @self.app.get("/packages/{package_name}/info", response_model=PackageInfo)
         async def get_package_info(package_name: str):
@@ -278,6 +438,31 @@ class CDNServer:
             stats["loaded_packages"] = self.runtime.list_loaded_packages()
             return ServerStats(**stats)
         
+        @self.app.get("/stats/fanout")
+        async def get_fanout_stats():
+            """Get WebSocket fan-out statistics."""
+            return self.hub.metrics()
+        
+        @self.app.get("/stats/memory")
+        async def get_memory_stats():
+            """Get package memory accounting and eviction statistics."""
+            return self.runtime.get_memory_stats()
+        
+        @self.app.get("/stats/compression")
+        async def get_compression_stats():
+            """Get response compression and request decompression statistics."""
+            return {
+                "threshold": self.compression_threshold,
+                "encodings": supported_encodings(),
+                **{direction: stats.snapshot() for direction, stats in self.compression_stats.items()}
+            }
+        
+        @self.app.get("/stats/results")
+        async def get_result_stats():
+            """Get statistics of results spilled to disk for chunked download."""
+            return {"threshold": self.results.threshold, "chunk_size": self.results.chunk_size,
+                    **self.results.stats}
+        
         @self.app.delete("/packages/{package_name}/cache")
         async def clear_package_cache(package_name: str):
             """Clear cache for a specific package."""
@@ -295,10 +480,7 @@ class CDNServer:
             """WebSocket endpoint for real-time output streaming"""
             await websocket.accept()
             self.active_connections.add(websocket)
-            
-            if package_name not in self.session_streams:
-                self.session_streams[package_name] = []
-            self.session_streams[package_name].append(websocket)
+            subscriber = self.hub.subscribe(package_name, websocket)
             
             self.stats["active_sessions"] += 1
             
@@ -333,42 +515,65 @@ class CDNServer:
                 pass
             finally:
                 self.active_connections.discard(websocket)
-                if package_name in self.session_streams:
-                    if websocket in self.session_streams[package_name]:
-                        self.session_streams[package_name].remove(websocket)
-                    if not self.session_streams[package_name]:
-                        del self.session_streams[package_name]
+                await self.hub.unsubscribe(subscriber)
                 self.stats["active_sessions"] -= 1
 
+        @self.app.websocket("/rpc")
+        async def rpc_session(websocket: WebSocket):
+            """WebSocket endpoint multiplexing many calls over one connection"""
+            await websocket.accept()
+            self.active_connections.add(websocket)
+            try:
+                await RpcSession(self, websocket).run()
+            finally:
+                self.active_connections.discard(websocket)
+
         @self.app.websocket("/interactive/{package_name}")
-        async def interactive_session(websocket: WebSocket, package_name: str):
+        async def interactive_session(websocket: WebSocket, package_name: str,
+                                      session_id: Optional[str] = None):
             """WebSocket endpoint for interactive CLI sessions"""
             await websocket.accept()
             
+            if self.allowed_packages and package_name not in self.allowed_packages:
+                await websocket.send_json({"type": "error", "message": f"Package {package_name} not allowed"})
+                await websocket.close(code=1008)
+                return
+            
+            try:
+                # Resume the requested session if it is still alive
+                session, resumed = await self.sessions.open(package_name, session_id)
+            except Exception as e:
+                await websocket.send_json({"type": "error", "message": f"Cannot start session: {e}"})
+                await websocket.close(code=1011)
+                return
+            
+            await websocket.send_json({
+                "type": "session_start",
+                "session_id": session.session_id,
+                "package": package_name,
+                "resumed": resumed
+            })
+            
+            pump = asyncio.create_task(self._pump_session(websocket, session))
+            session.attach(pump)
             try:
-                # Create an interactive session
-                session_id = f"{package_name}_{int(time.time())}"
-                
-                await websocket.send_json({
-                    "type": "session_start",
-                    "session_id": session_id,
-                    "package": package_name
-                })
-                
-                # Handle interactive commands
                 while True:
-                    data = await websocket.receive_text()
-                    message = json.loads(data)
-                    
-                    if message.get("type") == "command":
-                        await self._handle_interactive_command(websocket, package_name, message)
-                    elif message.get("type") == "input":
-                        # Handle user input for interactive programs
-                        await self._send_input_to_process(websocket, session_id, message["data"])
-                        
+                    message = json.loads(await websocket.receive_text())
+                    await self._handle_session_message(websocket, session, message)
             except WebSocketDisconnect:
-                # Clean up session
                 pass
+            finally:
+                # The shell keeps running until it is re-attached or reaped
+                pump.cancel()
+                session.detach(pump)
+                self.sessions.discard_if_ended(session)
+
+        @self.app.get("/stats/sessions")
+        async def get_session_stats():
+            """Get interactive session statistics."""
+            return self.sessions.metrics()
+
+        self.app.router.on_shutdown.append(self.sessions.close_all)
 
         @self.app.get("/stats")
         async def get_stats():
@@ -386,10 +591,16 @@ class CDNServer:
         Args:
             **kwargs: Additional arguments for uvicorn
         """
+        if self.http2:
+            asyncio.run(self._serve_http2(**kwargs))
+            return
+
         config = {
             "host": self.host,
             "port": self.port,
             "log_level": "debug" if self.debug else "info",
+            "timeout_keep_alive": self.keepalive_timeout,
+            "ws_max_size": self.max_message_size,
             **kwargs
         }
         
@@ -402,17 +613,59 @@ class CDNServer:
         
         Args:
             **kwargs: Additional arguments for uvicorn config
+                (hypercorn config attributes when http2 is enabled)
         """
+        if self.http2:
+            await self._serve_http2(**kwargs)
+            return
+
         config = uvicorn.Config(
             self.app,
             host=self.host,
             port=self.port,
             log_level="debug" if self.debug else "info",
-            **kwargs
+            **{"timeout_keep_alive": self.keepalive_timeout,
+               "ws_max_size": self.max_message_size,
+               **kwargs}
         )
         
         server = uvicorn.Server(config)
         await server.serve()
+
+    async def _serve_http2(self, **kwargs) -> None:
+        """
+        Serve the app over HTTP/2 with hypercorn.
+
+        Hypercorn accepts h2c with prior knowledge on plain TCP, so clients
+        created with CDNClient(http2=True) multiplex all calls over a few
+        connections.
+
+        Args:
+            **kwargs: Additional hypercorn config attributes
+        """
+        try:
+            from hypercorn.asyncio import serve
+            from hypercorn.config import Config
+        except ImportError as e:
+            raise ImportError(
+                "HTTP/2 serving requires hypercorn: pip install 'pycdn[http2]'"
+            ) from e
+
+        config = Config()
+        config.bind = [f"{self.host}:{self.port}"]
+        config.loglevel = "DEBUG" if self.debug else "INFO"
+        config.keep_alive_timeout = self.keepalive_timeout
+        config.websocket_max_message_size = self.max_message_size
+        for key, value in kwargs.items():
+            setattr(config, key, value)
+
+        # Signal handlers can only be installed from the main thread
+        shutdown_trigger = None
+        if threading.current_thread() is not threading.main_thread():
+            shutdown_trigger = asyncio.Event().wait
+
+        log_debug(f"Starting HTTP/2 CDN server at {self.host}:{self.port}")
+        await serve(self.app, config, shutdown_trigger=shutdown_trigger)
     
     def add_allowed_package(self, package_name: str) -> None:
         """
@@ -439,32 +692,48 @@ class CDNServer:
         """Get list of allowed packages."""
         return self.allowed_packages.copy() if self.allowed_packages else None
 
-    async def _broadcast_output(self, package_name: str, message: Dict):
-        """Broadcast output to all connected WebSocket clients for a package"""
-        if package_name in self.session_streams:
-            dead_connections = []
-            for websocket in self.session_streams[package_name]:
-                try:
-                    await websocket.send_json(message)
-                except:
-                    dead_connections.append(websocket)
-            
-            # Clean up dead connections
-            for conn in dead_connections:
-                self.session_streams[package_name].remove(conn)
-                self.active_connections.discard(conn)
+    async def _read_execute_request(self, request: Request) -> Dict[str, Any]:
+        """
+        Parse an /execute body, JSON or frame-encoded.
+        
+        Frame fields keep their raw bytes (args, kwargs and buffers are
+        never base64-encoded), so only the presence of the required keys
+        is checked; JSON bodies are validated against ExecuteRequest.
+        """
+        body = await request.body()
+        if request.headers.get("content-type", "").startswith(FRAME_CONTENT_TYPE):
+            try:
+                frame = decode_frame(body)
+            except WireError as e:
+                raise HTTPException(status_code=400, detail=f"Malformed frame: {e}")
+            missing = [key for key in ("package_name", "function_name", "args", "kwargs")
+                       if key not in frame.fields]
+            if frame.kind != CALL or missing:
+                raise HTTPException(status_code=400, detail=f"Invalid call frame, missing {missing}")
+            return frame.fields
+        
+        try:
+            payload = ExecuteRequest(**json.loads(body))
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+        except (ValueError, TypeError) as e:
+            raise RequestValidationError([{"loc": ("body",), "msg": str(e), "type": "value_error.json"}])
+        return payload.model_dump() if hasattr(payload, "model_dump") else payload.dict()
+
+    def _broadcast_output(self, package_name: str, result: Dict[str, Any]):
+        """Publish captured /execute output to the package's /stream subscribers"""
+        for stream in ("stdout", "stderr"):
+            if result.get(stream):
+                self.hub.publish(package_name, {"type": stream, "data": result[stream]})
 
     async def _execute_with_stream(self, websocket: WebSocket, message: Dict):
-        """Execute function with real-time output streaming"""
+        """Execute function, forwarding its output while it runs"""
         try:
             package_name = message["package"]
             function_name = message["function"]
-            args = message.get("args", [])
-            kwargs = message.get("kwargs", {})
             
-            # Create output capture
-            output_buffer = StringIO()
-            error_buffer = StringIO()
+            if self.allowed_packages and package_name not in self.allowed_packages:
+                raise PermissionError(f"Package '{package_name}' not allowed")
             
             # Stream start notification
             await websocket.send_json({
@@ -473,32 +742,41 @@ class CDNServer:
                 "package": package_name
             })
             
-            with redirect_stdout(output_buffer), redirect_stderr(error_buffer):
-                result = self.runtime.execute_function(package_name, function_name, args, kwargs)
+            if "serialized_args" in message:
+                # Same argument format and result envelope as /execute
+                accepted_codecs = parse_codecs(message.get("codecs"))
+                spill = message.get("transfer") == CHUNKED
+                
+                def call():
+                    result = self.runtime.execute_remote_function(
+                        package_name, function_name, message["serialized_args"], accepted_codecs)
+                    return self.results.spill(result) if spill else result
+            else:
+                def call():
+                    with self.runtime.checkout(package_name) as env:
+                        return env.execute_function(
+                            function_name, tuple(message.get("args", [])), message.get("kwargs", {}))
             
-            # Send captured output
-            stdout_content = output_buffer.getvalue()
-            stderr_content = error_buffer.getvalue()
+            async def send(output: Dict[str, Any]):
+                # Monitors of the package see the output too, the requester once
+                self.hub.publish(package_name, output, exclude=websocket)
+                await websocket.send_json(output)
             
-            if stdout_content:
-                await websocket.send_json({
-                    "type": "stdout",
-                    "data": stdout_content
-                })
+            result = await self._run_with_output(call, send)
             
-            if stderr_content:
+            # Send result
+            if "serialized_args" in message:
+                await websocket.send_json({"type": "result", "function": function_name,
+                                           **text_fields(result)})
+            else:
                 await websocket.send_json({
-                    "type": "stderr", 
-                    "data": stderr_content
+                    "type": "result",
+                    "data": serialize_for_transport(result),
+                    "function": function_name
                 })
             
-            # Send result
-            await websocket.send_json({
-                "type": "result",
-                "data": serialize_for_transport(result),
-                "function": function_name
-            })
-            
+        except WebSocketDisconnect:
+            raise
         except Exception as e:
             await websocket.send_json({
                 "type": "error",
@@ -506,59 +784,76 @@ class CDNServer:
                 "traceback": traceback.format_exc() if self.debug else None
             })
 
-    async def _handle_interactive_command(self, websocket: WebSocket, package_name: str, message: Dict):
-        """Handle interactive CLI commands"""
+    async def _run_with_output(self, call: Callable[[], Any],
+                               send: Callable[[Dict[str, Any]], Awaitable[None]]) -> Any:
+        """Run call in a worker, passing its output to send while it runs"""
+        loop = asyncio.get_running_loop()
+        channel = OutputChannel(loop, max_buffer=self.stream_buffer_size)
+        pump = asyncio.create_task(pump_output(channel, send, interval=self.stream_flush_interval))
         try:
-            command = message["command"]
-            
-            # Execute command in subprocess for better control
-            process = await asyncio.create_subprocess_shell(
-                command,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                stdin=asyncio.subprocess.PIPE
-            )
-            
-            # Stream output in real-time
-            async def stream_output():
-                while True:
-                    line = await process.stdout.readline()
-                    if not line:
-                        break
-                    await websocket.send_json({
-                        "type": "stdout",
-                        "data": line.decode()
-                    })
-            
-            async def stream_errors():
-                while True:
-                    line = await process.stderr.readline()
-                    if not line:
-                        break
-                    await websocket.send_json({
-                        "type": "stderr",
-                        "data": line.decode()
-                    })
-            
-            # Start streaming tasks
-            await asyncio.gather(stream_output(), stream_errors())
-            
-            # Wait for process completion
-            return_code = await process.wait()
-            
-            await websocket.send_json({
-                "type": "command_complete",
-                "return_code": return_code
-            })
-            
-        except Exception as e:
-            await websocket.send_json({
-                "type": "error",
-                "message": f"Command execution failed: {str(e)}"
-            })
+            result = await loop.run_in_executor(None, self._run_streamed, channel, call)
+        except asyncio.CancelledError:
+            # The worker thread can't be stopped; let it finish without blocking
+            channel.abort()
+            pump.cancel()
+            raise
+        except Exception:
+            channel.finish()
+            await pump
+            raise
+        channel.finish()
+        await pump
+        return result
+
+    def _run_streamed(self, channel: OutputChannel, call: Callable[[], Any]) -> Any:
+        """Run call in a worker thread with stdout/stderr feeding the channel"""
+        with capture_output(channel):
+            return call()
 
-    async def _send_input_to_process(self, websocket: WebSocket, session_id: str, input_data: str):
-        """Send input to interactive process"""
-        # This would need session management for persistent processes
-        # Implementation depends on specific requirements
-        pass 
\ No newline at end of file
+    def _execute_captured(self, package_name: str, function_name: str,
+                          serialized_args: Dict[str, str],
+                          accepted_codecs: Optional[FrozenSet[str]] = None,
+                          spill: bool = False) -> Dict[str, Any]:
+        """Execute a remote call, adding what it printed to the result"""
+        if not self.capture_output:
+            result = self.runtime.execute_remote_function(
+                package_name, function_name, serialized_args, accepted_codecs)
+        else:
+            with capture_output(OutputBuffer(self.capture_limit)) as output:
+                result = self.runtime.execute_remote_function(
+                    package_name, function_name, serialized_args, accepted_codecs)
+            result = {**result, "stdout": output.getvalue("stdout"), "stderr": output.getvalue("stderr")}
+        # Spilling runs here, in the worker thread, to keep disk writes off the event loop
+        return self.results.spill(result) if spill else result
+
+    async def _handle_session_message(self, websocket: WebSocket, session: ShellSession, message: Dict):
+        """Apply one client message to an interactive session"""
+        try:
+            kind = message.get("type")
+            if kind == "command":
+                session.run_command(message["command"])
+            elif kind == "input":
+                session.send_input(message["data"])
+            elif kind == "interrupt":
+                session.interrupt()
+            elif kind == "close":
+                await self.sessions.close(session)
+        except (SessionError, KeyError) as e:
+            await websocket.send_json({"type": "error", "message": f"Command execution failed: {e}"})
+
+    async def _pump_session(self, websocket: WebSocket, session: ShellSession):
+        """Send a session's output and completion events to its client"""
+        try:
+            while True:
+                kind, value = await session.next_event()
+                if kind == "stdout":
+                    await websocket.send_json({"type": "stdout", "data": value})
+                else:
+                    await websocket.send_json({"type": kind, "return_code": value})
+                if kind == "session_end":
+                    self.sessions.discard_if_ended(session)
+                    return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log_debug(f"Interactive session {session.session_id} client lost: {e!r}")
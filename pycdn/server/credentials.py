@@ -0,0 +1,147 @@
+"""
+Server-side credential store for PyCDN.
+
+Clients upload a secret once (Fernet-encrypted in transit), receive an
+opaque handle with a TTL, and from then on send only the handle in call
+arguments as {"__pycdn_credential__": handle}. The secret is decrypted a
+single time at registration instead of on every call.
+"""
+
+import secrets
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from ..utils.common import log_debug
+from ..utils.encryption import get_global_encryption
+
+CREDENTIAL_MARKER = "__pycdn_credential__"
+MIN_HANDLE_LENGTH = 32
+
+
+class CredentialExpiredError(KeyError):
+    """Raised when a call references an unknown or expired credential handle."""
+
+    def __str__(self) -> str:
+        return f"Credential handle expired or unknown: {self.args[0] if self.args else ''}"
+
+
+class CredentialConflictError(ValueError):
+    """Raised when a proposed handle is already bound to a different secret."""
+
+
+class CredentialStore:
+    """
+    In-memory secrets keyed by opaque handles, each with an expiry.
+    """
+
+    def __init__(self, default_ttl: float = 3600.0, max_ttl: float = 86400.0,
+                 max_entries: int = 10000):
+        """
+        Initialize credential store.
+
+        Args:
+            default_ttl: Lifetime in seconds when the client does not ask for one
+            max_ttl: Upper bound on any requested lifetime
+            max_entries: Maximum live handles; the soonest to expire are evicted
+        """
+        self.default_ttl = default_ttl
+        self.max_ttl = max_ttl
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, secret: Any, ttl: Optional[float] = None,
+                 handle: Optional[str] = None) -> Tuple[str, float]:
+        """
+        Store a secret and issue a handle for it.
+
+        Clients talking to several servers propose their own random handle so
+        one handle is valid everywhere. A proposed handle can only be bound
+        to a new secret once it has expired; re-registering the same secret
+        refreshes its lifetime.
+
+        Args:
+            secret: Encrypted payload from PyCDNEncryption.encrypt_data, or a plain string
+            ttl: Requested lifetime in seconds
+            handle: Client-proposed handle (at least 32 characters)
+
+        Returns:
+            Tuple of (handle, lifetime in seconds)
+        """
+        if isinstance(secret, dict):
+            secret = get_global_encryption().decrypt_data(secret)
+        if not isinstance(secret, str):
+            raise ValueError("Credential secret must be a string")
+        if handle is not None and len(handle) < MIN_HANDLE_LENGTH:
+            raise ValueError(f"Credential handles must be at least {MIN_HANDLE_LENGTH} characters")
+
+        lifetime = min(self.max_ttl, ttl if ttl and ttl > 0 else self.default_ttl)
+        handle = handle or secrets.token_urlsafe(24)
+        now = time.monotonic()
+
+        with self._lock:
+            self._purge(now)
+            existing = self._entries.get(handle)
+            if existing is not None and not secrets.compare_digest(existing[0].encode(), secret.encode()):
+                raise CredentialConflictError("Credential handle already in use")
+            if existing is None and len(self._entries) >= self.max_entries:
+                oldest = min(self._entries, key=lambda h: self._entries[h][1])
+                del self._entries[oldest]
+            self._entries[handle] = (secret, now + lifetime)
+
+        log_debug(f"Registered credential handle (ttl={lifetime}s)")
+        return handle, lifetime
+
+    def resolve(self, handle: str) -> str:
+        """
+        Look up the secret behind a handle.
+
+        Raises:
+            CredentialExpiredError: If the handle is unknown or expired
+        """
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is None or entry[1] <= time.monotonic():
+                self._entries.pop(handle, None)
+                raise CredentialExpiredError(handle)
+            return entry[0]
+
+    def revoke(self, handle: str) -> bool:
+        """Forget a handle, returning whether it existed."""
+        with self._lock:
+            return self._entries.pop(handle, None) is not None
+
+    def resolve_arguments(self, args: tuple, kwargs: dict) -> Tuple[tuple, dict]:
+        """
+        Replace credential markers anywhere in call arguments with their secrets.
+
+        Args:
+            args: Positional arguments
+            kwargs: Keyword arguments
+
+        Returns:
+            Tuple of (args, kwargs) with handles resolved
+        """
+        return (tuple(self._resolve(a) for a in args),
+                {k: self._resolve(v) for k, v in kwargs.items()})
+
+    def _resolve(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            if CREDENTIAL_MARKER in value and len(value) == 1:
+                return self.resolve(value[CREDENTIAL_MARKER])
+            return {k: self._resolve(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return type(value)(self._resolve(v) for v in value)
+        return value
+
+    def _purge(self, now: float) -> None:
+        """Drop expired handles (caller holds the lock)."""
+        expired = [h for h, (_, expires) in self._entries.items() if expires <= now]
+        for handle in expired:
+            del self._entries[handle]
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._purge(time.monotonic())
+            return len(self._entries)
@@ -0,0 +1,190 @@
+"""
+WebSocket fan-out for PyCDN package output.
+
+Each subscriber gets a bounded send queue and its own writer task, so
+publishing never awaits a socket: one slow monitor cannot hold up the
+others, and a message is JSON-encoded once however many sockets receive it.
+When a subscriber's queue is full the hub applies its overflow policy:
+
+- "drop_oldest": discard the oldest queued message to make room (default)
+- "drop_newest": discard the message being published
+- "disconnect": close the subscriber's socket
+"""
+
+import asyncio
+import json
+from typing import Any, Dict, Optional, Set
+
+from ..utils.common import log_debug
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "disconnect")
+
+# WebSocket close code sent to subscribers disconnected for falling behind
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+class Subscriber:
+    """
+    One WebSocket subscribed to a topic, with its queue and writer task.
+    """
+
+    def __init__(self, topic: str, websocket: Any, max_queue: int):
+        """
+        Initialize subscriber.
+
+        Args:
+            topic: Topic (package name) subscribed to
+            websocket: Socket with an async send_text()
+            max_queue: Messages buffered before the overflow policy applies
+        """
+        self.topic = topic
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.sent = 0
+        self.dropped = 0
+        self.closed = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def _writer(self, hub: "FanoutHub") -> None:
+        """Send queued messages in order until closed or the socket fails."""
+        try:
+            while True:
+                text = await self.queue.get()
+                await self.websocket.send_text(text)
+                self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log_debug(f"Dropping subscriber to '{self.topic}' after send failure: {e!r}")
+            hub._remove(self)
+            hub.metrics_counters["send_failures"] += 1
+
+
+class FanoutHub:
+    """
+    Topic-based publish/subscribe over WebSockets.
+    """
+
+    def __init__(self, max_queue: int = 256, overflow: str = "drop_oldest"):
+        """
+        Initialize fan-out hub.
+
+        Args:
+            max_queue: Messages buffered per subscriber
+            overflow: Policy for a full queue, one of OVERFLOW_POLICIES
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}', expected one of {OVERFLOW_POLICIES}")
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self._topics: Dict[str, Set[Subscriber]] = {}
+        self.metrics_counters = {
+            "published": 0,
+            "delivered": 0,
+            "dropped": 0,
+            "disconnected": 0,
+            "send_failures": 0,
+        }
+
+    def subscribe(self, topic: str, websocket: Any) -> Subscriber:
+        """
+        Register a socket for a topic and start its writer. Must run on the event loop.
+
+        Returns:
+            Subscriber handle for unsubscribe()
+        """
+        subscriber = Subscriber(topic, websocket, self.max_queue)
+        subscriber._task = asyncio.get_running_loop().create_task(subscriber._writer(self))
+        self._topics.setdefault(topic, set()).add(subscriber)
+        return subscriber
+
+    async def unsubscribe(self, subscriber: Subscriber) -> None:
+        """Stop a subscriber's writer and forget it."""
+        self._remove(subscriber)
+        if subscriber._task is not None:
+            subscriber._task.cancel()
+            try:
+                await subscriber._task
+            except asyncio.CancelledError:
+                pass
+
+    def publish(self, topic: str, message: Dict[str, Any], exclude: Any = None) -> int:
+        """
+        Queue a message for every subscriber of a topic without waiting.
+
+        Args:
+            topic: Topic to publish to
+            message: JSON-serializable message
+            exclude: Socket that should not receive it (e.g. the requester)
+
+        Returns:
+            Number of subscribers the message was queued for
+        """
+        subscribers = self._topics.get(topic)
+        self.metrics_counters["published"] += 1
+        if not subscribers:
+            return 0
+
+        text = json.dumps(message)
+        queued = 0
+        for subscriber in list(subscribers):
+            if subscriber.websocket is exclude or subscriber.closed:
+                continue
+            if subscriber.queue.full() and not self._make_room(subscriber):
+                continue
+            subscriber.queue.put_nowait(text)
+            queued += 1
+        self.metrics_counters["delivered"] += queued
+        return queued
+
+    def _make_room(self, subscriber: Subscriber) -> bool:
+        """Apply the overflow policy to a full queue; True if the message can be queued."""
+        subscriber.dropped += 1
+        self.metrics_counters["dropped"] += 1
+        if self.overflow == "drop_oldest":
+            subscriber.queue.get_nowait()
+            return True
+        if self.overflow == "disconnect":
+            log_debug(f"Disconnecting slow subscriber to '{subscriber.topic}'")
+            self._remove(subscriber)
+            self.metrics_counters["disconnected"] += 1
+            if subscriber._task is not None:
+                subscriber._task.cancel()
+            asyncio.get_running_loop().create_task(self._close(subscriber))
+        return False
+
+    async def _close(self, subscriber: Subscriber) -> None:
+        try:
+            await subscriber.websocket.close(code=CLOSE_TRY_AGAIN_LATER)
+        except Exception as e:
+            log_debug(f"Closing subscriber socket failed: {e!r}")
+
+    def _remove(self, subscriber: Subscriber) -> None:
+        subscriber.closed = True
+        subscribers = self._topics.get(subscriber.topic)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._topics[subscriber.topic]
+
+    def subscriber_count(self, topic: Optional[str] = None) -> int:
+        """Number of subscribers to one topic, or to all topics."""
+        if topic is not None:
+            return len(self._topics.get(topic, ()))
+        return sum(len(s) for s in self._topics.values())
+
+    def metrics(self) -> Dict[str, Any]:
+        """Fan-out counters plus current subscribers and queue depth per topic."""
+        return {
+            **self.metrics_counters,
+            "subscribers": self.subscriber_count(),
+            "overflow_policy": self.overflow,
+            "max_queue": self.max_queue,
+            "topics": {
+                topic: {
+                    "subscribers": len(subscribers),
+                    "max_queue_depth": max((s.queue.qsize() for s in subscribers), default=0),
+                }
+                for topic, subscribers in self._topics.items()
+            },
+        }
@@ -0,0 +1,118 @@
+"""
+Memory accounting and module unloading for loaded package environments.
+
+The runtime charges each environment with the resident-set growth seen
+while its package was imported, plus the size of objects it keeps alive,
+and evicts least recently used environments when the total exceeds its
+budget. Evicting removes the package's modules from sys.modules only when
+that can be undone by importing again: nothing else may still refer to
+them, and they must not include C extensions, which CPython cannot unload
+and some of which cannot be initialised twice in one process.
+"""
+
+import gc
+import os
+import sys
+import sysconfig
+from types import ModuleType
+from typing import Iterable, Optional, Set
+
+EXTENSION_SUFFIXES = (".so", ".pyd", ".dylib")
+
+_STDLIB_DIR = sysconfig.get_paths()["stdlib"]
+
+
+def current_rss() -> Optional[int]:
+    """
+    Resident set size of this process in bytes.
+
+    Returns:
+        RSS, or None where it cannot be read cheaply (non-Linux platforms)
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def estimate_module_size(names: Iterable[str]) -> int:
+    """Rough size of modules' namespaces, for when RSS is unavailable."""
+    total = 0
+    for name in names:
+        module = sys.modules.get(name)
+        if module is not None:
+            namespace = vars(module)
+            total += sys.getsizeof(namespace) + sum(sys.getsizeof(v) for v in namespace.values())
+    return total
+
+
+def is_extension_module(module: ModuleType) -> bool:
+    filename = getattr(module, "__file__", None) or ""
+    # Built-in modules have no file; namespace packages have no file but a path
+    return filename.endswith(EXTENSION_SUFFIXES) or (not filename and not hasattr(module, "__path__"))
+
+
+def is_stdlib_module(name: str, module: Optional[ModuleType]) -> bool:
+    if name in sys.builtin_module_names:
+        return True
+    stdlib_names = getattr(sys, "stdlib_module_names", None)  # Python 3.10+
+    if stdlib_names is not None:
+        return name.split(".")[0] in stdlib_names
+    filename = getattr(module, "__file__", None) or ""
+    return filename.startswith(_STDLIB_DIR) and "site-packages" not in filename
+
+
+def _referenced_from_outside(names: Set[str]) -> bool:
+    """Whether any module outside names holds a module or object from names."""
+    for name, module in list(sys.modules.items()):
+        if name in names or module is None:
+            continue
+        try:
+            values = list(vars(module).values())
+        except TypeError:
+            continue
+        for value in values:
+            owner = value.__name__ if isinstance(value, ModuleType) else getattr(value, "__module__", None)
+            if owner in names:
+                return True
+    return False
+
+
+def unloadable(names: Set[str]) -> bool:
+    """Whether modules can be dropped from sys.modules and imported again later."""
+    modules = {name: sys.modules[name] for name in names if sys.modules.get(name) is not None}
+    if not modules:
+        return False
+    if any(is_stdlib_module(name, module) or is_extension_module(module)
+           for name, module in modules.items()):
+        return False
+    return not _referenced_from_outside(names)
+
+
+def unload_modules(names: Set[str]) -> bool:
+    """
+    Remove modules from sys.modules if that is safe.
+
+    The check walks every loaded module, so callers should not hold locks
+    other requests need. The memory is only returned by a later
+    collect_garbage(), which callers run once after a batch of unloads.
+
+    Returns:
+        True if the modules were removed
+    """
+    if not unloadable(names):
+        return False
+    remove_modules(names)
+    return True
+
+
+def remove_modules(names: Iterable[str]) -> None:
+    """Remove modules from sys.modules without checking unloadable() first."""
+    for name in names:
+        sys.modules.pop(name, None)
+
+
+def collect_garbage() -> None:
+    """Free unloaded modules, which usually sit in reference cycles."""
+    gc.collect()
@@ -0,0 +1,237 @@
+"""
+ASGI middleware for the PyCDN server.
+
+Written against the raw ASGI interface rather than BaseHTTPMiddleware, which
+adds a task and a body copy to every request.
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from ..utils.compression import (
+    DEFAULT_THRESHOLD, BodyTooLarge, CompressionError, CompressionStats, StreamCompressor,
+    compress_if_smaller, decompress, negotiate, supported_encodings
+)
+
+FEATURES_HEADER = b"x-pycdn-features"
+
+# Bodies at least this large are (de)compressed off the event loop
+OFFLOAD_SIZE = 1024 * 1024
+
+
+class FeatureHeaderMiddleware:
+    """
+    Advertise optional server features on every HTTP response.
+
+    Clients read X-PyCDN-Features from their first response and switch to
+    faster transports (e.g. the /rpc WebSocket) the server supports.
+    """
+
+    def __init__(self, app: Callable, features: str):
+        self.app = app
+        self.header = (FEATURES_HEADER, features.encode())
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_header(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), self.header]
+            await send(message)
+
+        await self.app(scope, receive, send_with_header)
+
+
+class CompressionMiddleware:
+    """
+    Negotiate Content-Encoding for request and response bodies.
+
+    Responses are compressed with the best encoding the client's
+    Accept-Encoding allows once they reach threshold bytes; chunked
+    responses of unknown length are compressed chunk by chunk. Request
+    bodies sent with a Content-Encoding are decompressed before the route
+    sees them. Large bodies are (de)compressed in a worker thread so the
+    event loop keeps serving other requests.
+    """
+
+    def __init__(self, app: Callable, threshold: Optional[int] = DEFAULT_THRESHOLD,
+                 max_body_size: Optional[int] = None,
+                 response_stats: Optional[CompressionStats] = None,
+                 request_stats: Optional[CompressionStats] = None):
+        """
+        Args:
+            app: Wrapped ASGI app
+            threshold: Smallest response body compressed, in bytes (None
+                leaves responses uncompressed)
+            max_body_size: Largest decompressed request body accepted
+            response_stats: Counters for compressed responses
+            request_stats: Counters for decompressed requests
+        """
+        self.app = app
+        self.threshold = threshold
+        self.max_body_size = max_body_size
+        self.response_stats = response_stats or CompressionStats()
+        self.request_stats = request_stats or CompressionStats()
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers", []))
+        content_encoding = headers.get(b"content-encoding", b"").decode("latin-1").strip().lower()
+        if content_encoding and content_encoding != "identity":
+            if content_encoding not in supported_encodings():
+                await _send_error(send, 415, f"Unsupported content encoding: {content_encoding}")
+                return
+            try:
+                scope, receive = await self._decompress_request(scope, receive, content_encoding)
+            except CompressionError as e:
+                await _send_error(send, 413 if isinstance(e, BodyTooLarge) else 400, str(e))
+                return
+
+        encoding = None
+        if self.threshold is not None:
+            encoding = negotiate(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSender(send, encoding, self.threshold,
+                                                          self.response_stats))
+
+    async def _decompress_request(self, scope: Dict[str, Any], receive: Callable,
+                                  encoding: str) -> Tuple[Dict[str, Any], Callable]:
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        compressed = b"".join(chunks)
+        body, cpu_seconds = await _run_sized(len(compressed), decompress, compressed,
+                                             encoding, self.max_body_size)
+        self.request_stats.record(len(body), len(compressed), cpu_seconds)
+
+        headers = [(name, value) for name, value in scope.get("headers", [])
+                   if name not in (b"content-encoding", b"content-length")]
+        headers.append((b"content-length", str(len(body)).encode()))
+        delivered = False
+
+        async def receive_body() -> Dict[str, Any]:
+            nonlocal delivered
+            if not delivered:
+                delivered = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        return {**scope, "headers": headers}, receive_body
+
+
+class _CompressingSender:
+    """send() wrapper compressing one response."""
+
+    def __init__(self, send: Callable, encoding: str, threshold: int, stats: CompressionStats):
+        self.send = send
+        self.encoding = encoding
+        self.threshold = threshold
+        self.stats = stats
+        self.start: Optional[Dict[str, Any]] = None
+        self.streamer: Optional[StreamCompressor] = None
+        self.passthrough = False
+        self.raw_size = 0
+        self.encoded_size = 0
+        self.cpu_seconds = 0.0
+
+    async def __call__(self, message: Dict[str, Any]) -> None:
+        if self.passthrough:
+            await self.send(message)
+        elif message["type"] == "http.response.start":
+            self.start = message
+            headers = dict(message.get("headers", []))
+            length = headers.get(b"content-length")
+            # Ranges address the identity bytes, so partial content is sent as it is
+            if (b"content-encoding" in headers or b"content-range" in headers
+                    or (length is not None and int(length) < self.threshold)):
+                await self._pass()
+        elif message["type"] == "http.response.body" and self.streamer is None:
+            body = message.get("body", b"")
+            if message.get("more_body", False):
+                await self._start_stream(message)
+            elif len(body) < self.threshold:
+                await self._pass()
+                await self.send(message)
+            else:
+                encoded, cpu_seconds = await _run_sized(len(body), compress_if_smaller,
+                                                        body, self.encoding)
+                if encoded is None:
+                    await self._pass()
+                    await self.send(message)
+                    return
+                self.stats.record(len(body), len(encoded), cpu_seconds)
+                await self.send(self._start_message(len(encoded)))
+                await self.send({"type": "http.response.body", "body": encoded})
+        elif message["type"] == "http.response.body":
+            await self._send_chunk(message)
+        else:
+            await self.send(message)
+
+    async def _pass(self) -> None:
+        """Send the response as it is."""
+        self.passthrough = True
+        self.stats.record_skipped()
+        await self.send(self.start)
+
+    def _start_message(self, length: Optional[int]) -> Dict[str, Any]:
+        headers = [(name, value) for name, value in self.start.get("headers", [])
+                   if name != b"content-length"]
+        headers.append((b"content-encoding", self.encoding.encode()))
+        headers.append((b"vary", b"Accept-Encoding"))
+        if length is not None:
+            headers.append((b"content-length", str(length).encode()))
+        return {**self.start, "headers": headers}
+
+    async def _start_stream(self, message: Dict[str, Any]) -> None:
+        self.streamer = StreamCompressor(self.encoding)
+        await self.send(self._start_message(None))
+        await self._send_chunk(message)
+
+    async def _send_chunk(self, message: Dict[str, Any]) -> None:
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        start = time.thread_time()
+        encoded = self.streamer.compress(body) if body else b""
+        if not more_body:
+            encoded += self.streamer.finish()
+        self.cpu_seconds += time.thread_time() - start
+        self.raw_size += len(body)
+        self.encoded_size += len(encoded)
+        if not more_body:
+            self.stats.record(self.raw_size, self.encoded_size, self.cpu_seconds)
+        if encoded or not more_body:
+            await self.send({"type": "http.response.body", "body": encoded, "more_body": more_body})
+
+
+async def _run_sized(size: int, function: Callable, *args: Any) -> Tuple[Any, float]:
+    """Call function(*args), in a worker thread for large inputs, timing its CPU use."""
+    def timed() -> Tuple[Any, float]:
+        start = time.thread_time()
+        output = function(*args)
+        return output, time.thread_time() - start
+
+    if size >= OFFLOAD_SIZE:
+        return await asyncio.get_running_loop().run_in_executor(None, timed)
+    return timed()
+
+
+async def _send_error(send: Callable, status: int, detail: str) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"),
+                            (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
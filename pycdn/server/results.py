@@ -0,0 +1,228 @@
+"""
+Temporary storage for results too large to send inline.
+
+See pycdn.utils.transfer for the protocol. Results are written to disk
+from the worker thread that produced them. Downloads read one range at a
+time, so a spilled result is never held in memory again, and the server
+never builds the full response body (or its base64 or compressed copy).
+The serialized result is still complete in memory when spill() writes
+it, so spilling bounds the cost of sending a result, not of producing it.
+"""
+
+import hashlib
+import os
+import re
+import secrets
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..utils.common import log_debug
+from ..utils.transfer import (
+    CHECKSUM, DEFAULT_CHUNK_SIZE, DEFAULT_SPILL_THRESHOLD, SPILLED, payload_size
+)
+from ..utils.wire import RESULT, binary_fields, frame_parts
+
+# Bytes read per step when serving a range
+READ_SIZE = 1024 * 1024
+
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(ValueError):
+    """A Range header does not select any bytes of the result."""
+
+    def __init__(self, message: str, size: int):
+        super().__init__(message)
+        self.size = size
+
+
+class ResultStore:
+    """
+    Spilled results on local disk, each with an expiry.
+    """
+
+    def __init__(self, directory: Optional[str] = None,
+                 threshold: Optional[int] = DEFAULT_SPILL_THRESHOLD,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, ttl: float = 600.0):
+        """
+        Initialize result store.
+
+        Args:
+            directory: Where spilled results are written (None for a
+                temporary directory removed with the store)
+            threshold: Smallest payload spilled, in bytes (None to disable)
+            chunk_size: Bytes covered by each checksum; clients request one
+                chunk at a time
+            ttl: Seconds a spilled result is kept if the client never
+                deletes it
+        """
+        if directory is None:
+            self._tempdir = tempfile.TemporaryDirectory(prefix="pycdn-results-")
+            directory = self._tempdir.name
+        self.directory = directory
+        self.threshold = threshold
+        self.chunk_size = chunk_size
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[str, int, float]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"spilled": 0, "bytes_spilled": 0}
+
+    def spill(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Spill a serialized result if its payload reaches the threshold.
+
+        Args:
+            result: Envelope from serialize_result (with stdout/stderr)
+
+        Returns:
+            The envelope unchanged, or one pointing at the spilled result
+        """
+        if (self.threshold is None or not result.get("success", True)
+                or payload_size(result) < self.threshold):
+            return result
+
+        fields = binary_fields({"result": result.get("result"), "buffers": result.get("buffers"),
+                                "serialization_method": result.get("serialization_method"),
+                                "success": True})
+        if isinstance(fields["result"], str):
+            # Text goes in the frame body too, not in its JSON metadata
+            fields["result"] = fields["result"].encode()
+            fields["text"] = True
+        if not fields["buffers"]:
+            del fields["buffers"]
+
+        result_id = secrets.token_urlsafe(24)
+        path = os.path.join(self.directory, result_id)
+        try:
+            with open(path, "wb") as file:
+                size, checksums = _write_chunked(file, frame_parts(RESULT, 0, fields),
+                                                 self.chunk_size)
+        except OSError as e:
+            log_debug(f"Could not spill result, sending it inline: {e}")
+            _remove(path)
+            return result
+
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            self._entries[result_id] = (path, size, now + self.ttl)
+            self.stats["spilled"] += 1
+            self.stats["bytes_spilled"] += size
+        log_debug(f"Spilled {size} byte result as {result_id}")
+
+        envelope = {k: v for k, v in result.items() if k not in ("result", "buffers")}
+        envelope["serialization_method"] = SPILLED
+        envelope["transfer"] = {
+            "id": result_id,
+            "size": size,
+            "chunk_size": self.chunk_size,
+            "checksum": CHECKSUM,
+            "checksums": checksums,
+        }
+        return envelope
+
+    def open_range(self, result_id: str, range_header: Optional[str]) -> Tuple[Iterator[bytes], int, int, int]:
+        """
+        Select the bytes of a spilled result a request asks for.
+
+        Args:
+            result_id: Spilled result
+            range_header: Request's Range header (None for the whole result)
+
+        Returns:
+            Tuple of (body iterator, first byte, last byte, total size)
+
+        Raises:
+            KeyError: If the result is unknown or expired
+            RangeNotSatisfiable: If the range selects nothing
+        """
+        with self._lock:
+            self._purge(time.monotonic())
+            path, size, _ = self._entries[result_id]
+        start, end = _parse_range(range_header, size)
+        return _read_range(path, start, end), start, end, size
+
+    def discard(self, result_id: str) -> bool:
+        """Delete a spilled result, returning whether it existed."""
+        with self._lock:
+            entry = self._entries.pop(result_id, None)
+        if entry is None:
+            return False
+        _remove(entry[0])
+        return True
+
+    def _purge(self, now: float) -> None:
+        """Delete expired results (caller holds the lock)."""
+        expired = [key for key, (_, _, expires) in self._entries.items() if expires <= now]
+        for key in expired:
+            _remove(self._entries.pop(key)[0])
+
+
+def _write_chunked(file: Any, parts: List[Any], chunk_size: int) -> Tuple[int, List[str]]:
+    """Write parts to file, returning the total size and a checksum per chunk."""
+    checksums = []
+    hasher = hashlib.new(CHECKSUM)
+    filled = 0
+    size = 0
+    for part in parts:
+        view = memoryview(part).cast("B")
+        while view:
+            piece = view[:chunk_size - filled]
+            file.write(piece)
+            hasher.update(piece)
+            filled += len(piece)
+            size += len(piece)
+            view = view[len(piece):]
+            if filled == chunk_size:
+                checksums.append(hasher.hexdigest())
+                hasher = hashlib.new(CHECKSUM)
+                filled = 0
+    if filled:
+        checksums.append(hasher.hexdigest())
+    return size, checksums
+
+
+def _parse_range(header: Optional[str], size: int) -> Tuple[int, int]:
+    """First and last byte of a single-range Range header."""
+    if not header:
+        return 0, size - 1
+    match = _RANGE.match(header.strip())
+    if match is None or not any(match.groups()):
+        raise RangeNotSatisfiable(f"Unsupported range: {header}", size)
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the last N bytes
+        start, end = max(0, size - int(last)), size - 1
+    if start >= size or end < start:
+        raise RangeNotSatisfiable(f"Range {header} outside {size} bytes", size)
+    return start, end
+
+
+def _read_range(path: str, start: int, end: int) -> Iterator[bytes]:
+    # Opened now, so a concurrent discard cannot remove the file mid-download
+    file = open(path, "rb")
+
+    def chunks() -> Iterator[bytes]:
+        with file:
+            file.seek(start)
+            remaining = end - start + 1
+            while remaining:
+                data = file.read(min(READ_SIZE, remaining))
+                if not data:
+                    return
+                remaining -= len(data)
+                yield data
+
+    return chunks()
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
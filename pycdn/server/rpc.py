@@ -0,0 +1,129 @@
+"""
+Persistent multiplexed RPC over a single WebSocket.
+
+A client keeps one /rpc socket open and sends CALL frames tagged with its
+own request IDs. Each call runs as its own task, so any number can be
+outstanding; output chunks (for streaming calls) and the final RESULT
+frame carry the same ID, and a CANCEL frame abandons a call. Frames are
+binary (see utils/wire.py), so pickled payloads are not base64-encoded.
+"""
+
+import asyncio
+from typing import TYPE_CHECKING, Any, Dict
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from ..utils.common import log_debug
+from ..utils.transfer import CHUNKED, TRANSFER_HEADER
+from ..utils.type_codecs import CODECS_HEADER, parse_codecs
+from ..utils.wire import (
+    CALL, CANCEL, RESULT, STDERR, STDOUT, WireError, binary_fields, decode_frame, encode_frame
+)
+
+if TYPE_CHECKING:
+    from .core import CDNServer
+
+# Value of the X-PyCDN-Features response header: the /rpc socket and
+# frame-encoded /execute bodies
+SERVER_FEATURES = "rpc, frame"
+
+
+class RpcSession:
+    """
+    Serves one client's /rpc socket.
+    """
+
+    def __init__(self, server: "CDNServer", websocket: WebSocket):
+        """
+        Initialize RPC session.
+
+        Args:
+            server: Server whose runtime executes the calls
+            websocket: Accepted WebSocket
+        """
+        self.server = server
+        self.websocket = websocket
+        self._calls: Dict[int, asyncio.Task] = {}
+        self._send_lock = asyncio.Lock()
+        # Type codecs the client announced when it connected
+        self.accepted_codecs = parse_codecs(websocket.headers.get(CODECS_HEADER))
+        # Whether large results may be spilled for download over HTTP
+        self.spill = websocket.headers.get(TRANSFER_HEADER) == CHUNKED
+
+    async def run(self) -> None:
+        """Read frames until the client disconnects, then cancel its calls."""
+        try:
+            while True:
+                data = await self.websocket.receive_bytes()
+                try:
+                    frame = decode_frame(data)
+                except WireError as e:
+                    log_debug(f"Ignoring malformed RPC frame: {e}")
+                    continue
+
+                if frame.kind == CALL:
+                    task = asyncio.create_task(self._call(frame.request_id, frame.fields))
+                    self._calls[frame.request_id] = task
+                    task.add_done_callback(
+                        lambda _, request_id=frame.request_id: self._calls.pop(request_id, None))
+                elif frame.kind == CANCEL:
+                    task = self._calls.get(frame.request_id)
+                    if task is not None:
+                        task.cancel()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for task in list(self._calls.values()):
+                task.cancel()
+
+    async def _send(self, kind: int, request_id: int, fields: Dict[str, Any]) -> None:
+        async with self._send_lock:
+            await self.websocket.send_bytes(encode_frame(kind, request_id, fields))
+
+    async def _call(self, request_id: int, fields: Dict[str, Any]) -> None:
+        """Execute one CALL frame and answer with a RESULT frame."""
+        server = self.server
+        package_name = fields.get("package_name", "")
+        function_name = fields.get("function_name", "")
+        serialized_args = {
+            "args": fields.get("args"),
+            "kwargs": fields.get("kwargs"),
+            "serialization_method": fields.get("serialization_method", "json"),
+            "buffers": fields.get("buffers"),
+        }
+
+        try:
+            if server.allowed_packages and package_name not in server.allowed_packages:
+                raise PermissionError(f"Package {package_name} not allowed")
+
+            if fields.get("stream"):
+                async def send(output: Dict[str, Any]):
+                    server.hub.publish(package_name, output)
+                    kind = STDOUT if output["type"] == "stdout" else STDERR
+                    await self._send(kind, request_id, {"data": output["data"]})
+
+                def call():
+                    result = server.runtime.execute_remote_function(
+                        package_name, function_name, serialized_args, self.accepted_codecs)
+                    return server.results.spill(result) if self.spill else result
+
+                result = await server._run_with_output(call, send)
+            else:
+                result = await asyncio.get_running_loop().run_in_executor(
+                    None, server._execute_captured, package_name, function_name, serialized_args,
+                    self.accepted_codecs, self.spill)
+                server._broadcast_output(package_name, result)
+        except asyncio.CancelledError:
+            result = _error_result("Call cancelled", "CancelledError")
+        except Exception as e:
+            result = _error_result(str(e), type(e).__name__)
+
+        try:
+            await self._send(RESULT, request_id, binary_fields(result))
+        except Exception as e:
+            log_debug(f"Could not deliver RPC result {request_id}: {e!r}")
+
+
+def _error_result(message: str, error_type: str) -> Dict[str, Any]:
+    return {"success": False, "error": message, "error_type": error_type,
+            "serialization_method": "error"}
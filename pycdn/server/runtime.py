@@ -10,9 +10,23 @@ import subprocess
 import time
 import glob
 import site
-from typing import Any, Dict, List, Optional, Tuple
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
 from ..utils.common import deserialize_args, serialize_result, serialize_error, log_debug
 from ..utils.encryption import get_global_encryption
+from .credentials import CredentialStore
+from .memory import (
+    collect_garbage, current_rss, estimate_module_size, is_stdlib_module, remove_modules,
+    unloadable, unload_modules
+)
+
+# First imports run one at a time, so the sys.modules and RSS differences
+# taken around each hold only what that package's import brought in.
+# Unloading takes it too, so no import sees a package half removed.
+# Never acquired while holding a PackageRuntime's lock.
+_import_lock = threading.RLock()
 
 
 def install_package(package_name: str) -> bool:
@@ -129,10 +143,74 @@ class ExecutionEnvironment:
         # Auto-install if package not found
         self.auto_install = True
         
+        # Memory accounting, filled in by load_package()
+        self.owned_modules = set()
+        self.import_bytes = 0
+        self.last_used = time.monotonic()
+        self.active_calls = 0
+        # Set when the cache is cleared during a call; dropped once idle
+        self.drop_when_idle = False
+        # Set when eviction found the modules cannot be unloaded
+        self.pinned = False
+        # (modules, bytes) charged to a pinned environment this one replaces
+        self.inherited_charge: Optional[Tuple[Set[str], int]] = None
+        
     def load_package(self) -> None:
         """Load the specified package into the environment."""
         if self.package_name in self._loaded_modules:
             return
+        
+        with _import_lock:
+            if self.package_name in self._loaded_modules:
+                return
+            modules_before = set(sys.modules)
+            rss_before = current_rss()
+            self._import_package()
+            
+            # Modules this import brought in, apart from the standard library,
+            # which stays loaded for everyone
+            self.owned_modules = {
+                name for name in set(sys.modules) - modules_before
+                if not is_stdlib_module(name, sys.modules.get(name))
+            }
+            rss_after = current_rss()
+        # RSS misses memory the allocator reused (e.g. after an eviction),
+        # so never charge less than the modules' own namespaces hold
+        rss_growth = rss_after - rss_before if rss_before is not None and rss_after is not None else 0
+        self.import_bytes = max(rss_growth, estimate_module_size(self.owned_modules))
+        if self.inherited_charge is not None:
+            # The modules stayed loaded, so importing again cost almost nothing
+            modules, size = self.inherited_charge
+            self.owned_modules |= modules
+            self.import_bytes = max(self.import_bytes, size)
+    
+    def memory_estimate(self) -> int:
+        """Bytes charged to this environment: import growth plus cached objects."""
+        tracked = sum(sys.getsizeof(value) for value in self._execution_cache.values())
+        return self.import_bytes + tracked
+    
+    def unload(self) -> bool:
+        """
+        Drop the package's modules from sys.modules where that is safe.
+        
+        Returns:
+            True if the modules were unloaded
+        """
+        self.clear()
+        if not self.owned_modules:
+            return False
+        with _import_lock:
+            return unload_modules(self.owned_modules)
+    
+    def clear(self) -> None:
+        """Forget the loaded package and cached objects."""
+        self._loaded_modules.clear()
+        self._execution_cache.clear()
+    
+    def _import_package(self) -> None:
+        """Import the package, installing it first if needed."""
+        if self.package_name in self._loaded_modules:
+            return
             
         try:
             log_debug(f"Loading package: {self.package_name}")
@@ -338,15 +416,34 @@ class PackageRuntime:
     Main runtime manager for package execution.
     """
     
-    def __init__(self):
-        """Initialize package runtime."""
-        self.environments = {}
+    def __init__(self, memory_budget: Optional[int] = None):
+        """
+        Initialize package runtime.
+        
+        Args:
+            memory_budget: Bytes loaded environments may use before the least
+                recently used are evicted (None for no limit)
+        """
+        # Least recently used first
+        self.environments: "OrderedDict[str, ExecutionEnvironment]" = OrderedDict()
+        self.memory_budget = memory_budget
+        self.credentials = CredentialStore()
+        self._lock = threading.RLock()
         self.execution_stats = {
             "total_executions": 0,
             "successful_executions": 0,
             "failed_executions": 0,
             "packages_loaded": 0
         }
+        self.eviction_stats = {
+            "evictions": 0,
+            "modules_unloaded": 0,
+            "pinned_evictions": 0,
+            "pinned_skips": 0,
+            "bytes_evicted": 0
+        }
+        # Charges of cleared environments whose modules stayed loaded
+        self._pinned_charges: Dict[str, Tuple[Set[str], int]] = {}
     
     def get_environment(self, package_name: str) -> ExecutionEnvironment:
         """
@@ -358,14 +455,146 @@ class PackageRuntime:
         Returns:
             ExecutionEnvironment instance
         """
-        if package_name not in self.environments:
-            self.environments[package_name] = ExecutionEnvironment(package_name)
-            self.execution_stats["packages_loaded"] += 1
-            
-        return self.environments[package_name]
+        with self._lock:
+            env = self.environments.get(package_name)
+            if env is None:
+                env = self.environments[package_name] = ExecutionEnvironment(package_name)
+                env.inherited_charge = self._pinned_charges.pop(package_name, None)
+                self.execution_stats["packages_loaded"] += 1
+            else:
+                self.environments.move_to_end(package_name)
+            env.last_used = time.monotonic()
+            return env
+    
+    @contextmanager
+    def checkout(self, package_name: str):
+        """Get an environment, keeping it from being evicted while a call runs in it."""
+        with self._lock:
+            env = self.get_environment(package_name)
+            env.active_calls += 1
+        try:
+            yield env
+        finally:
+            dropped = []
+            with self._lock:
+                env.active_calls -= 1
+                if (env.drop_when_idle and not env.active_calls
+                        and self.environments.get(package_name) is env):
+                    dropped.append(self._drop(package_name))
+            self._unload(dropped)
+            if self.memory_budget is not None:
+                self.enforce_memory_budget()
+    
+    def memory_used(self) -> int:
+        """Bytes charged to all loaded environments."""
+        with self._lock:
+            return sum(env.memory_estimate() for env in self.environments.values())
+    
+    def enforce_memory_budget(self) -> List[str]:
+        """
+        Evict least recently used idle environments until within the budget.
+        
+        Returns:
+            Names of the evicted packages
+        """
+        evicted = []
+        if self.memory_budget is None:
+            return evicted
+        
+        skipped = set()
+        while True:
+            with self._lock:
+                candidate = self._eviction_candidate(skipped)
+            if candidate is None:
+                break
+            name, env = candidate
+            skipped.add(name)
+            
+            # The safety check walks every loaded module: it runs under the
+            # import lock only, so calls into other packages carry on
+            with _import_lock:
+                if not env.owned_modules or not unloadable(env.owned_modules):
+                    # Evicting would free nothing, so the environment stays, charged
+                    with self._lock:
+                        env.pinned = True
+                        self.eviction_stats["pinned_skips"] += 1
+                    continue
+                with self._lock:
+                    if env.active_calls or self.environments.get(name) is not env:
+                        continue  # checked out meanwhile
+                    size = env.memory_estimate()
+                    del self.environments[name]
+                    self.eviction_stats["evictions"] += 1
+                    self.eviction_stats["modules_unloaded"] += len(env.owned_modules)
+                    self.eviction_stats["bytes_evicted"] += size
+                remove_modules(env.owned_modules)
+            env.clear()
+            evicted.append(name)
+        
+        if evicted:
+            collect_garbage()
+            log_debug(f"Evicted {evicted} to stay within {self.memory_budget} bytes")
+        return evicted
+    
+    def _eviction_candidate(self, skipped: Set[str]) -> Optional[Tuple[str, ExecutionEnvironment]]:
+        """Least recently used environment to evict while over budget. Caller holds the lock."""
+        used = sum(env.memory_estimate() for env in self.environments.values())
+        if used <= self.memory_budget:
+            return None
+        # The most recently used environment is never evicted
+        for name, env in list(self.environments.items())[:-1]:
+            if not (env.active_calls or env.pinned or name in skipped):
+                return name, env
+        return None
+    
+    def _drop(self, package_name: str) -> ExecutionEnvironment:
+        """Remove an environment, to be unloaded by _unload() once the lock is released."""
+        return self.environments.pop(package_name)
+    
+    def _unload(self, dropped: List[ExecutionEnvironment]) -> None:
+        """Unload dropped environments' modules where safe. Caller does not hold the lock."""
+        for env in dropped:
+            owned = len(env.owned_modules)
+            if env.unload():
+                with self._lock:
+                    self.eviction_stats["modules_unloaded"] += owned
+            elif owned:
+                with self._lock:
+                    self.eviction_stats["pinned_evictions"] += 1
+                    # Reloading finds the modules still loaded; keep charging them
+                    self._pinned_charges[env.package_name] = (env.owned_modules, env.import_bytes)
+        if dropped:
+            collect_garbage()
+    
+    def get_memory_stats(self) -> Dict[str, Any]:
+        """
+        Get memory accounting and eviction statistics.
+        
+        Returns:
+            Budget, usage, process RSS, eviction counters and per-package
+            figures (least recently used first)
+        """
+        now = time.monotonic()
+        with self._lock:
+            packages = [{
+                "package_name": name,
+                "bytes": env.memory_estimate(),
+                "modules": len(env.owned_modules),
+                "idle_seconds": round(now - env.last_used, 3),
+                "active_calls": env.active_calls,
+                "pinned": env.pinned
+            } for name, env in self.environments.items()]
+        return {
+            "memory_budget": self.memory_budget,
+            "memory_used": sum(p["bytes"] for p in packages),
+            "process_rss": current_rss(),
+            **self.eviction_stats,
+            "packages": packages
+        }
     
     def execute_remote_function(self, package_name: str, function_name: str, 
-                              serialized_args: Dict[str, str]) -> Dict[str, Any]:
+                              serialized_args: Dict[str, str],
+                              accepted_codecs: Optional[FrozenSet[str]] = None) -> Dict[str, Any]:
         """
         Execute a remote function call.
         
@@ -373,6 +602,7 @@ class PackageRuntime:
             package_name: Name of the package
             function_name: Name of the function
             serialized_args: Serialized function arguments
+            accepted_codecs: Type codecs the client can decode
             
         Returns:
             Serialized execution result
@@ -383,18 +613,19 @@ class PackageRuntime:
             # Deserialize arguments
             args, kwargs = deserialize_args(serialized_args)
             
+            # Swap credential handles for the secrets registered under them
+            args, kwargs = self.credentials.resolve_arguments(args, kwargs)
+            
             # Apply automatic decryption to sensitive data
             encryption = get_global_encryption()
             decrypted_args, decrypted_kwargs = encryption.process_response_arguments(args, kwargs)
             
-            # Get execution environment
-            env = self.get_environment(package_name)
-            
             # Execute function with decrypted arguments
-            result = env.execute_function(function_name, decrypted_args, decrypted_kwargs)
+            with self.checkout(package_name) as env:
+                result = env.execute_function(function_name, decrypted_args, decrypted_kwargs)
             
             # Serialize result
-            serialized_result = serialize_result(result)
+            serialized_result = serialize_result(result, accepted_codecs)
             
             self.execution_stats["successful_executions"] += 1
             return serialized_result
@@ -469,12 +700,23 @@ class PackageRuntime:
         """
         Clear package cache.
         
+        Environments with calls in progress are dropped when their last
+        call finishes, so their modules are never unloaded mid-call.
+        
         Args:
             package_name: Specific package to clear, or None for all
         """
-        if package_name:
-            if package_name in self.environments:
-                del self.environments[package_name]
-        else:
-            self.environments.clear()
-            self.execution_stats["packages_loaded"] = 0 
\ No newline at end of file
+        dropped = []
+        with self._lock:
+            if package_name:
+                names = [package_name] if package_name in self.environments else []
+            else:
+                names = list(self.environments)
+                self.execution_stats["packages_loaded"] = 0
+            for name in names:
+                env = self.environments[name]
+                if env.active_calls:
+                    env.drop_when_idle = True
+                else:
+                    dropped.append(self._drop(name))
+        self._unload(dropped) 
\ No newline at end of file
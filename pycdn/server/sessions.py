@@ -0,0 +1,405 @@
+"""
+Persistent interactive shell sessions for the /interactive WebSocket.
+
+Each session is one long-lived shell on a pseudo-terminal, so working
+directory, environment and any REPL started in it survive between
+commands, and a command costs a write to the terminal rather than a
+process spawn. Commands are run through `eval` and followed by a marker
+carrying their exit status, which the reader strips from the output and
+reports as command completion. Input frames go straight to the terminal,
+so programs reading stdin (prompts, REPLs) receive them.
+
+Output is read into a bounded per-session queue; when it is full the
+reader stops reading the terminal, and the kernel then blocks the
+process's writes until the client catches up. A session outlives its
+WebSocket and can be re-attached by ID until it has been idle (detached
+with no activity) for the manager's idle timeout.
+"""
+
+import asyncio
+import codecs
+import os
+import re
+import secrets
+import shutil
+import signal
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import pty
+    import termios
+except ImportError:  # Windows
+    pty = termios = None
+
+from ..utils.common import log_debug
+
+# Bytes read from the terminal at a time
+READ_SIZE = 64 * 1024
+
+# Output events queued per session before reading pauses
+DEFAULT_MAX_PENDING = 256
+
+# Bytes of client input buffered while the terminal is not accepting it
+MAX_INPUT_BUFFER = 1024 * 1024
+
+# Marker printed after each command: RS, session token, ':', status, RS
+_MARKER = re.compile(r"\x1e([0-9a-f]{16}):(\d+)\x1e")
+_PARTIAL_MARKER = re.compile(r"\x1e[0-9a-f]{0,16}(:\d*)?")
+
+
+class SessionError(Exception):
+    """A request the session cannot carry out in its current state."""
+
+
+def _shell_command() -> List[str]:
+    """Non-interactive shell reading commands from the terminal."""
+    # A script argument keeps the shell non-interactive (no prompts,
+    # readline or job control) even though its stdin is a terminal.
+    bash = shutil.which("bash")
+    if bash:
+        return [bash, "--noprofile", "--norc", "/dev/stdin"]
+    return ["/bin/sh", "/dev/stdin"]
+
+
+def _quote(text: str) -> str:
+    return "'" + text.replace("'", "'\\''") + "'"
+
+
+class ShellSession:
+    """
+    One shell process on a pseudo-terminal.
+    """
+
+    def __init__(self, session_id: str, package_name: str, max_pending: int = DEFAULT_MAX_PENDING):
+        """
+        Initialize shell session. Call start() to spawn the shell.
+
+        Args:
+            session_id: ID clients use to re-attach
+            package_name: Package the session was opened for
+            max_pending: Output events queued before reading pauses
+        """
+        self.session_id = session_id
+        self.package_name = package_name
+        self.max_pending = max_pending
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.running_command = False
+        self.closed = False
+        self.created = self.last_active = time.monotonic()
+        self.bytes_out = 0
+        self._token = secrets.token_hex(8)
+        self._fd: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._events: asyncio.Queue = asyncio.Queue()
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._partial = ""
+        self._input = bytearray()
+        self._reading = self._writing = False
+        self._pump: Optional[asyncio.Task] = None
+
+    @property
+    def attached(self) -> bool:
+        return self._pump is not None and not self._pump.done()
+
+    @property
+    def paused(self) -> bool:
+        return self._fd is not None and not self._reading
+
+    async def start(self) -> None:
+        """Spawn the shell on a new pseudo-terminal."""
+        if pty is None:
+            raise SessionError("Interactive sessions need a POSIX pseudo-terminal")
+
+        master, slave = pty.openpty()
+        attrs = termios.tcgetattr(slave)
+        attrs[3] &= ~termios.ECHO     # lflag: input is not echoed back as output
+        attrs[1] &= ~termios.ONLCR    # oflag: keep "\n" line endings
+        termios.tcsetattr(slave, termios.TCSANOW, attrs)
+        try:
+            self.process = await asyncio.create_subprocess_exec(
+                *_shell_command(), stdin=slave, stdout=slave, stderr=slave,
+                start_new_session=True, env={**os.environ, "TERM": "dumb"}
+            )
+        except Exception:
+            os.close(master)
+            raise
+        finally:
+            os.close(slave)
+
+        os.set_blocking(master, False)
+        self._fd = master
+        self._loop = asyncio.get_running_loop()
+        self._resume_reading()
+        # Ctrl-C interrupts the running command, not the shell
+        self._write(b"trap : INT\n")
+
+    def run_command(self, command: str) -> None:
+        """
+        Run a shell command; a "command_complete" event follows its output.
+
+        Raises:
+            SessionError: If the session has ended or a command is still running
+        """
+        if self.closed:
+            raise SessionError("Session has ended")
+        if self.running_command:
+            raise SessionError("A command is still running; send input or interrupt it")
+        self.running_command = True
+        self.last_active = time.monotonic()
+        self._write(f"{{ eval {_quote(command)}\n}} 2>&1; "
+                    f"printf '\\036{self._token}:%d\\036' \"$?\"\n".encode())
+
+    def send_input(self, data: str) -> None:
+        """
+        Write input to the terminal for the running program.
+
+        Raises:
+            SessionError: If the session has ended or too much input is pending
+        """
+        if self.closed:
+            raise SessionError("Session has ended")
+        if len(self._input) + len(data) > MAX_INPUT_BUFFER:
+            raise SessionError("Input buffer full; the program is not reading its input")
+        self.last_active = time.monotonic()
+        self._write(data.encode())
+
+    def interrupt(self) -> None:
+        """Send Ctrl-C to the running command."""
+        if not self.closed:
+            self.last_active = time.monotonic()
+            self._write(b"\x03")
+
+    async def next_event(self) -> Tuple[str, Any]:
+        """
+        Wait for the next output event.
+
+        Returns:
+            ("stdout", text), ("command_complete", status) or ("session_end", status)
+        """
+        event = await self._events.get()
+        if self.paused and self._events.qsize() <= self.max_pending // 2:
+            self._resume_reading()
+        return event
+
+    def attach(self, pump: asyncio.Task) -> None:
+        """Make pump the task delivering events, replacing any earlier client."""
+        if self.attached:
+            self._pump.cancel()
+        self._pump = pump
+        self.last_active = time.monotonic()
+
+    def detach(self, pump: asyncio.Task) -> None:
+        """Stop delivering events to a client that went away."""
+        if self._pump is pump:
+            self._pump = None
+            self.last_active = time.monotonic()
+
+    def _write(self, data: bytes) -> None:
+        self._input += data
+        self._flush_input()
+
+    def _flush_input(self) -> None:
+        try:
+            while self._input:
+                written = os.write(self._fd, self._input)
+                del self._input[:written]
+        except BlockingIOError:
+            pass
+        except OSError as e:
+            log_debug(f"Session {self.session_id} input lost: {e!r}")
+            self._input.clear()
+
+        if self._input and not self._writing:
+            self._loop.add_writer(self._fd, self._flush_input)
+            self._writing = True
+        elif not self._input and self._writing:
+            self._loop.remove_writer(self._fd)
+            self._writing = False
+
+    def _resume_reading(self) -> None:
+        if self._fd is not None and not self._reading:
+            self._loop.add_reader(self._fd, self._on_readable)
+            self._reading = True
+
+    def _pause_reading(self) -> None:
+        if self._reading:
+            self._loop.remove_reader(self._fd)
+            self._reading = False
+
+    def _on_readable(self) -> None:
+        try:
+            data = os.read(self._fd, READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""  # EIO: every process holding the terminal has exited
+        if not data:
+            self._pause_reading()
+            self._loop.create_task(self._finish())
+            return
+
+        self.bytes_out += len(data)
+        self.last_active = time.monotonic()
+        self._feed(self._decoder.decode(data))
+        if self._events.qsize() >= self.max_pending:
+            self._pause_reading()
+
+    def _feed(self, text: str) -> None:
+        """Queue output, turning completion markers into events."""
+        text = self._partial + text
+        self._partial = ""
+        while text:
+            start = text.find("\x1e")
+            if start < 0:
+                self._events.put_nowait(("stdout", text))
+                return
+            if start:
+                self._events.put_nowait(("stdout", text[:start]))
+                text = text[start:]
+
+            match = _MARKER.match(text)
+            if match and match.group(1) == self._token:
+                self.running_command = False
+                self._events.put_nowait(("command_complete", int(match.group(2))))
+                text = text[match.end():]
+            elif match is None and _PARTIAL_MARKER.fullmatch(text):
+                self._partial = text  # marker split across reads
+                return
+            else:
+                self._events.put_nowait(("stdout", "\x1e"))
+                text = text[1:]
+
+    async def _finish(self) -> None:
+        """Report the shell's exit once its terminal has closed."""
+        status = await self.process.wait()
+        self._release()
+        if self._partial:
+            self._events.put_nowait(("stdout", self._partial))
+            self._partial = ""
+        self._events.put_nowait(("session_end", status))
+
+    def _release(self) -> None:
+        self.closed = True
+        self.running_command = False
+        if self._fd is not None:
+            self._pause_reading()
+            if self._writing:
+                self._loop.remove_writer(self._fd)
+                self._writing = False
+            os.close(self._fd)
+            self._fd = None
+
+    async def close(self, grace: float = 1.0) -> None:
+        """Hang up the shell and everything it started, then release the terminal."""
+        if self._pump is not None:
+            self._pump.cancel()
+        process = self.process
+        if process is not None and process.returncode is None:
+            try:
+                os.killpg(process.pid, signal.SIGHUP)
+                await asyncio.wait_for(process.wait(), grace)
+            except (ProcessLookupError, asyncio.TimeoutError):
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+        self._release()
+
+
+class SessionManager:
+    """
+    Shell sessions by ID, with idle reaping.
+    """
+
+    def __init__(self, idle_timeout: float = 300.0, max_sessions: int = 32,
+                 max_pending: int = DEFAULT_MAX_PENDING):
+        """
+        Initialize session manager.
+
+        Args:
+            idle_timeout: Seconds a detached session may sit without activity
+            max_sessions: Sessions allowed at once
+            max_pending: Output events queued per session before reading pauses
+        """
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.max_pending = max_pending
+        self.sessions: Dict[str, ShellSession] = {}
+        self.reaped = 0
+        self._reaper: Optional[asyncio.Task] = None
+
+    async def open(self, package_name: str,
+                   session_id: Optional[str] = None) -> Tuple[ShellSession, bool]:
+        """
+        Re-attach to a live session or start a new one.
+
+        Args:
+            package_name: Package the session is for
+            session_id: ID of a session to resume, if any
+
+        Returns:
+            Tuple of (session, whether it was resumed)
+
+        Raises:
+            SessionError: If a new session would exceed max_sessions
+        """
+        session = self.sessions.get(session_id) if session_id else None
+        if session is not None and not session.closed and session.package_name == package_name:
+            return session, True
+
+        if len(self.sessions) >= self.max_sessions:
+            raise SessionError(f"Too many interactive sessions (limit {self.max_sessions})")
+        session = ShellSession(secrets.token_urlsafe(16), package_name, self.max_pending)
+        await session.start()
+        self.sessions[session.session_id] = session
+
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_loop())
+        return session, False
+
+    async def close(self, session: ShellSession) -> None:
+        """End a session and forget it."""
+        self.sessions.pop(session.session_id, None)
+        await session.close()
+
+    def discard_if_ended(self, session: ShellSession) -> None:
+        """Forget a session whose shell has exited."""
+        if session.closed:
+            self.sessions.pop(session.session_id, None)
+
+    async def reap(self) -> int:
+        """Close sessions that are detached and idle; returns how many."""
+        cutoff = time.monotonic() - self.idle_timeout
+        idle = [s for s in self.sessions.values()
+                if s.closed or (not s.attached and s.last_active < cutoff)]
+        for session in idle:
+            log_debug(f"Reaping idle session {session.session_id}")
+            await self.close(session)
+        self.reaped += len(idle)
+        return len(idle)
+
+    async def _reap_loop(self) -> None:
+        while self.sessions:
+            await asyncio.sleep(max(self.idle_timeout / 4, 0.1))
+            try:
+                await self.reap()
+            except Exception as e:
+                log_debug(f"Session reaper error: {e!r}")
+
+    async def close_all(self) -> None:
+        """End every session (server shutdown)."""
+        if self._reaper is not None:
+            self._reaper.cancel()
+        for session in list(self.sessions.values()):
+            await self.close(session)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Session counts for the stats endpoint."""
+        return {
+            "sessions": len(self.sessions),
+            "attached": sum(s.attached for s in self.sessions.values()),
+            "paused": sum(s.paused for s in self.sessions.values()),
+            "reaped": self.reaped,
+            "idle_timeout": self.idle_timeout,
+            "max_sessions": self.max_sessions,
+        }
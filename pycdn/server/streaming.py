@@ -0,0 +1,144 @@
+"""
+Incremental output streaming for PyCDN executions.
+
+A function runs in a worker thread while capture.capture_output routes its
+stdout/stderr writes into an OutputChannel. An async pump on the event
+loop drains the channel on a short timer, coalesces adjacent writes into
+chunks of bounded size and sends them over the WebSocket. The channel
+holds at most max_buffer characters; a worker that outpaces the socket
+blocks in write() until the pump catches up, so server memory stays
+bounded however much a job prints.
+"""
+
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Tuple
+
+# Characters buffered per execution before the worker is made to wait
+DEFAULT_MAX_BUFFER = 256 * 1024
+# Largest stdout/stderr message sent in one frame
+DEFAULT_CHUNK_SIZE = 16 * 1024
+# Seconds to let writes accumulate before sending them
+DEFAULT_FLUSH_INTERVAL = 0.05
+
+
+class OutputChannel:
+    """
+    Bounded, thread-safe queue of (stream, text) writes feeding an event loop.
+
+    Usable as a capture.capture_output sink.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_buffer: int = DEFAULT_MAX_BUFFER):
+        """
+        Initialize output channel.
+
+        Args:
+            loop: Event loop the pump runs on
+            max_buffer: Characters buffered before writers block
+        """
+        self._loop = loop
+        self.max_buffer = max_buffer
+        self._writes: Deque[Tuple[str, str]] = deque()
+        self._size = 0
+        self._cond = threading.Condition()
+        self._ready = asyncio.Event()
+        self._aborted = False
+        self.finished = False
+
+    def write(self, stream: str, text: str) -> None:
+        """
+        Queue text from a worker thread, waiting while the buffer is full.
+
+        Writes after abort() are dropped so a worker whose client went
+        away runs to completion instead of blocking forever.
+        """
+        if not text:
+            return
+        with self._cond:
+            while self._size >= self.max_buffer and not self._aborted:
+                self._cond.wait()
+            if self._aborted:
+                return
+            was_empty = not self._writes
+            self._writes.append((stream, text))
+            self._size += len(text)
+        if was_empty:
+            self._loop.call_soon_threadsafe(self._ready.set)
+
+    def take(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[Tuple[str, str]]:
+        """
+        Drain everything buffered, merging adjacent writes to the same stream.
+
+        Must be called on the event loop.
+
+        Returns:
+            (stream, text) pairs with text at most chunk_size characters
+        """
+        with self._cond:
+            writes = list(self._writes)
+            self._writes.clear()
+            self._size = 0
+            self._ready.clear()
+            self._cond.notify_all()
+
+        chunks: List[Tuple[str, str]] = []
+        pending: List[str] = []
+        current = None
+        for stream, text in writes + [(None, "")]:
+            if stream != current and pending:
+                merged = "".join(pending)
+                for start in range(0, len(merged), chunk_size):
+                    chunks.append((current, merged[start:start + chunk_size]))
+                pending = []
+            current = stream
+            pending.append(text)
+        return chunks
+
+    async def wait(self) -> None:
+        """Wait until something is buffered or the channel is finished."""
+        await self._ready.wait()
+
+    def finish(self) -> None:
+        """Mark the worker as done; the pump sends what is left and stops. Loop only."""
+        self.finished = True
+        self._ready.set()
+
+    def abort(self) -> None:
+        """Stop accepting output and release blocked writers."""
+        with self._cond:
+            self._aborted = True
+            self._writes.clear()
+            self._size = 0
+            self._cond.notify_all()
+
+
+async def pump_output(channel: OutputChannel, send: Callable[[Dict[str, Any]], Awaitable[None]],
+                      interval: float = DEFAULT_FLUSH_INTERVAL,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+    """
+    Forward buffered output as {"type": "stdout"|"stderr", "data": ...} messages.
+
+    Returns once the channel is finished and drained. If sending fails the
+    channel is aborted so the worker is never left blocked on a full buffer.
+
+    Args:
+        channel: Channel the worker writes to
+        send: Coroutine function sending one message, e.g. websocket.send_json
+        interval: Seconds to wait after the first write so later ones coalesce
+        chunk_size: Largest text per message
+    """
+    try:
+        while True:
+            await channel.wait()
+            if not channel.finished:
+                await asyncio.sleep(interval)
+            finished = channel.finished
+            for stream, text in channel.take(chunk_size):
+                await send({"type": stream, "data": text})
+            if finished:
+                return
+    except BaseException:
+        channel.abort()
+        raise
@@ -3,5 +3,6 @@ Utility functions and common helpers for PyCDN.
 """
 
 from .common import get_version, set_debug_mode, serialize_args, deserialize_result
+from .type_codecs import register_codec
 
-__all__ = ["get_version", "set_debug_mode", "serialize_args", "deserialize_result"] 
\ No newline at end of file
+__all__ = ["get_version", "set_debug_mode", "serialize_args", "deserialize_result", "register_codec"] 
\ No newline at end of file
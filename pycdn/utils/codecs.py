@@ -0,0 +1,207 @@
+"""
+Out-of-band buffer transport for pickled arguments and results.
+
+Arguments and results are pickled with protocol 5 and a buffer_callback,
+so any object that supports out-of-band pickling (NumPy arrays, Arrow
+buffers, anything reducing to a PickleBuffer) leaves its data out of the
+pickle stream. The data goes in the envelope's "buffers" list as memoryviews
+of the original objects. RPC frames carry each buffer as a raw segment, and
+the receiver hands the received memoryviews to pickle.loads, so large
+payloads are copied once into the outgoing frame and not again on
+arrival. Objects rebuilt over received buffers (arrays) are read-only.
+
+Two cases are handled here rather than left to the types themselves:
+
+- NumPy arrays reduce to load_array() over a flat byte buffer described by
+  dtype, shape and memory order. Non-contiguous arrays are made contiguous
+  rather than pickled in-band, and a receiver without NumPy gets nested
+  lists for plain numeric dtypes.
+- bytes and bytearray pickle in-band, and pickle does not consult
+  reducer_override for exact bytes, so large ones are wrapped in OutOfBand
+  before pickling. They are rebuilt with one copy, since their types must
+  own their memory.
+
+Nothing here imports NumPy: arrays can only be present if the caller
+already loaded it.
+"""
+
+import io
+import pickle
+import sys
+from typing import Any, List, Optional, Tuple, Union
+
+import cloudpickle
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+PICKLE_PROTOCOL = 5
+
+# bytes and bytearray values at least this long are sent out of band
+OUT_OF_BAND_MIN = 64 * 1024
+
+# Struct formats for list fallback when the receiver has no NumPy
+_STRUCT_FORMATS = {
+    "b1": "?", "i1": "b", "u1": "B", "i2": "h", "u2": "H", "i4": "i", "u4": "I",
+    "i8": "q", "u8": "Q", "f4": "f", "f8": "d",
+}
+_NATIVE_ORDER = "<" if sys.byteorder == "little" else ">"
+
+
+def _array_type() -> Optional[type]:
+    numpy = sys.modules.get("numpy")
+    return getattr(numpy, "ndarray", None)
+
+
+class OutOfBand:
+    """
+    Stand-in that pickles a bytes or bytearray value as an out-of-band buffer.
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: Union[bytes, bytearray]):
+        self.data = data
+
+    def __reduce_ex__(self, protocol: int) -> Tuple:
+        if protocol < 5:
+            return type(self.data), (bytes(self.data),)
+        return type(self.data), (pickle.PickleBuffer(self.data),)
+
+
+def out_of_band(value: Any) -> Any:
+    """Wrap value in OutOfBand if it is a large bytes or bytearray."""
+    if type(value) in (bytes, bytearray) and len(value) >= OUT_OF_BAND_MIN:
+        return OutOfBand(value)
+    return value
+
+
+class _BufferPickler(cloudpickle.Pickler):
+    """Protocol 5 cloudpickler collecting out-of-band buffers."""
+
+    def __init__(self, file: io.BytesIO, buffers: List[memoryview]):
+        super().__init__(file, protocol=PICKLE_PROTOCOL, buffer_callback=self._add_buffer)
+        self.buffers = buffers
+        self.ndarray = _array_type()
+
+    def _add_buffer(self, buffer: pickle.PickleBuffer) -> bool:
+        try:
+            self.buffers.append(buffer.raw())
+        except BufferError:
+            return True  # non-contiguous: pickle it in-band
+        return False
+
+    def reducer_override(self, obj: Any) -> Any:
+        # Subclasses (matrix, masked arrays) and object arrays pickle normally
+        if self.ndarray is not None and type(obj) is self.ndarray and not obj.dtype.hasobject:
+            return _reduce_array(obj)
+        return super().reducer_override(obj)
+
+
+def _reduce_array(array: Any) -> Tuple:
+    import numpy as np
+
+    if array.flags.c_contiguous:
+        order = "C"
+    elif array.flags.f_contiguous:
+        order = "F"
+    else:
+        array, order = np.ascontiguousarray(array), "C"
+    data = pickle.PickleBuffer(array.reshape(-1, order=order).view(np.uint8))
+    return load_array, (np.lib.format.dtype_to_descr(array.dtype), array.shape, order, data)
+
+
+def is_buffer(value: Any) -> bool:
+    """Whether value itself is data worth sending out of band."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value) >= OUT_OF_BAND_MIN
+    ndarray = _array_type()
+    if ndarray is not None and isinstance(value, ndarray):
+        return True
+    return isinstance(value, pickle.PickleBuffer) or type(value).__module__.startswith("pyarrow")
+
+
+def has_buffers(obj: Any, depth: int = 8) -> bool:
+    """
+    Whether obj holds data worth sending out of band.
+
+    Looks for NumPy arrays, Arrow objects, PickleBuffers and large bytes
+    values, directly or nested in lists, tuples and dicts.
+    """
+    def visit(value: Any, level: int) -> bool:
+        if is_buffer(value):
+            return True
+        if level >= depth:
+            return False
+        if isinstance(value, (list, tuple)):
+            return any(visit(item, level + 1) for item in value)
+        if isinstance(value, dict):
+            return any(visit(item, level + 1) for item in value.values())
+        return False
+
+    return visit(obj, 0)
+
+
+def wrap_large_bytes(obj: Any, depth: int = 8) -> Any:
+    """Copy of obj with large bytes values in lists, tuples and dicts wrapped in OutOfBand."""
+    if depth and isinstance(obj, (list, tuple)) and type(obj) in (list, tuple):
+        return type(obj)(wrap_large_bytes(item, depth - 1) for item in obj)
+    if depth and type(obj) is dict:
+        return {key: wrap_large_bytes(value, depth - 1) for key, value in obj.items()}
+    return out_of_band(obj)
+
+
+def dumps(obj: Any, buffers: List[memoryview]) -> bytes:
+    """
+    Pickle obj with protocol 5, appending its out-of-band buffers to buffers.
+
+    Args:
+        obj: Object to pickle
+        buffers: List the buffers are appended to; pickles sharing a list
+            must be loaded in the order they were dumped
+
+    Returns:
+        Pickle bytes
+    """
+    file = io.BytesIO()
+    _BufferPickler(file, buffers).dump(obj)
+    return file.getvalue()
+
+
+def loads(data: Buffer, buffers: Optional[List[Buffer]] = None) -> Any:
+    """Inverse of dumps()."""
+    return pickle.loads(data, buffers=buffers)
+
+
+def load_array(descr: Any, shape: Tuple[int, ...], order: str, buffer: Buffer) -> Any:
+    """
+    Rebuild an array over a received buffer without copying it.
+
+    Falls back to nested lists if NumPy is not installed.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return _array_to_list(descr, shape, order, buffer)
+    dtype = np.lib.format.descr_to_dtype(descr)
+    return np.frombuffer(buffer, dtype=dtype).reshape(shape, order=order)
+
+
+def _array_to_list(descr: Any, shape: Tuple[int, ...], order: str, buffer: Buffer) -> Any:
+    code = descr[1:] if isinstance(descr, str) else None
+    byteorder = descr[0] if isinstance(descr, str) else None
+    fmt = _STRUCT_FORMATS.get(code)
+    if fmt is None or byteorder not in (_NATIVE_ORDER, "|") or (order == "F" and len(shape) > 1):
+        raise ImportError(f"NumPy is required to receive an array of dtype {descr!r}")
+
+    view = memoryview(buffer).cast("B")
+    if not shape:
+        return view.cast(fmt)[0]
+    if 0 in shape:
+        return _empty_nested(shape)
+    return view.cast(fmt, shape).tolist()
+
+
+def _empty_nested(shape: Tuple[int, ...]) -> list:
+    if shape[0] == 0:
+        return []
+    return [_empty_nested(shape[1:]) for _ in range(shape[0])]
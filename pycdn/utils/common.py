@@ -6,9 +6,10 @@ import json
 import pickle
 import base64
 import logging
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, FrozenSet, Optional, Union
 import cloudpickle
-from .encryption import get_global_encryption
+
+from . import codecs, encoder, type_codecs
 
 # Global debug state
 _debug_mode = False
@@ -70,22 +71,27 @@ def serialize_args(*args, **kwargs) -> Dict[str, str]:
         elif isinstance(arg, dict):
             return {k: _process_arg(v) for k, v in arg.items()}
         else:
-            return arg
+            return codecs.out_of_band(arg)
     
     try:
         # Process arguments to handle LazyInstance objects
         processed_args = tuple(_process_arg(arg) for arg in args)
         processed_kwargs = {k: _process_arg(v) for k, v in kwargs.items()}
         
-        # Use cloudpickle for better serialization of complex objects
-        serialized_args = base64.b64encode(cloudpickle.dumps(processed_args)).decode('utf-8')
-        serialized_kwargs = base64.b64encode(cloudpickle.dumps(processed_kwargs)).decode('utf-8')
+        # Use cloudpickle for better serialization of complex objects;
+        # large binary data goes out of band as raw buffers
+        buffers = []
+        serialized_args = base64.b64encode(codecs.dumps(processed_args, buffers)).decode('utf-8')
+        serialized_kwargs = base64.b64encode(codecs.dumps(processed_kwargs, buffers)).decode('utf-8')
         
-        return {
+        serialized = {
             "args": serialized_args,
             "kwargs": serialized_kwargs,
             "serialization_method": "cloudpickle"
         }
+        if buffers:
+            serialized["buffers"] = buffers
+        return serialized
     except Exception as e:
         log_debug(f"Cloudpickle serialization failed: {e}, falling back to JSON")
         
@@ -103,6 +109,12 @@ def serialize_args(*args, **kwargs) -> Dict[str, str]:
         except Exception as json_e:
             raise ValueError(f"Failed to serialize arguments: {json_e}")
 
+def _pickled_bytes(data: Union[str, bytes]) -> bytes:
+    """Pickled payloads are base64 text over JSON and raw bytes over binary frames."""
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return data
+    return base64.b64decode(data)
+
 def deserialize_args(serialized_data: Dict[str, str]) -> tuple:
     """
     Deserialize function arguments received from client.
@@ -135,8 +147,10 @@ def deserialize_args(serialized_data: Dict[str, str]) -> tuple:
     
     try:
         if method == "cloudpickle":
-            args = cloudpickle.loads(base64.b64decode(serialized_data["args"]))
-            kwargs = cloudpickle.loads(base64.b64decode(serialized_data["kwargs"]))
+            # args and kwargs take their out-of-band buffers in turn
+            buffers = iter([_pickled_bytes(b) for b in serialized_data.get("buffers") or ()])
+            args = codecs.loads(_pickled_bytes(serialized_data["args"]), buffers)
+            kwargs = codecs.loads(_pickled_bytes(serialized_data["kwargs"]), buffers)
         else:
             args = json.loads(serialized_data["args"])
             kwargs = json.loads(serialized_data["kwargs"])
@@ -149,103 +163,60 @@ def deserialize_args(serialized_data: Dict[str, str]) -> tuple:
     except Exception as e:
         raise ValueError(f"Failed to deserialize arguments: {e}")
 
-def serialize_result(result: Any) -> Dict[str, str]:
+def _json_result(text: str) -> Dict[str, Any]:
+    return {
+        "result": text,
+        "serialization_method": "json",
+        "success": True
+    }
+
+def serialize_result(result: Any, accepted_codecs: Optional[FrozenSet[str]] = None) -> Dict[str, str]:
     """
     Serialize function result for transmission back to client.
     
+    Most results are encoded as JSON in a single json.dumps pass (see
+    pycdn.utils.encoder); arrays and large binary values are pickled with
+    their data out of band.
+    
     Args:
         result: Function execution result
+        accepted_codecs: Type codecs the client announced (see
+            pycdn.utils.type_codecs); other types are converted generically
         
     Returns:
         Dict containing serialized result
     """
-    def convert_to_basic_types(obj):
-        """Convert complex objects to basic Python types for safe serialization."""
+    try:
+        return _json_result(encoder.encode(result, accepted_codecs=accepted_codecs))
+    except encoder.OutOfBandData:
+        if codecs.has_buffers(result):
+            # Arrays and binary data keep their types, with their data out of band
+            try:
+                buffers = []
+                pickled = codecs.dumps(codecs.wrap_large_bytes(result), buffers)
+                return {
+                    "result": base64.b64encode(pickled).decode('utf-8'),
+                    "buffers": buffers,
+                    "serialization_method": "cloudpickle",
+                    "success": True
+                }
+            except Exception as e:
+                log_debug(f"Out-of-band result serialization failed: {e}, converting to basic types")
+        # Arrays inside converted objects become strings, as other attributes do
         try:
-            # Handle common object types that might not deserialize well
-            if hasattr(obj, '__dict__'):
-                # Convert objects with __dict__ to dictionaries
-                if hasattr(obj, 'model_dump'):
-                    # Pydantic models (like OpenAI responses)
-                    result_dict = obj.model_dump()
-                    # Add type information so DictWrapper can restore object interface
-                    result_dict['__type__'] = type(obj).__name__
-                    result_dict['__module__'] = getattr(type(obj), '__module__', 'unknown')
-                    # Recursively process nested objects
-                    for key, value in result_dict.items():
-                        if not key.startswith('__'):
-                            result_dict[key] = convert_to_basic_types(value)
-                    return result_dict
-                elif hasattr(obj, 'dict'):
-                    # Objects with dict() method
-                    result_dict = obj.dict()
-                    # Add type information so DictWrapper can restore object interface
-                    result_dict['__type__'] = type(obj).__name__
-                    result_dict['__module__'] = getattr(type(obj), '__module__', 'unknown')
-                    # Recursively process nested objects
-                    for key, value in result_dict.items():
-                        if not key.startswith('__'):
-                            result_dict[key] = convert_to_basic_types(value)
-                    return result_dict
-                elif hasattr(obj, 'to_dict'):
-                    # Objects with to_dict() method
-                    result_dict = obj.to_dict()
-                    # Add type information so DictWrapper can restore object interface
-                    result_dict['__type__'] = type(obj).__name__
-                    result_dict['__module__'] = getattr(type(obj), '__module__', 'unknown')
-                    # Recursively process nested objects
-                    for key, value in result_dict.items():
-                        if not key.startswith('__'):
-                            result_dict[key] = convert_to_basic_types(value)
-                    return result_dict
-                else:
-                    # Generic object conversion
-                    result_dict = {}
-                    for key, value in obj.__dict__.items():
-                        if not key.startswith('_'):  # Skip private attributes
-                            try:
-                                result_dict[key] = convert_to_basic_types(value)
-                            except:
-                                result_dict[key] = str(value)
-                    
-                    # Add type information for debugging
-                    result_dict['__type__'] = type(obj).__name__
-                    result_dict['__module__'] = getattr(type(obj), '__module__', 'unknown')
-                    return result_dict
-            
-            # Handle sequences
-            elif isinstance(obj, (list, tuple)):
-                return [convert_to_basic_types(item) for item in obj]
-            
-            # Handle dictionaries
-            elif isinstance(obj, dict):
-                return {str(k): convert_to_basic_types(v) for k, v in obj.items()}
-            
-            # Basic types that are safe to serialize
-            elif isinstance(obj, (str, int, float, bool, type(None))):
-                return obj
-            
-            # For anything else, convert to string
-            else:
-                return str(obj)
-                
-        except Exception as e:
-            log_debug(f"Error converting object to basic types: {e}")
-            return str(obj)
+            return _json_result(encoder.encode(result, out_of_band=False,
+                                               accepted_codecs=accepted_codecs))
+        except (TypeError, ValueError, RecursionError):
+            pass
+    except (TypeError, ValueError, RecursionError) as e:
+        log_debug(f"Result is not JSON as it is ({e}), converting to basic types")
     
     try:
-        # First try to convert to basic types for safer deserialization
-        converted_result = convert_to_basic_types(result)
+        converted_result = encoder.to_basic_types(result, accepted_codecs)
         
-        # Try JSON serialization first (safest)
         try:
-            json.dumps(converted_result)  # Test if it's JSON serializable
-            return {
-                "result": json.dumps(converted_result),
-                "serialization_method": "json",
-                "success": True
-            }
-        except:
+            return _json_result(json.dumps(converted_result))
+        except (TypeError, ValueError):
             # If JSON fails, try cloudpickle on the converted result
             try:
                 serialized_result = base64.b64encode(cloudpickle.dumps(converted_result)).decode('utf-8')
@@ -280,6 +251,52 @@ def serialize_result(result: Any) -> Dict[str, str]:
                 "success": True
             }
 
+def _wrap_converted_objects(obj):
+    """
+    Recursively wrap dictionaries that were converted from objects 
+    to restore object-like attribute access.
+    """
+    if isinstance(obj, dict):
+        # If this dict has __type__ field, it was converted from an object
+        if '__type__' in obj:
+            return DictWrapper(obj)
+        else:
+            # Regular dict - recursively process values
+            return {k: _wrap_converted_objects(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        # Process list items
+        return [_wrap_converted_objects(item) for item in obj]
+    else:
+        # Basic type, return as-is
+        return obj
+
+def _wrap_hook(data: Dict[str, Any]) -> Any:
+    """json.loads object_hook wrapping converted objects as they are parsed."""
+    return DictWrapper(data) if '__type__' in data else data
+
+def _codec_and_wrap_hook(data: Dict[str, Any]) -> Any:
+    if type_codecs.CODEC_KEY in data:
+        return type_codecs.registry.object_hook(data)
+    return DictWrapper(data) if '__type__' in data else data
+
+def _load_json(data: Union[str, bytes]) -> Any:
+    """
+    json.loads with converted objects wrapped and type codec tags decoded.
+    
+    Both happen in object_hook while the text is parsed, so the result is
+    not walked a second time; text without either marker skips the hook.
+    """
+    if isinstance(data, str):
+        codec_marker, type_marker = type_codecs.CODEC_KEY, '"__type__"'
+    else:
+        codec_marker, type_marker = type_codecs.CODEC_KEY.encode(), b'"__type__"'
+    if codec_marker in data:
+        return json.loads(data, object_hook=_codec_and_wrap_hook)
+    if type_marker in data:
+        return json.loads(data, object_hook=_wrap_hook)
+    return json.loads(data)
+
+
 def deserialize_result(serialized_data: Dict[str, Any]) -> Any:
     """
     Deserialize function result received from server.
@@ -297,36 +314,19 @@ def deserialize_result(serialized_data: Dict[str, Any]) -> Any:
     method = serialized_data.get("serialization_method", "json")
     result_data = serialized_data["result"]
     
-    def wrap_converted_objects(obj):
-        """
-        Recursively wrap dictionaries that were converted from objects 
-        to restore object-like attribute access.
-        """
-        if isinstance(obj, dict):
-            # If this dict has __type__ field, it was converted from an object
-            if '__type__' in obj:
-                return DictWrapper(obj)
-            else:
-                # Regular dict - recursively process values
-                return {k: wrap_converted_objects(v) for k, v in obj.items()}
-        elif isinstance(obj, list):
-            # Process list items
-            return [wrap_converted_objects(item) for item in obj]
-        else:
-            # Basic type, return as-is
-            return obj
-    
     try:
         if method == "cloudpickle":
-            result = cloudpickle.loads(base64.b64decode(result_data))
+            buffers = [_pickled_bytes(b) for b in serialized_data.get("buffers") or ()]
+            result = codecs.loads(_pickled_bytes(result_data), buffers)
         elif method == "json":
-            result = json.loads(result_data)
+            # Wrapped while parsing
+            return _load_json(result_data)
         else:
             # String fallback
             result = result_data
         
         # Apply smart wrapping to restore object interfaces
-        return wrap_converted_objects(result)
+        return _wrap_converted_objects(result)
         
     except Exception as e:
         raise ValueError(f"Failed to deserialize result: {e}")
@@ -444,26 +444,7 @@ def deserialize_from_transport(data: Any) -> Any:
         result = data
     
     # Apply DictWrapper wrapping for consistent behavior
-    def wrap_converted_objects(obj):
-        """
-        Recursively wrap dictionaries that were converted from objects 
-        to restore object-like attribute access.
-        """
-        if isinstance(obj, dict):
-            # If this dict has __type__ field, it was converted from an object
-            if '__type__' in obj:
-                return DictWrapper(obj)
-            else:
-                # Regular dict - recursively process values
-                return {k: wrap_converted_objects(v) for k, v in obj.items()}
-        elif isinstance(obj, list):
-            # Process list items
-            return [wrap_converted_objects(item) for item in obj]
-        else:
-            # Basic type, return as-is
-            return obj
-    
-    return wrap_converted_objects(result)
+    return _wrap_converted_objects(result)
 
 
 def parse_cache_size(size_str: Union[str, int]) -> int:
@@ -473,31 +454,86 @@ def parse_cache_size(size_str: Union[str, int]) -> int:
     return parse_size(size_str)
 
 
+_get = object.__getattribute__
+
+
+# _data of a ColumnRow whose dictionary is not built yet
+_UNBUILT = object()
+
+
+def _data_of(wrapper: "DictWrapper") -> Any:
+    data = _get(wrapper, "_data")
+    if data is _UNBUILT:
+        return _get(wrapper, "_materialize")()
+    return data
+
+
 class DictWrapper:
     """
     A wrapper that makes dictionaries behave like objects with attribute access.
     This allows converted objects to maintain their original interface.
+    
+    The wrapper reads through to the dictionary it was given. Nested
+    dictionaries, and dictionaries in lists, are wrapped when they are first
+    accessed, and the wrappers are cached, so a large result costs nothing
+    beyond the parsed JSON until it is used.
     """
     
+    # _children (the cache of wrapped values) is only set once something is cached
+    __slots__ = ("_data", "_children")
+    
     def __init__(self, data: dict):
-        # Store the data in __dict__ to enable attribute access
-        if isinstance(data, dict):
-            # Convert nested dictionaries to DictWrappers as well
-            wrapped_data = {}
-            for key, value in data.items():
-                if isinstance(value, dict) and not key.startswith('__'):
-                    wrapped_data[key] = DictWrapper(value)
-                elif isinstance(value, list):
-                    wrapped_data[key] = [
-                        DictWrapper(item) if isinstance(item, dict) else item 
-                        for item in value
-                    ]
-                else:
-                    wrapped_data[key] = value
-            self.__dict__.update(wrapped_data)
+        # Slot descriptors directly: results can hold a wrapper per list item
+        _set_data(self, data)
+    
+    def __getattribute__(self, name):
+        # Keys shadow methods, as instance attributes would (e.g. a response's "items")
+        data = _data_of(self)
+        if isinstance(data, dict) and name in data:
+            return _get(self, "_child")(name)
+        return _get(self, name)
+    
+    def __setattr__(self, name, value):
+        data = _data_of(self)
+        if not isinstance(data, dict):
+            raise AttributeError(f"Cannot set attribute {name!r} on a wrapped {type(data).__name__}")
+        data[name] = value
+        _forget_child(self, name)
+    
+    def __delattr__(self, name):
+        data = _data_of(self)
+        if not isinstance(data, dict) or name not in data:
+            raise AttributeError(name)
+        del data[name]
+        _forget_child(self, name)
+    
+    def _child(self, key):
+        """Value under key, with dictionaries wrapped on first access."""
+        try:
+            children = _get(self, "_children")
+        except AttributeError:
+            children = None
         else:
-            # Not a dict, store as-is
-            self.__dict__['_data'] = data
+            if key in children:
+                return children[key]
+        value = _data_of(self)[key]
+        if isinstance(value, dict) and not (isinstance(key, str) and key.startswith('__')):
+            value = DictWrapper(value)
+        elif isinstance(value, list):
+            value = [DictWrapper(item) if isinstance(item, dict) else item for item in value]
+        else:
+            return value
+        if children is None:
+            children = {}
+            _set_children(self, children)
+        children[key] = value
+        return value
+    
+    def _public_keys(self):
+        data = _data_of(self)
+        if not isinstance(data, dict):
+            return []
+        return [k for k in data if not (isinstance(k, str) and k.startswith('_'))]
     
     def __getitem__(self, key):
         """Support dictionary-style access."""
@@ -509,21 +545,32 @@ class DictWrapper:
         """Support 'in' operator."""
         return hasattr(self, key)
     
+    def __dir__(self):
+        return sorted(set(dir(type(self))) | {k for k in _get(self, "_public_keys")()
+                                              if isinstance(k, str)})
+    
     def get(self, key, default=None):
         """Support dict.get() method."""
         return getattr(self, key, default)
     
     def keys(self):
         """Support dict.keys() method."""
-        return [k for k in self.__dict__.keys() if not k.startswith('_')]
+        return _get(self, "_public_keys")()
     
     def values(self):
         """Support dict.values() method."""
-        return [v for k, v in self.__dict__.items() if not k.startswith('_')]
+        child = _get(self, "_child")
+        return [child(k) for k in _get(self, "_public_keys")()]
     
     def items(self):
         """Support dict.items() method."""
-        return [(k, v) for k, v in self.__dict__.items() if not k.startswith('_')]
+        child = _get(self, "_child")
+        return [(k, child(k)) for k in _get(self, "_public_keys")()]
+    
+    def __reduce__(self):
+        # Rebuilt from the dictionary: the slot hooks above expect _data to exist
+        # already, which copy and pickle's default slot restore does not ensure
+        return DictWrapper, (_data_of(self),)
     
     def __repr__(self):
         type_info = getattr(self, '__type__', 'DictWrapper')
@@ -533,4 +580,57 @@ class DictWrapper:
         return f"<{type_info} (via PyCDN)>"
     
     def __str__(self):
-        return self.__repr__() 
\ No newline at end of file
+        return self.__repr__()
+
+
+_set_data = DictWrapper._data.__set__
+_set_children = DictWrapper._children.__set__
+
+
+def _forget_child(wrapper: DictWrapper, key: Any) -> None:
+    try:
+        _get(wrapper, "_children").pop(key, None)
+    except AttributeError:
+        pass 
+
+
+class ColumnRow(DictWrapper):
+    """
+    One row of a list sent in columnar form (see pycdn.utils.encoder).
+    
+    The row keeps its index into the shared columns and builds the
+    dictionary of a converted object only when it is first used.
+    """
+    
+    __slots__ = ("_table", "_index")
+    
+    def __init__(self, table: Dict[str, Any], index: int):
+        _set_data(self, _UNBUILT)
+        _set_table(self, table)
+        _set_index(self, index)
+    
+    def _materialize(self) -> Dict[str, Any]:
+        table = _get(self, "_table")
+        index = _get(self, "_index")
+        data = dict(zip(table["keys"], [column[index] for column in table["columns"]]))
+        data["__type__"] = table["type"]
+        data["__module__"] = table["module"]
+        _set_data(self, data)
+        return data
+
+
+_set_table = ColumnRow._table.__set__
+_set_index = ColumnRow._index.__set__
+
+
+def _decode_columns(table: Dict[str, Any]) -> list:
+    """Rows of a columnar list, as ColumnRow views of the shared columns."""
+    length = table["length"]
+    if len(table["keys"]) != len(table["columns"]) or any(
+            len(column) != length for column in table["columns"]):
+        raise ValueError("Columnar list has columns of different lengths")
+    return [ColumnRow(table, index) for index in range(length)]
+
+
+type_codecs.registry.register(type_codecs.TypeCodec(
+    encoder.COLUMNS, [], encoder.to_columns, _decode_columns))
@@ -0,0 +1,220 @@
+"""
+Content-Encoding support shared by the client and server.
+
+Bodies are compressed with zstd when the optional zstandard package is
+installed on both sides, and with gzip otherwise. Small bodies are sent as
+they are: below a threshold of about a kilobyte, compression costs more
+CPU time than it saves on the wire. Streamed responses use a compressor
+that is flushed after every chunk, so each chunk can be decoded as soon as
+it arrives.
+"""
+
+import gzip
+import threading
+import zlib
+from typing import Any, Dict, List, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Bodies smaller than this many bytes are not compressed
+DEFAULT_THRESHOLD = 1024
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Compressed bodies larger than this fraction of the original (pickled
+# arrays, already-compressed data) are sent uncompressed instead
+MAX_RATIO = 0.9
+
+# Bodies larger than four samples are judged by compressing their first
+# sample before spending CPU time on the whole
+SAMPLE_SIZE = 64 * 1024
+
+# Read size when decompressing with a size limit
+_DECOMPRESS_CHUNK = 1024 * 1024
+
+
+class CompressionError(ValueError):
+    """A body is in an unsupported encoding, corrupt, or decompresses too large."""
+
+
+class BodyTooLarge(CompressionError):
+    """A body decompresses beyond the size allowed."""
+
+
+def supported_encodings() -> List[str]:
+    """Encodings this process can read and write, most preferred first."""
+    return ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick a response encoding from an Accept-Encoding header.
+
+    Args:
+        accept_encoding: Header value, e.g. "gzip, deflate, zstd;q=0.9"
+
+    Returns:
+        The most preferred supported encoding the client accepts, or None
+    """
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in supported_encodings():
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def pays_off(raw_size: int, encoded_size: int) -> bool:
+    """Whether a compressed body is enough smaller to be worth sending."""
+    return encoded_size <= raw_size * MAX_RATIO
+
+
+def compress_if_smaller(data: bytes, encoding: str) -> Optional[bytes]:
+    """
+    Compress a body if that makes it meaningfully smaller.
+
+    Returns:
+        The compressed body, or None if it should be sent as it is
+    """
+    if len(data) > 4 * SAMPLE_SIZE:
+        sample = bytes(memoryview(data)[:SAMPLE_SIZE])
+        if not pays_off(len(sample), len(compress(sample, encoding))):
+            return None
+    encoded = compress(data, encoding)
+    return encoded if pays_off(len(data), len(encoded)) else None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Compress a whole body."""
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    raise CompressionError(f"Unsupported content encoding: {encoding}")
+
+
+def decompress(data: bytes, encoding: str, max_size: Optional[int] = None) -> bytes:
+    """
+    Decompress a whole body.
+
+    Args:
+        data: Compressed body
+        encoding: Its Content-Encoding
+        max_size: Largest decompressed size accepted (None for no limit)
+
+    Raises:
+        CompressionError: If the encoding is unsupported, the data corrupt,
+            or the output would exceed max_size
+    """
+    limit = max_size if max_size is not None else -1
+    try:
+        if encoding == "gzip":
+            # wbits 31: gzip header and trailer
+            decompressor = zlib.decompressobj(31)
+            output = decompressor.decompress(data, limit + 1 if limit >= 0 else 0)
+            if not decompressor.eof and not (limit >= 0 and len(output) > limit):
+                raise CompressionError("Truncated gzip body")
+        elif encoding == "zstd" and zstandard is not None:
+            chunks, size = [], 0
+            reader = zstandard.ZstdDecompressor().read_to_iter(data, read_size=_DECOMPRESS_CHUNK)
+            for chunk in reader:
+                chunks.append(chunk)
+                size += len(chunk)
+                if 0 <= limit < size:
+                    break
+            output = b"".join(chunks)
+        else:
+            raise CompressionError(f"Unsupported content encoding: {encoding}")
+    except (zlib.error, getattr(zstandard, "ZstdError", zlib.error)) as e:
+        raise CompressionError(f"Corrupt {encoding} body: {e}") from e
+    if 0 <= limit < len(output):
+        raise BodyTooLarge(f"Decompressed body exceeds {max_size} bytes")
+    return output
+
+
+class StreamCompressor:
+    """
+    Incremental compressor for chunked bodies.
+
+    Every chunk is flushed to a block boundary, so the receiver can decode
+    everything sent so far without waiting for the end of the stream.
+    """
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._flush_mode = zlib.Z_SYNC_FLUSH
+        elif encoding == "zstd" and zstandard is not None:
+            self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+            self._flush_mode = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            raise CompressionError(f"Unsupported content encoding: {encoding}")
+
+    def compress(self, chunk: bytes) -> bytes:
+        """Compress a chunk and flush it."""
+        return self._compressor.compress(chunk) + self._compressor.flush(self._flush_mode)
+
+    def finish(self) -> bytes:
+        """End the stream."""
+        return self._compressor.flush()
+
+
+class CompressionStats:
+    """
+    Thread-safe counters for one direction of compression.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.compressed = 0
+        self.skipped = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+
+    def record(self, raw_size: int, encoded_size: int, cpu_seconds: float = 0.0) -> None:
+        """
+        Count a compressed (or decompressed) body.
+
+        Args:
+            raw_size: Uncompressed size in bytes
+            encoded_size: Size on the wire
+            cpu_seconds: Thread CPU time spent (time.thread_time() difference)
+        """
+        with self._lock:
+            self.compressed += 1
+            self.bytes_in += raw_size
+            self.bytes_out += encoded_size
+            self.cpu_seconds += cpu_seconds
+
+    def record_skipped(self) -> None:
+        """Count a body sent uncompressed."""
+        with self._lock:
+            self.skipped += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "compressed": self.compressed,
+                "skipped": self.skipped,
+                "bytes_uncompressed": self.bytes_in,
+                "bytes_compressed": self.bytes_out,
+                "ratio": round(self.bytes_in / self.bytes_out, 3) if self.bytes_out else None,
+                "cpu_seconds": round(self.cpu_seconds, 6),
+            }
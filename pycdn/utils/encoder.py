@@ -0,0 +1,261 @@
+"""
+Single-pass JSON encoding of function results.
+
+json.dumps walks the result once in C. JSON-native values (str, int,
+float, bool, None, and lists, tuples and dicts of them, subclasses
+included) never reach Python code. Other objects reach the default hook
+as the encoder meets them, and are converted by a function chosen once
+per type:
+
+- model_dump(), dict() or to_dict() output (Pydantic models, API
+  responses, DataFrames), tagged with __type__ and __module__ so the
+  client's DictWrapper can restore attribute access
+- public instance attributes, tagged the same way
+- str() for everything else
+
+Types with a codec the client announced (see pycdn.utils.type_codecs)
+are tagged with that codec before any of these are tried. A conversion
+that raises falls back to str() for that object alone.
+
+For clients that announce the "columns" codec, lists of objects of one
+type that convert to the same keys are sent as columns instead of one
+tagged dict per object, so keys and tags appear once per list:
+
+    {"__codec__": "columns", "value": {"type": "Row", "module": "app",
+     "keys": ["id", "name"], "columns": [[1, 2], ["a", "b"]], "length": 2}}
+
+That covers the result itself, the values of a result dict, and the
+attributes of converted objects (a response's list of items); lists
+nested deeper go row by row.
+Results JSON cannot take as they are (dict keys that are not strings or
+numbers, reference cycles) are converted by to_basic_types(), a Python
+walk over the same converters, before serialize_result tries its other
+methods.
+"""
+
+import json
+from types import ModuleType
+from typing import Any, Callable, Dict, FrozenSet, Optional
+
+from . import codecs, type_codecs
+
+# Types whose converter is decided per object rather than cached
+_UNCACHED = (type, ModuleType)
+
+# Converters cached per type; cleared if a process creates types endlessly
+_MAX_CACHED_TYPES = 4096
+
+_JSON_SCALARS = (str, int, float, bool, type(None))
+
+# Codec name of columnar lists; decoded by pycdn.utils.common
+COLUMNS = "columns"
+
+# Shorter lists are sent row by row
+MIN_COLUMNAR_ROWS = 4
+
+_TAGS = ("__type__", "__module__")
+
+
+class OutOfBandData(Exception):
+    """The result holds arrays or binary data that travel better out of band."""
+
+
+def _tagged(obj: Any, data: Dict[str, Any]) -> Dict[str, Any]:
+    data["__type__"] = type(obj).__name__
+    data["__module__"] = getattr(type(obj), "__module__", "unknown")
+    return data
+
+
+def _from_model_dump(obj: Any) -> Dict[str, Any]:
+    return _tagged(obj, obj.model_dump())
+
+
+def _from_dict_method(obj: Any) -> Dict[str, Any]:
+    return _tagged(obj, obj.dict())
+
+
+def _from_to_dict(obj: Any) -> Dict[str, Any]:
+    return _tagged(obj, obj.to_dict())
+
+
+def _from_attributes(obj: Any) -> Dict[str, Any]:
+    return _tagged(obj, {key: value for key, value in vars(obj).items()
+                         if not key.startswith("_")})
+
+
+_converters: Dict[type, Callable[[Any], Any]] = {}
+
+
+def _converter(obj: Any) -> Callable[[Any], Any]:
+    """Conversion for a non-JSON object, looked up by type."""
+    kind = type(obj)
+    converter = _converters.get(kind)
+    if converter is not None:
+        return converter
+
+    if not hasattr(obj, "__dict__"):
+        converter = str
+    elif hasattr(obj, "model_dump"):
+        converter = _from_model_dump
+    elif hasattr(obj, "dict"):
+        converter = _from_dict_method
+    elif hasattr(obj, "to_dict"):
+        converter = _from_to_dict
+    else:
+        converter = _from_attributes
+
+    if not isinstance(obj, _UNCACHED):
+        if len(_converters) >= _MAX_CACHED_TYPES:
+            _converters.clear()
+        _converters[kind] = converter
+    return converter
+
+
+def convert_object(obj: Any) -> Any:
+    """Convert one non-JSON object to a tagged dict or a string."""
+    try:
+        return _converter(obj)(obj)
+    except Exception:
+        return str(obj)
+
+
+def _convert_or_stop(obj: Any) -> Any:
+    converter = _converter(obj)
+    # Arrays, bytes and Arrow objects have no __dict__, so only str() could take them
+    if converter is str and codecs.is_buffer(obj):
+        raise OutOfBandData(type(obj).__name__)
+    try:
+        return converter(obj)
+    except Exception:
+        return str(obj)
+
+
+def to_columns(rows: Any, accepted: FrozenSet[str] = frozenset()) -> Optional[Dict[str, Any]]:
+    """
+    Columnar form of a list of like objects, or None if it has none.
+
+    The objects must share a type that converts to a tagged dict (no codec
+    in accepted, no str() fallback), every conversion must succeed, and
+    all must produce the same keys in the same order.
+    """
+    if len(rows) < MIN_COLUMNAR_ROWS:
+        return None
+    kind = type(rows[0])
+    if kind in _JSON_SCALARS or isinstance(rows[0], (list, tuple, dict, _UNCACHED)):
+        return None
+    for row in rows:
+        if type(row) is not kind:
+            return None
+    codec = type_codecs.registry.codec_for(rows[0])
+    if codec is not None and codec.name in accepted:
+        return None
+    converter = _converter(rows[0])
+    if converter is str:
+        return None
+
+    try:
+        converted = [converter(row) for row in rows]
+    except Exception:
+        return None
+    keys = tuple(converted[0])
+    for data in converted:
+        if tuple(data) != keys:
+            return None
+    first = converted[0]
+    fields = [key for key in keys if key not in _TAGS]
+    return {type_codecs.CODEC_KEY: COLUMNS, "value": {
+        "type": first.get("__type__"),
+        "module": first.get("__module__"),
+        "keys": fields,
+        "columns": [[data[key] for data in converted] for key in fields],
+        "length": len(converted),
+    }}
+
+
+def _columnar_values(data: Dict[Any, Any], accepted: FrozenSet[str]) -> Dict[Any, Any]:
+    """data with its lists of like objects in columnar form (a copy if any changed)."""
+    copied = False
+    for key, value in data.items():
+        if type(value) in (list, tuple) and len(value) >= MIN_COLUMNAR_ROWS:
+            columns = to_columns(value, accepted)
+            if columns is not None:
+                if not copied:
+                    data, copied = dict(data), True
+                data[key] = columns
+    return data
+
+
+def _with_codecs(accepted: FrozenSet[str], convert: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    """Default hook trying the accepted type codecs before convert."""
+    registry = type_codecs.registry
+    columnar = COLUMNS in accepted
+
+    def default(obj: Any) -> Any:
+        codec = registry.codec_for(obj)
+        if codec is not None and codec.name in accepted:
+            if convert is _convert_or_stop and codecs.is_buffer(obj):
+                raise OutOfBandData(type(obj).__name__)
+            try:
+                return registry.tag(codec, obj)
+            except Exception:
+                pass
+        converted = convert(obj)
+        if columnar and type(converted) is dict:
+            return _columnar_values(converted, accepted)
+        return converted
+
+    return default
+
+
+def _columnar(result: Any, accepted: FrozenSet[str]) -> Any:
+    """result with its top-level lists of like objects in columnar form."""
+    if type(result) in (list, tuple):
+        return to_columns(result, accepted) or result
+    if type(result) is dict:
+        return _columnar_values(result, accepted)
+    return result
+
+
+def encode(result: Any, out_of_band: bool = True,
+           accepted_codecs: Optional[FrozenSet[str]] = None) -> str:
+    """
+    Encode a result as JSON text in one pass.
+
+    Args:
+        result: Function result
+        out_of_band: Stop with OutOfBandData at the first array or large
+            bytes value instead of converting it to a string
+        accepted_codecs: Type codecs the client can decode
+
+    Raises:
+        OutOfBandData: See out_of_band
+        TypeError, ValueError, RecursionError: If JSON cannot hold the
+            result as it is; to_basic_types() handles those
+    """
+    convert = _convert_or_stop if out_of_band else convert_object
+    if accepted_codecs:
+        convert = _with_codecs(accepted_codecs, convert)
+        if COLUMNS in accepted_codecs:
+            result = _columnar(result, accepted_codecs)
+    return json.dumps(result, default=convert)
+
+
+def to_basic_types(obj: Any, accepted_codecs: Optional[FrozenSet[str]] = None) -> Any:
+    """
+    Copy of obj made only of JSON types, with string dict keys.
+
+    The slow path for results encode() rejects.
+    """
+    if type(obj) in _JSON_SCALARS:
+        return obj
+    if isinstance(obj, (list, tuple)):
+        return [to_basic_types(item, accepted_codecs) for item in obj]
+    if isinstance(obj, dict):
+        return {str(key): to_basic_types(value, accepted_codecs) for key, value in obj.items()}
+    if isinstance(obj, (str, int, float)):
+        return obj
+    if accepted_codecs:
+        converted = _with_codecs(accepted_codecs, convert_object)(obj)
+    else:
+        converted = convert_object(obj)
+    return to_basic_types(converted, accepted_codecs)
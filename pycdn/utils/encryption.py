@@ -5,14 +5,19 @@ Automatically encrypts API keys, tokens, and secrets.
 
 import os
 import base64
+import binascii
 import json
 import hashlib
-from typing import Any, Dict, List, Tuple, Optional
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.primitives.asymmetric import rsa, padding
-from cryptography.hazmat.primitives import serialization
+import stat
+import re
+import tempfile
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Tuple, Optional
+
+# cryptography is imported when a key is first needed, so the client can
+# import this module (and install the os.getenv hook) without paying for it
+if TYPE_CHECKING:
+    from cryptography.fernet import Fernet
 
 # List of sensitive parameter names that should be automatically encrypted
 SENSITIVE_KEYWORDS = {
@@ -25,58 +30,302 @@ SENSITIVE_KEYWORDS = {
     'authorization', 'auth'
 }
 
+# Key derivation parameters shared by client and server
+KDF_PASSWORD = b"pycdn_v1_encryption_key"
+KDF_SALT = b"pycdn_deterministic_salt_v1"  # Fixed salt for client-server consistency
+KDF_ITERATIONS = 100000
+
+# Pre-derived Fernet key (urlsafe base64) that skips PBKDF2 entirely
+KEY_ENV_VAR = "PYCDN_ENCRYPTION_KEY"
+# Directory for the on-disk key cache; an empty value disables it
+KEY_CACHE_DIR_ENV_VAR = "PYCDN_KEY_CACHE_DIR"
+
+# Shape of an encrypt_data payload, so nested user dicts are left alone
+_ENCRYPTED_PAYLOAD_KEYS = {"data", "encrypted", "method"}
+
 # Global registry for environment variables that were loaded via dotenv
 _dotenv_loaded_vars = set()
 
-def is_sensitive_parameter(param_name: str, param_value: Any) -> bool:
+# Keys resolved in this process, by KDF parameters
+_resolved_keys: Dict[Tuple[bytes, bytes, int], bytes] = {}
+
+# Compiled once: a single alternation over the keywords replaces a Python
+# loop per keyword. Longest first so the regex engine tries specific names
+# before their substrings; any match still means "contains a keyword".
+_SENSITIVE_NAME_PATTERN = re.compile(
+    "|".join(re.escape(k) for k in sorted(SENSITIVE_KEYWORDS, key=len, reverse=True))
+)
+
+# The keywords as runs of name components, for is_credential_name
+_KEYWORD_COMPONENTS = {tuple(re.split(r"[^a-z0-9]+", k)) for k in SENSITIVE_KEYWORDS}
+
+# Well-known token prefixes: OpenAI (sk-), Anthropic (ant-), HuggingFace (hf_)
+SECRET_VALUE_PREFIXES = ('sk-', 'ant-', 'hf_')
+
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+_HAS_LETTER = re.compile(r"[^\W\d_]")
+_HAS_DIGIT = re.compile(r"\d")
+
+
+@lru_cache(maxsize=4096)
+def is_sensitive_name(param_name: str) -> bool:
+    """
+    Check whether a parameter name contains a sensitive keyword.
+    
+    Memoized, since the same handful of keyword names recur on every call.
+    """
+    return _SENSITIVE_NAME_PATTERN.search(param_name.lower()) is not None
+
+def _name_components(name: str) -> Tuple[str, ...]:
+    # apiKey, api_key, api-key and "api key" all become ("api", "key")
+    return tuple(part for part in re.split(r"[^a-z0-9]+", _CAMEL_BOUNDARY.sub("_", name).lower())
+                 if part)
+
+@lru_cache(maxsize=4096)
+def is_credential_name(param_name: str) -> bool:
+    """
+    Check whether a parameter name is a sensitive keyword as a whole word.
+    
+    Stricter than is_sensitive_name: the keyword must appear as one or more
+    whole components of the name (split on "_", "-", spaces and camelCase),
+    so api_key and openaiApiKey match while author, passage and max_tokens
+    do not.
+    """
+    components = _name_components(param_name)
+    for keyword in _KEYWORD_COMPONENTS:
+        size = len(keyword)
+        for start in range(len(components) - size + 1):
+            if components[start:start + size] == keyword:
+                return True
+    return False
+
+def is_sensitive_value(param_value: str, generic_patterns: bool = True) -> bool:
+    """
+    Check whether a string looks like a secret regardless of its name.
+    
+    Args:
+        param_value: String value
+        generic_patterns: Also flag any long mixed letter/digit string
+        
+    Returns:
+        True if the value should be treated as sensitive
+    """
+    # Values registered from sensitive environment variables
+    if param_value in _dotenv_loaded_vars:
+        return True
+    
+    length = len(param_value)
+    if length > 20 and param_value.startswith(SECRET_VALUE_PREFIXES):
+        return True
+    
+    # Generic API key patterns (long strings with mix of letters/numbers)
+    return (generic_patterns and length > 25 and
+            _HAS_LETTER.search(param_value) is not None and
+            _HAS_DIGIT.search(param_value) is not None)
+
+def is_sensitive_parameter(param_name: str, param_value: Any,
+                           generic_patterns: bool = True) -> bool:
     """
     Determine if a parameter contains sensitive data that should be encrypted.
     
     Args:
         param_name: Parameter name
         param_value: Parameter value
+        generic_patterns: Also flag any long mixed letter/digit string
         
     Returns:
         True if parameter should be encrypted
     """
     if not isinstance(param_value, str):
         return False
+    return is_sensitive_name(param_name) or is_sensitive_value(param_value, generic_patterns)
+
+def map_sensitive(value: Any, visit: Callable[[str], Any], name: Optional[str] = None,
+                  generic_patterns: bool = True, strict_names: bool = False) -> Any:
+    """
+    Apply visit to every sensitive string in a nested structure, in one pass.
     
-    param_name_lower = param_name.lower()
+    Dictionary entries are judged by their key, list and tuple items inherit
+    the name of the container they sit in (so tokens=[...] is covered), and
+    unnamed values such as positional arguments by their content alone.
+    Containers are only rebuilt when something inside them changed.
     
-    # Check against known sensitive keywords in parameter name
-    for keyword in SENSITIVE_KEYWORDS:
-        if keyword in param_name_lower:
-            return True
+    Args:
+        value: Argument value, possibly nested dicts, lists and tuples
+        visit: Called with each sensitive string; its return value replaces it
+        name: Name the value was passed under, if any
+        generic_patterns: Also flag any long mixed letter/digit string
+        strict_names: Judge names with is_credential_name, and do not let
+            list and tuple items inherit their container's name
+        
+    Returns:
+        The value with sensitive strings replaced
+    """
+    if isinstance(value, str):
+        if name is not None and (is_credential_name(name) if strict_names
+                                 else is_sensitive_name(name)):
+            return visit(value)
+        if is_sensitive_value(value, generic_patterns):
+            return visit(value)
+        return value
     
-    # Check if this value was registered from environment variables
-    if param_value in _dotenv_loaded_vars:
-        return True
+    value_type = type(value)
+    if value_type is dict:
+        result = {}
+        changed = False
+        for key, item in value.items():
+            new_item = map_sensitive(item, visit, key if isinstance(key, str) else None,
+                                     generic_patterns, strict_names)
+            changed = changed or new_item is not item
+            result[key] = new_item
+        return result if changed else value
     
-    # Additional heuristics for API keys/tokens based on value patterns
-    if isinstance(param_value, str) and len(param_value) > 10:
-        # OpenAI API keys start with sk-
-        if param_value.startswith('sk-') and len(param_value) > 20:
-            return True
-        # Anthropic API keys start with ant-
-        if param_value.startswith('ant-') and len(param_value) > 20:
-            return True
-        # HuggingFace tokens start with hf_
-        if param_value.startswith('hf_') and len(param_value) > 20:
-            return True
-        # Generic API key patterns (long strings with mix of letters/numbers)
-        if (len(param_value) > 25 and 
-            any(c.isalpha() for c in param_value) and 
-            any(c.isdigit() for c in param_value)):
-            return True
+    if value_type is list or value_type is tuple:
+        item_name = None if strict_names else name
+        items = [map_sensitive(item, visit, item_name, generic_patterns, strict_names)
+                 for item in value]
+        if any(new is not old for new, old in zip(items, value)):
+            return value_type(items)
+        return value
     
-    return False
+    return value
+
+def map_sensitive_arguments(args: tuple, kwargs: dict, visit: Callable[[str], Any],
+                            generic_patterns: bool = True,
+                            strict_names: bool = False) -> Tuple[tuple, dict]:
+    """
+    Apply visit to every sensitive string in call arguments.
+    
+    Args:
+        args: Positional arguments
+        kwargs: Keyword arguments
+        visit: Called with each sensitive string; its return value replaces it
+        generic_patterns: Also flag any long mixed letter/digit string
+        strict_names: See map_sensitive
+        
+    Returns:
+        Tuple of processed (args, kwargs)
+    """
+    return (map_sensitive(tuple(args), visit, None, generic_patterns, strict_names),
+            map_sensitive(dict(kwargs), visit, None, generic_patterns, strict_names))
 
 def register_dotenv_value(value: str):
     """Register a value as having been loaded from dotenv."""
     if value and isinstance(value, str):
         _dotenv_loaded_vars.add(value)
 
+def derive_key(password: bytes = KDF_PASSWORD, salt: bytes = KDF_SALT,
+               iterations: int = KDF_ITERATIONS) -> bytes:
+    """
+    Derive a Fernet key with PBKDF2-HMAC-SHA256.
+    
+    Args:
+        password: Key material
+        salt: KDF salt
+        iterations: PBKDF2 iteration count
+        
+    Returns:
+        Urlsafe base64 encoded 32-byte key
+    """
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+    
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        iterations=iterations,
+    )
+    return base64.urlsafe_b64encode(kdf.derive(password))
+
+def _valid_fernet_key(key: bytes) -> bool:
+    """Whether key is urlsafe base64 encoding exactly 32 bytes."""
+    try:
+        return len(base64.urlsafe_b64decode(key)) == 32
+    except (binascii.Error, ValueError):
+        return False
+
+def _key_cache_path(password: bytes, salt: bytes, iterations: int) -> Optional[str]:
+    """Cache file for a parameter set, or None when the file cache is disabled."""
+    directory = os.environ.get(KEY_CACHE_DIR_ENV_VAR)
+    if directory is None:
+        directory = os.path.join(os.path.expanduser("~"), ".cache", "pycdn")
+    if not directory:
+        return None
+    
+    # Name by a hash of the parameters so changing any of them never reuses a stale key
+    digest = hashlib.sha256(b"|".join([password, salt, str(iterations).encode()])).hexdigest()
+    return os.path.join(directory, f"fernet-{digest[:32]}.key")
+
+def _read_cached_key(path: str) -> Optional[bytes]:
+    """Read a cached key, ignoring files other users could read or write."""
+    try:
+        fd = os.open(path, os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0))
+    except OSError:
+        return None
+    try:
+        info = os.fstat(fd)
+        if not stat.S_ISREG(info.st_mode) or info.st_mode & 0o077:
+            return None
+        if hasattr(os, "getuid") and info.st_uid != os.getuid():
+            return None
+        key = os.read(fd, 256).strip()
+    finally:
+        os.close(fd)
+    return key if _valid_fernet_key(key) else None
+
+def _write_cached_key(path: str, key: bytes) -> None:
+    """Atomically store a key readable only by the current user."""
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".fernet-")  # created 0600
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(key)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError:
+        # A read-only home or full disk only costs the PBKDF2 run next time
+        pass
+
+def load_key(password: bytes = KDF_PASSWORD, salt: bytes = KDF_SALT,
+             iterations: int = KDF_ITERATIONS) -> bytes:
+    """
+    Resolve the Fernet key without re-running PBKDF2 where possible.
+    
+    Order: PYCDN_ENCRYPTION_KEY, keys already resolved in this process,
+    the 0600 file cache keyed by the KDF parameters, then derivation
+    (which populates the file cache).
+    
+    Returns:
+        Urlsafe base64 encoded 32-byte key
+    """
+    env_key = os.environ.get(KEY_ENV_VAR)
+    if env_key:
+        key = env_key.strip().encode()
+        if not _valid_fernet_key(key):
+            raise ValueError(f"{KEY_ENV_VAR} must be a urlsafe base64 encoded 32-byte key")
+        return key
+    
+    params = (password, salt, iterations)
+    key = _resolved_keys.get(params)
+    if key:
+        return key
+    
+    path = _key_cache_path(*params)
+    key = _read_cached_key(path) if path else None
+    if not key:
+        key = derive_key(*params)
+        if path:
+            _write_cached_key(path, key)
+    
+    _resolved_keys[params] = key
+    return key
+
 class PyCDNEncryption:
     """
     Built-in encryption handler for PyCDN with automatic key exchange.
@@ -90,25 +339,21 @@ class PyCDNEncryption:
             encryption_enabled: Whether to enable automatic encryption
         """
         self.encryption_enabled = encryption_enabled
-        
-        if encryption_enabled:
+        self._fernet = None
+    
+    @property
+    def fernet(self) -> "Fernet":
+        """Fernet cipher, built on first encrypt/decrypt."""
+        if self._fernet is None:
             self._setup_encryption()
+        return self._fernet
     
     def _setup_encryption(self):
         """Setup encryption using a deterministic but secure method."""
-        # Use a combination of factors to create a consistent key
-        # This ensures client and server can derive the same key
-        key_material = f"pycdn_v1_encryption_key"
+        from cryptography.fernet import Fernet
         
-        # Derive encryption key using PBKDF2
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=b'pycdn_deterministic_salt_v1',  # Fixed salt for client-server consistency
-            iterations=100000,
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(key_material.encode()))
-        self.fernet = Fernet(key)
+        # Client and server resolve the same key from the shared KDF parameters
+        self._fernet = Fernet(load_key())
     
     def encrypt_data(self, data: str) -> Dict[str, str]:
         """
@@ -173,17 +418,8 @@ class PyCDNEncryption:
         if not self.encryption_enabled:
             return args, kwargs
         
-        # Process keyword arguments
-        processed_kwargs = {}
-        for key, value in kwargs.items():
-            if is_sensitive_parameter(key, value):
-                processed_kwargs[key] = self.encrypt_data(str(value))
-            else:
-                processed_kwargs[key] = value
-        
-        # For positional arguments, we can't easily detect sensitive data
-        # so we'll leave them as-is for now
-        return args, processed_kwargs
+        # Positional and nested values are covered too, judged by content
+        return map_sensitive_arguments(args, kwargs, lambda value: self.encrypt_data(value))
     
     def process_response_arguments(self, args: tuple, kwargs: dict) -> Tuple[tuple, dict]:
         """
@@ -199,15 +435,17 @@ class PyCDNEncryption:
         if not self.encryption_enabled:
             return args, kwargs
         
-        # Process keyword arguments
-        processed_kwargs = {}
-        for key, value in kwargs.items():
-            if isinstance(value, dict) and value.get("encrypted", False):
-                processed_kwargs[key] = self.decrypt_data(value)
-            else:
-                processed_kwargs[key] = value
-        
-        return args, processed_kwargs
+        return self._decrypt_nested(args), self._decrypt_nested(kwargs)
+    
+    def _decrypt_nested(self, value: Any) -> Any:
+        """Decrypt encrypt_data payloads anywhere in a nested structure."""
+        if isinstance(value, dict):
+            if value.get("encrypted") is True and value.keys() == _ENCRYPTED_PAYLOAD_KEYS:
+                return self.decrypt_data(value)
+            return {k: self._decrypt_nested(v) for k, v in value.items()}
+        if type(value) is list or type(value) is tuple:
+            return type(value)(self._decrypt_nested(v) for v in value)
+        return value
 
 # Global encryption instance
 _global_encryption = None
@@ -246,8 +484,9 @@ def disable_encryption():
 # Don't interfere with dotenv - let it work normally
 # We'll detect environment variables when they're actually used
 
-# Enhanced os.getenv to track sensitive environment variables
-_original_getenv = os.getenv
+# Enhanced os.getenv to track sensitive environment variables; unwrapped
+# so reloading this module never stacks one hook on another
+_original_getenv = getattr(os.getenv, "__wrapped__", os.getenv)
 
 def enhanced_getenv(key, default=None):
     """Enhanced os.getenv that automatically tracks sensitive environment variables."""
@@ -255,13 +494,23 @@ def enhanced_getenv(key, default=None):
     
     # Only register if we get a non-empty value and the key looks sensitive
     if value and isinstance(value, str) and value != default:
-        key_lower = key.lower()
-        if any(keyword in key_lower for keyword in SENSITIVE_KEYWORDS):
+        if isinstance(key, str) and is_sensitive_name(key):
             register_dotenv_value(value)
             # Debug info (remove in production)
             # print(f"🔍 PyCDN: Detected sensitive env var {key} -> will encrypt when used")
     
     return value
 
-# Replace os.getenv
-os.getenv = enhanced_getenv 
\ No newline at end of file
+enhanced_getenv.__wrapped__ = _original_getenv
+
+def install_getenv_hook() -> None:
+    """
+    Route os.getenv through enhanced_getenv.
+    
+    Runs once, when this module is first imported; pycdn.client.core
+    imports it for that reason. Calling it again changes nothing.
+    """
+    if os.getenv is not enhanced_getenv:
+        os.getenv = enhanced_getenv
+
+install_getenv_hook()
@@ -0,0 +1,58 @@
+"""
+Chunked transfer of very large results.
+
+A result whose payload reaches the server's spill threshold is written to
+a temporary file as a RESULT frame (see pycdn.utils.wire) instead of being
+sent in the response. The response carries a small envelope instead:
+
+    {"success": true, "serialization_method": "spilled",
+     "transfer": {"id": ..., "size": ..., "chunk_size": ...,
+                  "checksum": "sha256", "checksums": [...]}}
+
+The client downloads the file from GET /results/{id} with one Range
+request per chunk, checks each chunk against its checksum, and resumes
+from the last byte received if the connection drops. It then deletes the
+file with DELETE /results/{id}. The server spills only for clients that
+send "X-PyCDN-Transfer: chunked", so older clients get results inline.
+"""
+
+from typing import Any, Dict
+
+# Request header announcing a client can download spilled results
+TRANSFER_HEADER = "X-PyCDN-Transfer"
+CHUNKED = "chunked"
+
+# serialization_method of a spilled result's envelope
+SPILLED = "spilled"
+
+# Results whose payload reaches this many bytes are spilled
+DEFAULT_SPILL_THRESHOLD = 64 * 1024 * 1024
+
+# Bytes per range request and checksum
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+CHECKSUM = "sha256"
+
+
+class TransferError(ConnectionError):
+    """A spilled result could not be downloaded."""
+
+
+class ChecksumError(TransferError):
+    """A downloaded chunk does not match its checksum."""
+
+
+def payload_size(result: Dict[str, Any]) -> int:
+    """Bytes of a serialized result's payload: its result field and buffers."""
+    size = 0
+    value = result.get("result")
+    if isinstance(value, (str, bytes, bytearray)):
+        size += len(value)
+    for buffer in result.get("buffers") or ():
+        size += len(buffer) if isinstance(buffer, str) else memoryview(buffer).nbytes
+    return size
+
+
+def is_spilled(result: Dict[str, Any]) -> bool:
+    """Whether a result envelope points at a spilled result."""
+    return result.get("serialization_method") == SPILLED
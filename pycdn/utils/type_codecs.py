@@ -0,0 +1,275 @@
+"""
+Type codecs for values JSON cannot represent.
+
+A codec turns one type into a tagged JSON value and back:
+
+    {"__codec__": "datetime", "value": "2024-01-02T03:04:05"}
+
+The client lists the codecs it can decode in the X-PyCDN-Codecs header of
+every request and of the /rpc handshake, and the server tags a value only
+with a codec on that list. Anything else takes the generic conversion in
+pycdn.utils.encoder (tagged attribute dict or str()), so a client without
+pandas still receives a DataFrame as a dict of columns rather than a value
+it cannot load.
+
+Built-in codecs cover datetime, date, time, timedelta, Decimal, UUID,
+bytes and bytearray, NumPy arrays, pandas DataFrames and Series (as
+columns), and Arrow tables (as IPC streams); pycdn.utils.common adds
+"columns" for lists of objects sent as columns. Types from optional packages
+are matched by qualified name, so nothing here imports NumPy, pandas or
+pyarrow until a value of theirs is encoded or decoded. Large arrays and
+bytes values reachable through lists and dicts never get here: they are
+pickled with their data out of band (see pycdn.utils.codecs).
+"""
+
+import base64
+import datetime
+import decimal
+import functools
+import importlib.util
+import threading
+import uuid
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple, Union
+
+from . import codecs
+
+# Header listing the codecs a client can decode
+CODECS_HEADER = "X-PyCDN-Codecs"
+
+# Key marking a tagged value
+CODEC_KEY = "__codec__"
+
+_MAX_CACHED_TYPES = 4096
+
+
+class TypeCodec:
+    """
+    How one type is sent as a tagged JSON value.
+    """
+
+    def __init__(self, name: str, types: Iterable[Union[type, str]],
+                 encode: Callable[[Any], Any], decode: Callable[[Any], Any],
+                 requires: Optional[str] = None):
+        """
+        Args:
+            name: Tag and negotiation token
+            types: Types encoded, as classes or as "module.QualName" strings
+                for types whose package may not be installed; subclasses
+                are encoded too
+            encode: Returns a JSON-serializable value for an instance
+            decode: Rebuilds the instance from that value
+            requires: Module the receiving side needs to decode, if any
+        """
+        self.name = name
+        self.types = tuple(types)
+        self.encode = encode
+        self.decode = decode
+        self.requires = requires
+
+    def available(self) -> bool:
+        """Whether this process can decode the codec's values."""
+        return self.requires is None or importlib.util.find_spec(self.requires) is not None
+
+
+def _qualified_name(kind: type) -> str:
+    return f"{kind.__module__}.{kind.__qualname__}"
+
+
+class CodecRegistry:
+    """
+    The codecs known to one process, looked up by type and by name.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_name: Dict[str, TypeCodec] = {}
+        self._by_type: Dict[Union[type, str], TypeCodec] = {}
+        self._cache: Dict[type, Optional[TypeCodec]] = {}
+        self._header: Optional[str] = None
+
+    def register(self, codec: TypeCodec) -> None:
+        """Add a codec, replacing any registered under the same name."""
+        with self._lock:
+            previous = self._by_name.pop(codec.name, None)
+            if previous is not None:
+                for kind in previous.types:
+                    self._by_type.pop(kind, None)
+            self._by_name[codec.name] = codec
+            for kind in codec.types:
+                self._by_type[kind] = codec
+            self._cache.clear()
+            self._header = None
+
+    def names(self) -> List[str]:
+        """Codecs this process can decode."""
+        return [name for name, codec in self._by_name.items() if codec.available()]
+
+    def header(self) -> str:
+        """X-PyCDN-Codecs value announcing names()."""
+        if self._header is None:
+            self._header = ", ".join(self.names())
+        return self._header
+
+    def codec_for(self, obj: Any) -> Optional[TypeCodec]:
+        """Codec for obj's type or its nearest registered base class."""
+        kind = type(obj)
+        try:
+            return self._cache[kind]
+        except KeyError:
+            pass
+        codec = None
+        for base in kind.__mro__:
+            codec = self._by_type.get(base) or self._by_type.get(_qualified_name(base))
+            if codec is not None:
+                break
+        if len(self._cache) >= _MAX_CACHED_TYPES:
+            self._cache.clear()
+        self._cache[kind] = codec
+        return codec
+
+    def tag(self, codec: TypeCodec, obj: Any) -> Dict[str, Any]:
+        return {CODEC_KEY: codec.name, "value": codec.encode(obj)}
+
+    def object_hook(self, data: Dict[str, Any]) -> Any:
+        """json.loads object_hook decoding tagged values; unknown or undecodable ones stay dicts."""
+        name = data.get(CODEC_KEY)
+        if name is None or len(data) != 2 or "value" not in data:
+            return data
+        codec = self._by_name.get(name)
+        if codec is None:
+            return data
+        try:
+            return codec.decode(data["value"])
+        except Exception:
+            return data
+
+
+@functools.lru_cache(maxsize=64)
+def parse_codecs(header: Optional[str]) -> FrozenSet[str]:
+    """Codec names listed in an X-PyCDN-Codecs header."""
+    if not header:
+        return frozenset()
+    return frozenset(name.strip() for name in header.split(",") if name.strip())
+
+
+# Built-in codecs
+
+def _encode_bytes(value: Union[bytes, bytearray]) -> str:
+    return base64.b64encode(value).decode("ascii")
+
+
+def _encode_array(array: Any) -> Dict[str, Any]:
+    if array.dtype.hasobject:
+        raise TypeError("object arrays have no raw buffer")
+    _, (descr, shape, order, data) = codecs._reduce_array(array)
+    return {"dtype": descr, "shape": list(shape), "order": order,
+            "data": _encode_bytes(data.raw())}
+
+
+def _decode_array(value: Dict[str, Any]) -> Any:
+    descr = value["dtype"]
+    if isinstance(descr, list):
+        # Structured dtypes come back from JSON as lists of lists
+        descr = [tuple(field) for field in descr]
+    return codecs.load_array(descr, tuple(value["shape"]), value["order"],
+                             base64.b64decode(value["data"]))
+
+
+def _encode_dataframe(frame: Any) -> Dict[str, Any]:
+    return {
+        "columns": list(frame.columns),
+        "index": frame.index.tolist(),
+        "data": [frame.iloc[:, i].tolist() for i in range(frame.shape[1])],
+        "dtypes": [str(dtype) for dtype in frame.dtypes],
+    }
+
+
+def _typed_series(values: List[Any], dtype: str) -> Any:
+    import pandas as pd
+
+    try:
+        return pd.Series(values, dtype=dtype)
+    except (TypeError, ValueError):
+        return pd.Series(values)
+
+
+def _decode_dataframe(value: Dict[str, Any]) -> Any:
+    import pandas as pd
+
+    columns = [_typed_series(values, dtype) for values, dtype in zip(value["data"], value["dtypes"])]
+    if not columns:
+        return pd.DataFrame(index=value["index"])
+    frame = pd.concat(columns, axis=1, ignore_index=True)
+    frame.columns = value["columns"]
+    frame.index = value["index"]
+    return frame
+
+
+def _encode_series(series: Any) -> Dict[str, Any]:
+    return {"name": series.name, "index": series.index.tolist(),
+            "data": series.tolist(), "dtype": str(series.dtype)}
+
+
+def _decode_series(value: Dict[str, Any]) -> Any:
+    series = _typed_series(value["data"], value["dtype"])
+    series.index = value["index"]
+    series.name = value["name"]
+    return series
+
+
+def _encode_arrow(table: Any) -> str:
+    import pyarrow as pa
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return _encode_bytes(sink.getvalue().to_pybytes())
+
+
+def _decode_arrow(value: str) -> Any:
+    import pyarrow as pa
+
+    return pa.ipc.open_stream(base64.b64decode(value)).read_all()
+
+
+def _decode_timedelta(value: Tuple[int, int, int]) -> datetime.timedelta:
+    days, seconds, microseconds = value
+    return datetime.timedelta(days=days, seconds=seconds, microseconds=microseconds)
+
+
+BUILTIN_CODECS = (
+    TypeCodec("datetime", [datetime.datetime], datetime.datetime.isoformat,
+              datetime.datetime.fromisoformat),
+    TypeCodec("date", [datetime.date], datetime.date.isoformat, datetime.date.fromisoformat),
+    TypeCodec("time", [datetime.time], datetime.time.isoformat, datetime.time.fromisoformat),
+    TypeCodec("timedelta", [datetime.timedelta],
+              lambda delta: [delta.days, delta.seconds, delta.microseconds], _decode_timedelta),
+    TypeCodec("decimal", [decimal.Decimal], str, decimal.Decimal),
+    TypeCodec("uuid", [uuid.UUID], str, uuid.UUID),
+    TypeCodec("bytes", [bytes], _encode_bytes, base64.b64decode),
+    TypeCodec("bytearray", [bytearray], _encode_bytes,
+              lambda value: bytearray(base64.b64decode(value))),
+    TypeCodec("ndarray", ["numpy.ndarray"], _encode_array, _decode_array, requires="numpy"),
+    TypeCodec("dataframe", ["pandas.core.frame.DataFrame"], _encode_dataframe, _decode_dataframe,
+              requires="pandas"),
+    TypeCodec("series", ["pandas.core.series.Series"], _encode_series, _decode_series,
+              requires="pandas"),
+    TypeCodec("arrow", ["pyarrow.lib.Table"], _encode_arrow, _decode_arrow, requires="pyarrow"),
+)
+
+registry = CodecRegistry()
+for _codec in BUILTIN_CODECS:
+    registry.register(_codec)
+
+
+def register_codec(name: str, types: Iterable[Union[type, str]], encode: Callable[[Any], Any],
+                   decode: Callable[[Any], Any], requires: Optional[str] = None) -> None:
+    """
+    Register a type codec with the process-wide registry.
+
+    Register the same codec on the client and the server. Clients announce
+    the codecs registered when they are created, and the server uses a
+    codec only for clients that announce it. See TypeCodec for the
+    arguments.
+    """
+    registry.register(TypeCodec(name, types, encode, decode, requires))
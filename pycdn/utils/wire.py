@@ -0,0 +1,168 @@
+"""
+Binary frame format for the PyCDN RPC WebSocket.
+
+Every frame is one binary WebSocket message:
+
+    !BBII header: version, kind, request_id, meta_length
+    meta:         UTF-8 JSON object with the small fields of the message
+    body:         raw bytes fields, concatenated
+
+Byte-valued fields (pickled arguments and results) and lists of byte
+strings (out-of-band pickle buffers) travel in the body as-is. Meta lists
+each blob's name and length, plus its index for list items, under
+"__blobs__", so nothing is base64-encoded on the wire. Request IDs are
+chosen by the client and let many calls, their output chunks and
+cancellations share one socket.
+
+The same frames serve as the binary HTTP body format for /execute
+(FRAME_CONTENT_TYPE): a CALL frame as the request and a RESULT frame as
+the response, with request_id 0.
+"""
+
+import base64
+import json
+import struct
+from typing import Any, Dict, List, NamedTuple
+
+WIRE_VERSION = 1
+
+# Media type of frame-encoded /execute bodies, and its X-PyCDN-Features token
+FRAME_CONTENT_TYPE = "application/x-pycdn-frame"
+FRAME_FEATURE = "frame"
+
+# Frame kinds
+CALL = 1      # client -> server: execute a function
+RESULT = 2    # server -> client: result envelope, ends the request
+STDOUT = 3    # server -> client: output chunk for a streaming call
+STDERR = 4
+CANCEL = 5    # client -> server: abandon a request
+
+_HEADER = struct.Struct("!BBII")
+_BLOBS = "__blobs__"
+_BYTES = (bytes, bytearray, memoryview)
+
+
+class WireError(ValueError):
+    """Raised for frames that cannot be decoded."""
+
+
+class Frame(NamedTuple):
+    """A decoded frame."""
+    kind: int
+    request_id: int
+    fields: Dict[str, Any]
+
+
+def encode_frame(kind: int, request_id: int, fields: Dict[str, Any]) -> bytes:
+    """
+    Build a frame.
+
+    Args:
+        kind: Frame kind (CALL, RESULT, ...)
+        request_id: Request the frame belongs to
+        fields: JSON-serializable values; bytes values go in the body
+
+    Returns:
+        Encoded frame
+    """
+    return b"".join(frame_parts(kind, request_id, fields))
+
+
+def frame_parts(kind: int, request_id: int, fields: Dict[str, Any]) -> List[Any]:
+    """
+    A frame as the list of byte strings and buffers that make it up.
+
+    Writing the parts in order produces encode_frame()'s output without
+    first copying the blobs into one string.
+    """
+    meta = {}
+    entries = []
+    blobs = []
+    for name, value in fields.items():
+        if isinstance(value, _BYTES):
+            entries.append([name, memoryview(value).nbytes])
+            blobs.append(value)
+        elif isinstance(value, list) and value and all(isinstance(v, _BYTES) for v in value):
+            for index, item in enumerate(value):
+                entries.append([name, memoryview(item).nbytes, index])
+                blobs.append(item)
+        else:
+            meta[name] = value
+    if entries:
+        meta[_BLOBS] = entries
+
+    meta_bytes = json.dumps(meta, separators=(",", ":")).encode()
+    header = _HEADER.pack(WIRE_VERSION, kind, request_id, len(meta_bytes))
+    return [header, meta_bytes, *blobs]
+
+
+def decode_frame(data: bytes) -> Frame:
+    """
+    Parse a frame produced by encode_frame.
+
+    Raises:
+        WireError: If the frame is truncated or from another wire version
+    """
+    if len(data) < _HEADER.size:
+        raise WireError("Frame shorter than its header")
+    version, kind, request_id, meta_length = _HEADER.unpack_from(data)
+    if version != WIRE_VERSION:
+        raise WireError(f"Unsupported wire version {version}")
+
+    offset = _HEADER.size + meta_length
+    try:
+        fields = json.loads(bytes(data[_HEADER.size:offset]))
+    except ValueError as e:
+        raise WireError(f"Malformed frame metadata: {e}") from e
+
+    view = memoryview(data)
+    for name, length, *index in fields.pop(_BLOBS, ()):
+        if offset + length > len(data):
+            raise WireError(f"Frame truncated in field '{name}'")
+        if index:
+            # List items stay views of the frame so arrays are not copied
+            fields.setdefault(name, []).append(view[offset:offset + length])
+        else:
+            fields[name] = bytes(view[offset:offset + length])
+        offset += length
+    return Frame(kind, request_id, fields)
+
+
+def binary_fields(message: Dict[str, Any], names=("args", "kwargs", "result")) -> Dict[str, Any]:
+    """
+    Copy of an /execute request or result with pickled fields as raw bytes.
+
+    serialize_args/serialize_result base64-encode cloudpickle output for
+    JSON; frames carry the bytes instead. deserialize_args and
+    deserialize_result accept either form.
+    """
+    if message.get("serialization_method") != "cloudpickle":
+        return message
+    message = dict(message)
+    for name in names:
+        if isinstance(message.get(name), str):
+            message[name] = base64.b64decode(message[name])
+    if message.get("buffers"):
+        message["buffers"] = [base64.b64decode(b) if isinstance(b, str) else b
+                              for b in message["buffers"]]
+    return message
+
+
+def text_fields(message: Dict[str, Any], names=("args", "kwargs", "result")) -> Dict[str, Any]:
+    """
+    Copy of an /execute request or result that can be sent as JSON.
+
+    The inverse of binary_fields: raw pickled fields and array buffers are
+    base64-encoded. Messages without raw bytes are returned unchanged.
+    """
+    buffers = message.get("buffers")
+    raw = [name for name in names if isinstance(message.get(name), _BYTES)]
+    if not raw and not (buffers and any(isinstance(b, _BYTES) for b in buffers)):
+        return message
+    message = dict(message)
+    for name in raw:
+        message[name] = base64.b64encode(message[name]).decode()
+    if buffers:
+        message["buffers"] = [base64.b64encode(b).decode() if isinstance(b, _BYTES) else b
+                              for b in buffers]
+    return message
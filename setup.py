@@ -60,6 +60,13 @@ setup(
         "server": [
             "gunicorn>=20.0.0",
         ],
+        "http2": [
+            "h2>=4.0.0",
+            "hypercorn>=0.14.0",
+        ],
+        "zstd": [
+            "zstandard>=0.18.0",
+        ],
     },
     entry_points={
         "console_scripts": [
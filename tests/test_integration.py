@@ -316,6 +316,162 @@ class TestConfigurationAndSetup(unittest.TestCase):
         self.assertFalse(is_hook_installed())
 
 
+class TestRpcChannel(unittest.TestCase):
+    """Integration tests for the persistent RPC WebSocket."""
+    
+    @classmethod
+    def setUpClass(cls):
+        """Start a server for RPC tests."""
+        cls.server = CDNServer(host="localhost", port=8002, debug=False)
+        cls.server_thread = threading.Thread(target=cls.server.run, daemon=True)
+        cls.server_thread.start()
+        time.sleep(2)
+        
+        try:
+            response = requests.get("http://localhost:8002/health", timeout=5)
+            if "rpc" not in response.headers.get("X-PyCDN-Features", ""):
+                raise Exception("Server does not advertise RPC")
+        except Exception as e:
+            raise unittest.SkipTest(f"Test server failed to start: {e}")
+    
+    def setUp(self):
+        """Connect a client and make the first (HTTP) call."""
+        from pycdn.client.core import CDNClient
+        
+        self.client = CDNClient("http://localhost:8002")
+        self.assertEqual(self.client.call_function("math", "sqrt", (16,)), 4.0)
+        self.channel = self.client._rpc_channels["http://localhost:8002"]
+    
+    def tearDown(self):
+        """Close the client."""
+        self.client.close()
+    
+    def test_calls_move_to_rpc(self):
+        """Test calls after the first go over the channel."""
+        results = [self.client.call_function("math", "pow", (2, i)) for i in range(20)]
+        
+        self.assertEqual(results, [2.0 ** i for i in range(20)])
+        self.assertEqual(self.client._connection_stats["rpc_calls"], 20)
+        self.assertTrue(self.channel.connected)
+    
+    def test_concurrent_calls_multiplexed(self):
+        """Test calls from many threads are outstanding at once on one socket."""
+        from concurrent.futures import ThreadPoolExecutor
+        
+        start = time.perf_counter()
+        with ThreadPoolExecutor(4) as executor:
+            list(executor.map(lambda i: self.client.call_function("time", "sleep", (0.3,)),
+                              range(4)))
+        
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertEqual(len(self.client._rpc_channels), 1)
+    
+    def test_timeout_cancels_call(self):
+        """Test a timed-out call is cancelled and the channel stays usable."""
+        import httpx
+        from pycdn.utils.common import serialize_args
+        
+        request = {"package_name": "time", "function_name": "sleep", **serialize_args(2)}
+        with self.assertRaises(httpx.ReadTimeout):
+            self.channel.call(request, timeout=0.1)
+        
+        self.assertEqual(self.channel._pending, {})
+        self.assertEqual(self.client.call_function("math", "factorial", (5,)), 120)
+    
+    def test_streaming_and_pickled_arguments(self):
+        """Test output frames and binary argument payloads."""
+        output = []
+        self.client.call_function("builtins", "exec", ("print('over rpc')",),
+                                  stream_output=True,
+                                  output_handler=lambda stream, text: output.append((stream, text)))
+        self.assertEqual(output, [("stdout", "over rpc\n")])
+        
+        # Arguments are cloudpickled, so they travel as a raw binary field
+        self.assertEqual(self.client.call_function("builtins", "sorted", ({3, 1, 2},)), [1, 2, 3])
+
+    
+    def test_numpy_arrays(self):
+        """Test arrays travel as raw buffers over RPC and base64 over HTTP."""
+        try:
+            import numpy as np
+        except ImportError:
+            self.skipTest("numpy not installed")
+        from pycdn.client.core import CDNClient
+        
+        array = np.random.rand(512, 256)
+        http_client = CDNClient("http://localhost:8002", rpc=False)
+        try:
+            for client in (self.client, http_client):
+                result = client.call_function("numpy", "negative", (array,))
+                self.assertIsInstance(result, np.ndarray)
+                np.testing.assert_array_equal(result, -array)
+        finally:
+            http_client.close()
+    
+    def test_monitors_share_io_loop(self):
+        """Test many monitors run on the client's one I/O thread."""
+        from pycdn.utils.common import serialize_args
+        
+        def io_threads():
+            return sum(t.name == "pycdn-io" for t in threading.enumerate())
+        
+        self.client.io_loop.loop
+        io_threads_before = io_threads()
+        received = []
+        monitors = [self.client.monitor_package("builtins", lambda stream, text: received.append(text))
+                    for _ in range(20)]
+        time.sleep(0.5)
+        
+        # The server runs in-process, so count only client I/O threads
+        self.assertEqual(io_threads(), io_threads_before)
+        requests.post("http://localhost:8002/execute", json={
+            "package_name": "builtins", "function_name": "exec",
+            **serialize_args("print('hi')")
+        })
+        deadline = time.time() + 5
+        while len(received) < 20 and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(received, ["hi\n"] * 20)
+        
+        for monitor in monitors:
+            monitor.stop()
+    
+    def test_websocket_streaming_reuses_loop(self):
+        """Test streaming without RPC runs on the shared loop instead of a new one per call."""
+        from pycdn.client.core import CDNClient
+        
+        client = CDNClient("http://localhost:8002", rpc=False)
+        try:
+            for _ in range(3):
+                output = []
+                client.call_function("builtins", "exec", ("print('x')",), stream_output=True,
+                                     output_handler=lambda stream, text: output.append(text))
+                self.assertEqual(output, ["x\n"])
+            loop = client.io_loop.loop
+            self.assertTrue(loop.is_running())
+        finally:
+            client.close()
+        self.assertFalse(loop.is_running())
+
+    def test_interactive_session_resumes(self):
+        """Test a client session re-attached by ID sees the shell state it left."""
+        output = []
+        handler = lambda stream, text: output.append(text)
+
+        session = self.client.interactive_session("os", output_handler=handler)
+        self.assertEqual(session.run("cd /tmp && greeting=hello"), 0)
+        session_id = session.session_id
+        session.close()
+
+        resumed = self.client.interactive_session("os", session_id=session_id,
+                                                  output_handler=handler)
+        try:
+            self.assertEqual(resumed.session_id, session_id)
+            self.assertEqual(resumed.run("echo $greeting from $(pwd)"), 0)
+        finally:
+            resumed.close()
+        self.assertEqual("".join(output), "hello from /tmp\n")
+
 if __name__ == "__main__":
     # Run integration tests
     unittest.main(verbosity=2) 
\ No newline at end of file
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Performance budgets for PyCDN.
+
+These run in fresh interpreters so module caches from other tests do not
+hide import costs.
+"""
+
+import unittest
+import sys
+import os
+import json
+import subprocess
+from unittest.mock import patch
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Generous enough for slow CI machines, tight enough to catch FastAPI,
+# uvicorn or cryptography creeping back into the client import path
+IMPORT_BUDGET_SECONDS = 0.25
+
+
+def run_snippet(code: str) -> dict:
+    """Run code in a fresh interpreter and return the JSON it prints."""
+    output = subprocess.check_output(
+        [sys.executable, "-c", code], cwd=PROJECT_ROOT, text=True
+    )
+    return json.loads(output.strip().splitlines()[-1])
+
+
+class TestImportTime(unittest.TestCase):
+    """Test cases for import-time cost."""
+
+    def test_import_pycdn_is_lightweight(self):
+        """Test 'import pycdn' loads no client or server dependencies."""
+        loaded = run_snippet(
+            "import sys, json, pycdn\n"
+            "mods = ['fastapi', 'uvicorn', 'pydantic', 'cryptography', 'httpx', 'pycdn.server']\n"
+            "print(json.dumps([m for m in mods if m in sys.modules]))"
+        )
+        self.assertEqual(loaded, [])
+
+    def test_client_import_skips_server_stack(self):
+        """Test the client path does not pull in the server or encryption stack."""
+        loaded = run_snippet(
+            "import sys, json, pycdn\n"
+            "client = pycdn.pkg\n"
+            "mods = ['fastapi', 'uvicorn', 'pydantic', 'cryptography', 'websockets', 'requests']\n"
+            "print(json.dumps([m for m in mods if m in sys.modules]))"
+        )
+        self.assertEqual(loaded, [])
+
+    def test_getenv_secrets_still_registered(self):
+        """Test secrets read through os.getenv are registered once the client is imported."""
+        registered = run_snippet(
+            "import os, sys, json, importlib, pycdn\n"
+            "client = pycdn.pkg\n"
+            "os.environ['PYCDN_TEST_SERVICE_TOKEN'] = 'plain-value'\n"
+            "value = os.getenv('PYCDN_TEST_SERVICE_TOKEN')\n"
+            "from pycdn.utils import encryption\n"
+            "hooked = [value in encryption._dotenv_loaded_vars,\n"
+            "          encryption.is_sensitive_value(value),\n"
+            "          'cryptography' in sys.modules]\n"
+            "importlib.reload(encryption)\n"
+            "encryption.install_getenv_hook()\n"
+            "print(json.dumps(hooked + [encryption._original_getenv.__module__]))"
+        )
+        # Installing again, even from a reloaded module, never stacks hooks
+        self.assertEqual(registered, [True, True, False, "os"])
+
+    def test_lazy_attributes_resolve(self):
+        """Test lazily exported names still resolve to the real objects."""
+        import pycdn
+        from pycdn.client.core import pkg
+        from pycdn.server.core import CDNServer
+
+        self.assertIs(pycdn.pkg, pkg)
+        self.assertIs(pycdn.connect, pkg)
+        self.assertIs(pycdn.CDNServer, CDNServer)
+        self.assertIn("CDNClient", dir(pycdn))
+        with self.assertRaises(AttributeError):
+            pycdn.does_not_exist
+
+    def test_import_time_budget(self):
+        """Test the best of several cold 'import pycdn' runs stays within budget."""
+        code = (
+            "import time, json\n"
+            "start = time.perf_counter()\n"
+            "import pycdn\n"
+            "print(json.dumps(time.perf_counter() - start))"
+        )
+        best = min(run_snippet(code) for _ in range(3))
+        self.assertLess(best, IMPORT_BUDGET_SECONDS)
+
+
+class TestClientConstruction(unittest.TestCase):
+    """Test cases for client construction cost."""
+
+    def test_construction_does_not_connect(self):
+        """Test CDNClient() returns without touching an unreachable server."""
+        result = run_snippet(
+            "import time, json\n"
+            "from pycdn.client.core import CDNClient\n"
+            "start = time.perf_counter()\n"
+            "client = CDNClient('http://10.255.255.1:9', timeout=5)\n"
+            "print(json.dumps(time.perf_counter() - start))"
+        )
+        self.assertLess(result, 1.0)
+
+
+class TestEncryptionSetup(unittest.TestCase):
+    """Test cases for encryption key caching."""
+
+    def setUp(self):
+        """Point the key cache at a private temporary directory."""
+        import tempfile
+        from pycdn.utils import encryption
+
+        self.encryption = encryption
+        self.cache_dir = tempfile.mkdtemp()
+        self.env = patch.dict(os.environ, {encryption.KEY_CACHE_DIR_ENV_VAR: self.cache_dir})
+        self.env.start()
+        os.environ.pop(encryption.KEY_ENV_VAR, None)
+        encryption._resolved_keys.clear()
+
+    def tearDown(self):
+        """Restore environment and in-process key cache."""
+        import shutil
+
+        self.env.stop()
+        self.encryption._resolved_keys.clear()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_file_cache_reused(self):
+        """Test the derived key is stored 0600 and later runs skip PBKDF2."""
+        key = self.encryption.load_key()
+        files = os.listdir(self.cache_dir)
+        self.assertEqual(len(files), 1)
+        mode = os.stat(os.path.join(self.cache_dir, files[0])).st_mode & 0o777
+        self.assertEqual(mode, 0o600)
+
+        self.encryption._resolved_keys.clear()
+        with patch.object(self.encryption, "derive_key") as mock_derive:
+            self.assertEqual(self.encryption.load_key(), key)
+        mock_derive.assert_not_called()
+
+    def test_insecure_cache_file_ignored(self):
+        """Test a cache file readable by others is not trusted."""
+        key = self.encryption.load_key()
+        path = os.path.join(self.cache_dir, os.listdir(self.cache_dir)[0])
+        with open(path, "wb") as f:
+            f.write(b"A" * 43 + b"=")
+        os.chmod(path, 0o644)
+
+        self.encryption._resolved_keys.clear()
+        self.assertEqual(self.encryption.load_key(), key)
+
+    def test_environment_key(self):
+        """Test PYCDN_ENCRYPTION_KEY bypasses derivation and the file cache."""
+        import base64
+        from cryptography.fernet import Fernet
+
+        env_key = Fernet.generate_key()
+        with patch.dict(os.environ, {self.encryption.KEY_ENV_VAR: env_key.decode()}), \
+                patch.object(self.encryption, "derive_key") as mock_derive:
+            handler = self.encryption.PyCDNEncryption()
+            token = handler.encrypt_data("sk-secret")
+
+        mock_derive.assert_not_called()
+        self.assertEqual(os.listdir(self.cache_dir), [])
+        decrypted = Fernet(env_key).decrypt(base64.b64decode(token["data"]))
+        self.assertEqual(decrypted, b"sk-secret")
+
+        with patch.dict(os.environ, {self.encryption.KEY_ENV_VAR: "not-a-key"}):
+            with self.assertRaises(ValueError):
+                self.encryption.load_key()
+
+    def test_setup_cost_with_warm_cache(self):
+        """Test encryption setup costs microseconds once the key is cached."""
+        code = (
+            "import time, json\n"
+            "from pycdn.utils.encryption import PyCDNEncryption\n"
+            "import cryptography.fernet  # imported lazily; not part of setup\n"
+            "start = time.perf_counter()\n"
+            "handler = PyCDNEncryption()\n"
+            "handler.fernet\n"
+            "print(json.dumps(time.perf_counter() - start))"
+        )
+        run_snippet(code)  # populate the cache
+        best = min(run_snippet(code) for _ in range(3))
+
+        # PBKDF2 with 100k iterations takes tens of milliseconds
+        self.assertLess(best, 0.005)
+
+
+class TestResultEncoding(unittest.TestCase):
+    """Result serialization and decoding should cost about one json pass."""
+
+    def test_single_pass(self):
+        """Test results are encoded by one json.dumps call, each object converted once."""
+        from pycdn.utils import encoder
+        from pycdn.utils.common import serialize_result
+
+        class Message:
+            def __init__(self, index):
+                self.role = "assistant"
+                self.index = index
+
+        def counting(name):
+            return patch.object(encoder, name, wraps=getattr(encoder, name))
+
+        def encode_counting(value):
+            with patch.object(encoder.json, "dumps", wraps=json.dumps) as dumps, \
+                    patch.object(encoder, "to_basic_types") as slow_path, \
+                    counting("_convert_or_stop") as hook, \
+                    counting("_from_attributes") as convert, \
+                    patch.dict(encoder._converters, clear=True):
+                result = serialize_result(value)
+            self.assertEqual(result["serialization_method"], "json")
+            self.assertEqual(dumps.call_count, 1)
+            self.assertIs(dumps.call_args[0][0], value)
+            slow_path.assert_not_called()
+            return hook.call_count, convert.call_count
+
+        # JSON-native values never reach Python code
+        self.assertEqual(encode_counting([i * 0.5 for i in range(1000)]), (0, 0))
+
+        # Objects gain __type__/__module__ tags but are converted only once
+        messages = [Message(i) for i in range(1000)]
+        self.assertEqual(encode_counting({"messages": messages}), (1000, 1000))
+
+    def test_wrapped_results_decode(self):
+        """Test objects are wrapped while parsing, and their children only on access."""
+        from pycdn.utils import common
+
+        rows = [{"id": i, "usage": {"tokens": i}, "choices": [{"index": 0}],
+                 "__type__": "Completion", "__module__": "api"} for i in range(100)]
+        envelope = {"result": json.dumps(rows), "serialization_method": "json"}
+        with patch.object(common, "_wrap_hook", wraps=common._wrap_hook) as hook, \
+                patch.object(common, "_wrap_converted_objects") as walk:
+            result = common.deserialize_result(envelope)
+
+        # One call per JSON object (row, usage, choice), and no second walk
+        self.assertEqual(hook.call_count, 300)
+        walk.assert_not_called()
+        self.assertTrue(all(isinstance(row, common.DictWrapper) for row in result))
+
+        row = result[7]
+        with self.assertRaises(AttributeError):
+            object.__getattribute__(row, "_children")
+        self.assertIs(type(object.__getattribute__(row, "_data")["usage"]), dict)
+        self.assertEqual((row.usage.tokens, row.choices[0].index), (7, 0))
+        self.assertEqual(object.__getattribute__(row, "_children").keys(), {"usage", "choices"})
+        self.assertIs(row.usage, row.usage)
+        with self.assertRaises(AttributeError):
+            object.__getattribute__(result[8], "_children")
+
+if __name__ == "__main__":
+    unittest.main()
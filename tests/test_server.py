@@ -8,7 +8,9 @@ import sys
 import os
 import json
 import asyncio
-from unittest.mock import Mock, patch, MagicMock
+import time
+import threading
+from unittest.mock import Mock, patch, MagicMock, AsyncMock
 import tempfile
 
 # Add parent directory to path for imports
@@ -117,6 +119,198 @@ class TestPackageRuntime(unittest.TestCase):
         self.assertIn("factorial", attr_names)
 
 
+class TestMemoryBudget(unittest.TestCase):
+    """Test cases for memory-aware eviction of package environments."""
+    
+    def setUp(self):
+        """Create throwaway pure-Python packages to load."""
+        self.tempdir = tempfile.mkdtemp()
+        for name in ("pycdn_mem_a", "pycdn_mem_b"):
+            package = os.path.join(self.tempdir, name)
+            os.makedirs(package)
+            with open(os.path.join(package, "__init__.py"), "w") as f:
+                f.write("from . import helpers\nPAYLOAD = bytes(range(256)) * 80000\n")
+            with open(os.path.join(package, "helpers.py"), "w") as f:
+                f.write("def size(data):\n    return len(data)\n")
+        sys.path.insert(0, self.tempdir)
+        self.runtime = PackageRuntime(memory_budget=30 * 1024 * 1024)
+    
+    def tearDown(self):
+        """Remove the packages."""
+        import shutil
+        sys.path.remove(self.tempdir)
+        for name in list(sys.modules):
+            if name.startswith(("pycdn_mem_", "pycdn_mem_holder")):
+                del sys.modules[name]
+        shutil.rmtree(self.tempdir)
+    
+    def _call(self, package_name):
+        result = self.runtime.execute_remote_function(
+            package_name, "helpers.size", serialize_args("abc"))
+        self.assertTrue(result["success"], result)
+    
+    def test_lru_eviction_unloads_modules(self):
+        """Test going over budget evicts the least recently used package and its modules."""
+        self._call("pycdn_mem_a")
+        env_a = self.runtime.environments["pycdn_mem_a"]
+        self.assertEqual(env_a.owned_modules, {"pycdn_mem_a", "pycdn_mem_a.helpers"})
+        self.assertGreater(env_a.memory_estimate(), 15 * 1024 * 1024)
+        
+        self._call("pycdn_mem_b")
+        
+        self.assertEqual(list(self.runtime.environments), ["pycdn_mem_b"])
+        self.assertNotIn("pycdn_mem_a", sys.modules)
+        self.assertNotIn("pycdn_mem_a.helpers", sys.modules)
+        stats = self.runtime.get_memory_stats()
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["modules_unloaded"], 2)
+        self.assertEqual([p["package_name"] for p in stats["packages"]], ["pycdn_mem_b"])
+        
+        # An evicted package loads again on its next call
+        self._call("pycdn_mem_a")
+        self.assertIn("pycdn_mem_a", sys.modules)
+        self.assertEqual(list(self.runtime.environments), ["pycdn_mem_a"])
+    
+    def test_recently_used_package_kept(self):
+        """Test using a package moves it to the back of the eviction order."""
+        self.runtime.memory_budget = None
+        self._call("pycdn_mem_a")
+        self._call("pycdn_mem_b")
+        self._call("pycdn_mem_a")
+        
+        self.runtime.memory_budget = 30 * 1024 * 1024
+        self.assertEqual(self.runtime.enforce_memory_budget(), ["pycdn_mem_b"])
+    
+    def test_busy_package_not_evicted(self):
+        """Test an environment with a call in progress is skipped."""
+        self._call("pycdn_mem_a")
+        with self.runtime.checkout("pycdn_mem_a"):
+            self._call("pycdn_mem_b")
+            self.assertEqual(set(self.runtime.environments), {"pycdn_mem_a", "pycdn_mem_b"})
+        
+        # Once the call finishes the budget is applied again
+        self.assertEqual(list(self.runtime.environments), ["pycdn_mem_b"])
+    
+    def test_concurrent_first_imports_owned_separately(self):
+        """Test packages imported at the same time are each charged only their own modules."""
+        package = os.path.join(self.tempdir, "pycdn_mem_slow")
+        os.makedirs(package)
+        with open(os.path.join(package, "__init__.py"), "w") as f:
+            f.write("import time\ntime.sleep(0.3)\n")
+        slow = self.runtime.get_environment("pycdn_mem_slow")
+        loader = threading.Thread(target=slow.load_package)
+        loader.start()
+        time.sleep(0.05)
+        self.runtime.get_environment("pycdn_mem_b").load_package()
+        loader.join()
+
+        self.assertEqual(slow.owned_modules, {"pycdn_mem_slow"})
+        self.assertEqual(self.runtime.environments["pycdn_mem_b"].owned_modules,
+                         {"pycdn_mem_b", "pycdn_mem_b.helpers"})
+
+    def test_clear_cache_waits_for_calls(self):
+        """Test clearing a busy environment drops it only after its last call."""
+        self._call("pycdn_mem_a")
+        with self.runtime.checkout("pycdn_mem_a"):
+            self.runtime.clear_cache()
+            self.assertIn("pycdn_mem_a", self.runtime.environments)
+            self.assertIn("pycdn_mem_a.helpers", sys.modules)
+
+        self.assertNotIn("pycdn_mem_a", self.runtime.environments)
+        self.assertNotIn("pycdn_mem_a.helpers", sys.modules)
+
+    def test_referenced_modules_stay_loaded(self):
+        """Test modules still used elsewhere are not removed from sys.modules."""
+        import types
+        self._call("pycdn_mem_a")
+        holder = types.ModuleType("pycdn_mem_holder")
+        holder.size = sys.modules["pycdn_mem_a.helpers"].size
+        sys.modules["pycdn_mem_holder"] = holder
+        
+        self.runtime.clear_cache("pycdn_mem_a")
+        
+        self.assertNotIn("pycdn_mem_a", self.runtime.environments)
+        self.assertIn("pycdn_mem_a", sys.modules)
+        self.assertEqual(self.runtime.get_memory_stats()["pinned_evictions"], 1)
+        
+        # Loading again finds the modules in place but keeps their charge
+        self.runtime.memory_budget = None
+        self._call("pycdn_mem_a")
+        self.assertGreater(self.runtime.environments["pycdn_mem_a"].memory_estimate(),
+                           15 * 1024 * 1024)
+    
+    def test_pinned_package_not_evicted(self):
+        """Test over budget, packages that cannot be unloaded stay and stay charged."""
+        import types
+        self._call("pycdn_mem_a")
+        holder = types.ModuleType("pycdn_mem_holder")
+        holder.size = sys.modules["pycdn_mem_a.helpers"].size
+        sys.modules["pycdn_mem_holder"] = holder
+        
+        self._call("pycdn_mem_b")
+        
+        self.assertEqual(list(self.runtime.environments), ["pycdn_mem_a", "pycdn_mem_b"])
+        self.assertIn("pycdn_mem_a", sys.modules)
+        stats = self.runtime.get_memory_stats()
+        self.assertEqual((stats["evictions"], stats["bytes_evicted"]), (0, 0))
+        self.assertEqual(stats["pinned_skips"], 1)
+        self.assertTrue(stats["packages"][0]["pinned"])
+        self.assertGreater(stats["memory_used"], self.runtime.memory_budget)
+        
+        # Pinned environments are not checked again on every call
+        self._call("pycdn_mem_b")
+        self.assertEqual(self.runtime.get_memory_stats()["pinned_skips"], 1)
+    
+    def test_eviction_scan_runs_without_runtime_lock(self):
+        """Test the module reference scan does not block other requests."""
+        from pycdn.server import memory
+        self._call("pycdn_mem_a")
+        acquired = []
+        original = memory._referenced_from_outside
+        
+        def try_lock():
+            if self.runtime._lock.acquire(timeout=1):
+                self.runtime._lock.release()
+                acquired.append(True)
+            else:
+                acquired.append(False)
+        
+        def scan(names):
+            # Another request's checkout must not have to wait for the scan
+            thread = threading.Thread(target=try_lock)
+            thread.start()
+            thread.join()
+            return original(names)
+        
+        with patch.object(memory, "_referenced_from_outside", side_effect=scan):
+            self._call("pycdn_mem_b")
+        
+        self.assertEqual(acquired, [True])
+        self.assertEqual(list(self.runtime.environments), ["pycdn_mem_b"])
+    
+    def test_memory_stats_endpoint(self):
+        """Test the server takes a size string and reports usage."""
+        from fastapi.testclient import TestClient
+        server = CDNServer(memory_budget="30MB")
+        client = TestClient(server.app)
+        client.post("/execute", json={
+            "package_name": "pycdn_mem_a", "function_name": "helpers.size",
+            **serialize_args("abc")
+        })
+        
+        stats = client.get("/stats/memory").json()
+        self.assertEqual(stats["memory_budget"], 30 * 1024 * 1024)
+        self.assertEqual(stats["packages"][0]["package_name"], "pycdn_mem_a")
+        self.assertEqual(stats["memory_used"], stats["packages"][0]["bytes"])
+    
+    def test_standard_library_not_charged(self):
+        """Test packages already loaded or from the standard library are never unloaded."""
+        self.runtime.execute_remote_function("math", "sqrt", serialize_args(4))
+        self.assertEqual(self.runtime.environments["math"].owned_modules, set())
+        self.runtime.clear_cache()
+        self.assertIn("math", sys.modules)
+
+
 class TestExecutionEnvironment(unittest.TestCase):
     """Test cases for ExecutionEnvironment class."""
     
@@ -205,10 +399,30 @@ class TestCDNServer(unittest.TestCase):
     def test_get_allowed_packages(self):
         """Test getting allowed packages."""
         packages = self.server.get_allowed_packages()
-        
+
         self.assertIsInstance(packages, set)
         self.assertEqual(packages, {"math", "json"})
 
+    @patch('pycdn.server.core.uvicorn.run')
+    def test_run_passes_keepalive_timeout(self, mock_run):
+        """Test uvicorn receives the keep-alive timeout."""
+        server = CDNServer(keepalive_timeout=42.0)
+        server.run()
+
+        kwargs = mock_run.call_args[1]
+        self.assertEqual(kwargs["timeout_keep_alive"], 42.0)
+
+    def test_run_http2_uses_hypercorn(self):
+        """Test HTTP/2 serving goes through hypercorn instead of uvicorn."""
+        server = CDNServer(http2=True)
+
+        with patch.object(CDNServer, '_serve_http2', new=AsyncMock()) as mock_serve, \
+                patch('pycdn.server.core.uvicorn.run') as mock_run:
+            server.run()
+
+        mock_serve.assert_awaited_once()
+        mock_run.assert_not_called()
+
 
 class TestPackageDeployer(unittest.TestCase):
     """Test cases for PackageDeployer class."""
@@ -337,6 +551,69 @@ class TestServerAPI(unittest.TestCase):
         data = response.json()
         self.assertTrue(data["success"])
     
+    def test_execute_endpoint_frames(self):
+        """Test /execute takes a CALL frame and answers with a RESULT frame when accepted."""
+        import base64
+        from fastapi.testclient import TestClient
+        from pycdn.utils.common import deserialize_result
+        from pycdn.utils.wire import CALL, FRAME_CONTENT_TYPE, RESULT, binary_fields, \
+            decode_frame, encode_frame
+
+        client = TestClient(CDNServer().app)
+        data = bytes(range(256)) * 512
+        body = encode_frame(CALL, 0, {"package_name": "base64", "function_name": "b64encode",
+                                      **binary_fields(serialize_args(data))})
+        response = client.post("/execute", content=body,
+                               headers={"Content-Type": FRAME_CONTENT_TYPE,
+                                        "Accept": FRAME_CONTENT_TYPE})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], FRAME_CONTENT_TYPE)
+        frame = decode_frame(response.content)
+        self.assertEqual(frame.kind, RESULT)
+        self.assertIsInstance(frame.fields["result"], bytes)
+        self.assertEqual(deserialize_result(frame.fields), base64.b64encode(data))
+        self.assertLess(len(response.content), len(base64.b64encode(data)) * 1.01)
+
+        # Same call without the Accept header gets the JSON envelope
+        response = client.post("/execute", content=body,
+                               headers={"Content-Type": FRAME_CONTENT_TYPE})
+        self.assertEqual(deserialize_result(response.json()), base64.b64encode(data))
+
+    def test_execute_endpoint_type_codecs(self):
+        """Test /execute tags results only with the codecs the client announces."""
+        from fastapi.testclient import TestClient
+        from pycdn.utils.common import deserialize_result
+        from pycdn.utils.type_codecs import CODECS_HEADER
+
+        client = TestClient(CDNServer().app)
+        body = {"package_name": "datetime", "function_name": "date.fromordinal",
+                **serialize_args(738000)}
+        expected = __import__("datetime").date.fromordinal(738000)
+
+        response = client.post("/execute", json=body, headers={CODECS_HEADER: "date, decimal"})
+        self.assertEqual(deserialize_result(response.json()), expected)
+
+        response = client.post("/execute", json=body)
+        self.assertEqual(deserialize_result(response.json()), str(expected))
+
+    def test_execute_endpoint_bad_bodies(self):
+        """Test malformed frames and JSON are rejected before execution."""
+        from pycdn.utils.wire import CALL, FRAME_CONTENT_TYPE, encode_frame
+
+        headers = {"Content-Type": FRAME_CONTENT_TYPE}
+        truncated = self.client.post("/execute", content=b"\x01\x00", headers=headers)
+        incomplete = self.client.post("/execute", headers=headers,
+                                      content=encode_frame(CALL, 0, {"package_name": "math"}))
+        invalid = self.client.post("/execute", json={"package_name": "math"})
+        garbage = self.client.post("/execute", content=b"{not json",
+                                   headers={"Content-Type": "application/json"})
+
+        self.assertEqual(truncated.status_code, 400)
+        self.assertEqual(incomplete.status_code, 400)
+        self.assertEqual(invalid.status_code, 422)
+        self.assertEqual(garbage.status_code, 422)
+
     def test_execute_endpoint_forbidden_package(self):
         """Test execution with forbidden package."""
         request_data = {
@@ -403,6 +680,636 @@ class TestServerAPI(unittest.TestCase):
         data = response.json()
         self.assertIn("message", data)
 
+    def test_credentials_endpoint(self):
+        """Test registering and revoking a credential handle."""
+        from pycdn.utils.encryption import get_global_encryption
+
+        secret = get_global_encryption().encrypt_data("sk-test")
+        response = self.client.post("/credentials", json={"secret": secret, "ttl": 60})
+
+        self.assertEqual(response.status_code, 200)
+        handle = response.json()["handle"]
+        self.assertEqual(response.json()["expires_in"], 60)
+        self.assertEqual(self.server.runtime.credentials.resolve(handle), "sk-test")
+
+        self.assertEqual(self.client.delete(f"/credentials/{handle}").status_code, 200)
+        self.assertEqual(self.client.delete(f"/credentials/{handle}").status_code, 404)
+
+    def test_credentials_endpoint_conflict(self):
+        """Test a proposed handle cannot be rebound to another secret."""
+        handle = "h" * 40
+        first = self.client.post("/credentials", json={"secret": "one", "handle": handle})
+        again = self.client.post("/credentials", json={"secret": "one", "handle": handle})
+        other = self.client.post("/credentials", json={"secret": "two", "handle": handle})
+        short = self.client.post("/credentials", json={"secret": "two", "handle": "short"})
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(other.status_code, 409)
+        self.assertEqual(short.status_code, 400)
+
+
+class TestOutputStreaming(unittest.TestCase):
+    """Test cases for incremental WebSocket output."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        from fastapi.testclient import TestClient
+        self.server = CDNServer(stream_flush_interval=0.01)
+        self.client = TestClient(self.server.app)
+
+    def _stream(self, message):
+        with self.client.websocket_connect("/stream/builtins") as websocket:
+            self.assertEqual(websocket.receive_json()["type"], "connected")
+            websocket.send_json(message)
+            received = []
+            while True:
+                data = websocket.receive_json()
+                received.append(data)
+                if data["type"] in ("result", "error"):
+                    return received
+
+    def test_output_arrives_before_result(self):
+        """Test output is forwarded while the function is still running."""
+        code = "import time\nprint('first')\ntime.sleep(0.3)\nprint('second')"
+        received = self._stream({
+            "type": "execute", "package": "builtins", "function": "exec",
+            "serialized_args": serialize_args(code)
+        })
+
+        types = [m["type"] for m in received]
+        self.assertEqual(types[0], "execution_start")
+        self.assertEqual(types[-1], "result")
+        self.assertTrue(received[-1]["success"])
+        stdout = [m["data"] for m in received if m["type"] == "stdout"]
+        self.assertEqual(stdout, ["first\n", "second\n"])
+
+    def test_writes_coalesced_into_bounded_chunks(self):
+        """Test many small writes become a few messages of at most chunk_size."""
+        from pycdn.server.streaming import DEFAULT_CHUNK_SIZE
+
+        code = "for i in range(5000): print('x' * 9)"
+        received = self._stream({
+            "type": "execute", "package": "builtins", "function": "exec",
+            "serialized_args": serialize_args(code)
+        })
+
+        chunks = [m["data"] for m in received if m["type"] == "stdout"]
+        self.assertEqual("".join(chunks), ("x" * 9 + "\n") * 5000)
+        self.assertLess(len(chunks), 100)
+        self.assertTrue(all(len(c) <= DEFAULT_CHUNK_SIZE for c in chunks))
+
+    def test_legacy_raw_arguments(self):
+        """Test JSON args/kwargs messages still execute."""
+        received = self._stream({
+            "type": "execute", "package": "builtins", "function": "max", "args": [3, 7]
+        })
+        self.assertEqual(received[-1]["type"], "result")
+
+    def test_writer_blocks_when_buffer_full(self):
+        """Test the worker waits for the pump instead of growing the buffer."""
+        from pycdn.server.streaming import OutputChannel
+
+        async def scenario():
+            channel = OutputChannel(asyncio.get_running_loop(), max_buffer=10)
+            done = []
+
+            def worker():
+                channel.write("stdout", "a" * 10)
+                channel.write("stdout", "b" * 10)
+                done.append(True)
+
+            thread = threading.Thread(target=worker)
+            thread.start()
+            await asyncio.sleep(0.1)
+            self.assertEqual(done, [])
+            first = channel.take()
+            await asyncio.get_running_loop().run_in_executor(None, thread.join, 1)
+            return first, channel.take(), done
+
+        first, second, done = asyncio.run(scenario())
+        self.assertEqual(first, [("stdout", "a" * 10)])
+        self.assertEqual(second, [("stdout", "b" * 10)])
+        self.assertEqual(done, [True])
+
+
+class TestOutputCapture(unittest.TestCase):
+    """Test cases for per-request output capture."""
+
+    def test_concurrent_captures_isolated(self):
+        """Test threads printing at the same time each see only their own output."""
+        from pycdn.server.capture import OutputBuffer, capture_output
+
+        barrier = threading.Barrier(4)
+        buffers = {}
+
+        def worker(n):
+            with capture_output(OutputBuffer()) as output:
+                barrier.wait()
+                for _ in range(50):
+                    print(f"worker-{n}")
+                print(f"err-{n}", file=sys.stderr)
+            buffers[n] = output
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for n, output in buffers.items():
+            self.assertEqual(output.getvalue("stdout"), f"worker-{n}\n" * 50)
+            self.assertEqual(output.getvalue("stderr"), f"err-{n}\n")
+
+    def test_buffer_is_bounded(self):
+        """Test output beyond the limit is counted and dropped."""
+        from pycdn.server.capture import OutputBuffer
+
+        output = OutputBuffer(limit=10)
+        output.write("stdout", "a" * 8)
+        output.write("stdout", "b" * 8)
+
+        self.assertEqual(output.dropped["stdout"], 6)
+        self.assertTrue(output.getvalue("stdout").startswith("a" * 8 + "bb\n"))
+        self.assertIsNone(output.getvalue("stderr"))
+
+    def test_execute_endpoint_returns_output(self):
+        """Test /execute fills stdout/stderr from what the call printed."""
+        from fastapi.testclient import TestClient
+
+        client = TestClient(CDNServer().app)
+        serialized = serialize_args("print('hello')\nimport sys\nprint('oops', file=sys.stderr)")
+        response = client.post("/execute", json={
+            "package_name": "builtins", "function_name": "exec", **serialized
+        })
+
+        data = response.json()
+        self.assertTrue(data["success"])
+        self.assertEqual(data["stdout"], "hello\n")
+        self.assertEqual(data["stderr"], "oops\n")
+
+        quiet = TestClient(CDNServer(capture_output=False).app)
+        self.assertIsNone(quiet.post("/execute", json={
+            "package_name": "builtins", "function_name": "exec",
+            **serialize_args("pass")
+        }).json()["stdout"])
+
+
+class FakeSocket:
+    """Minimal WebSocket stand-in for fan-out tests."""
+
+    def __init__(self, gate=None, fail=False):
+        self.gate = gate
+        self.fail = fail
+        self.received = []
+        self.close_code = None
+
+    async def send_text(self, text):
+        if self.fail:
+            raise ConnectionResetError("peer gone")
+        if self.gate is not None:
+            await self.gate.wait()
+        self.received.append(json.loads(text))
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+class TestFanoutHub(unittest.TestCase):
+    """Test cases for the WebSocket fan-out hub."""
+
+    def test_slow_subscriber_does_not_block_others(self):
+        """Test a stalled socket leaves the other subscribers unaffected."""
+        from pycdn.server.fanout import FanoutHub
+
+        async def scenario():
+            hub = FanoutHub(max_queue=4)
+            gate = asyncio.Event()
+            slow, fast = FakeSocket(gate=gate), FakeSocket()
+            subscribers = [hub.subscribe("pkg", slow), hub.subscribe("pkg", fast)]
+            for i in range(10):
+                hub.publish("pkg", {"n": i})
+                await asyncio.sleep(0)
+            await asyncio.sleep(0.01)
+            gate.set()
+            await asyncio.sleep(0.01)
+            for subscriber in subscribers:
+                await hub.unsubscribe(subscriber)
+            return hub, slow, fast
+
+        hub, slow, fast = asyncio.run(scenario())
+        self.assertEqual([m["n"] for m in fast.received], list(range(10)))
+        # One message in flight plus the newest four queued
+        self.assertEqual([m["n"] for m in slow.received], [0, 6, 7, 8, 9])
+        self.assertEqual(hub.metrics()["dropped"], 5)
+        self.assertEqual(hub.metrics()["subscribers"], 0)
+
+    def test_disconnect_policy(self):
+        """Test a subscriber that falls behind is closed and removed."""
+        from pycdn.server.fanout import FanoutHub, CLOSE_TRY_AGAIN_LATER
+
+        async def scenario():
+            hub = FanoutHub(max_queue=1, overflow="disconnect")
+            slow = FakeSocket(gate=asyncio.Event())
+            hub.subscribe("pkg", slow)
+            for i in range(3):
+                hub.publish("pkg", {"n": i})
+                await asyncio.sleep(0)
+            await asyncio.sleep(0.01)
+            return hub, slow
+
+        hub, slow = asyncio.run(scenario())
+        self.assertEqual(slow.close_code, CLOSE_TRY_AGAIN_LATER)
+        self.assertEqual(hub.subscriber_count("pkg"), 0)
+        self.assertEqual(hub.metrics()["disconnected"], 1)
+
+    def test_failed_send_removes_subscriber(self):
+        """Test a broken socket is dropped and counted instead of silently ignored."""
+        from pycdn.server.fanout import FanoutHub
+
+        async def scenario():
+            hub = FanoutHub()
+            hub.subscribe("pkg", FakeSocket(fail=True))
+            hub.publish("pkg", {"n": 1})
+            await asyncio.sleep(0.01)
+            return hub
+
+        hub = asyncio.run(scenario())
+        self.assertEqual(hub.subscriber_count(), 0)
+        self.assertEqual(hub.metrics()["send_failures"], 1)
+
+    def test_invalid_policy(self):
+        """Test unknown overflow policies are rejected."""
+        from pycdn.server.fanout import FanoutHub
+
+        with self.assertRaises(ValueError):
+            FanoutHub(overflow="block")
+
+    def test_execute_output_reaches_monitors(self):
+        """Test /execute output is published to /stream subscribers of the package."""
+        from fastapi.testclient import TestClient
+
+        client = TestClient(CDNServer().app)
+        with client.websocket_connect("/stream/builtins") as monitor:
+            self.assertEqual(monitor.receive_json()["type"], "connected")
+            client.post("/execute", json={
+                "package_name": "builtins", "function_name": "exec",
+                **serialize_args("print('to monitors')")
+            })
+            self.assertEqual(monitor.receive_json(), {"type": "stdout", "data": "to monitors\n"})
+            stats = client.get("/stats/fanout").json()
+
+        self.assertEqual(stats["subscribers"], 1)
+        self.assertEqual(stats["delivered"], 1)
+
+
+@unittest.skipUnless(os.name == "posix", "interactive sessions need a pseudo-terminal")
+class TestCompression(unittest.TestCase):
+    """Test cases for Content-Encoding negotiation."""
+
+    def setUp(self):
+        """Connect a test client to a server with a small request size limit."""
+        from fastapi.testclient import TestClient
+
+        self.server = CDNServer(max_message_size=1024 * 1024)
+        self.client = TestClient(self.server.app)
+
+    def test_responses_compressed_above_threshold(self):
+        """Test large responses use the negotiated encoding and small ones are left alone."""
+        from pycdn.utils import compression
+
+        records = [{"__type__": "ChatCompletion", "__module__": "openai.types", "index": i}
+                   for i in range(200)]
+        request = {"package_name": "json", "function_name": "loads",
+                   **serialize_args(json.dumps(records))}
+        for encoding in compression.supported_encodings():
+            response = self.client.post("/execute", json=request,
+                                        headers={"Accept-Encoding": encoding})
+            self.assertEqual(response.headers["content-encoding"], encoding)
+            self.assertIn("Accept-Encoding", response.headers["vary"])
+            self.assertEqual(response.json()["success"], True)
+            self.assertLess(response.num_bytes_downloaded * 5, len(response.content))
+
+        small = self.client.get("/health", headers={"Accept-Encoding": "gzip"})
+        identity = self.client.post("/execute", json=request, headers={"Accept-Encoding": "identity"})
+        self.assertNotIn("content-encoding", small.headers)
+        self.assertNotIn("content-encoding", identity.headers)
+
+        stats = self.client.get("/stats/compression").json()["responses"]
+        self.assertEqual(stats["compressed"], len(compression.supported_encodings()))
+        self.assertGreater(stats["ratio"], 5)
+        self.assertGreater(stats["cpu_seconds"], 0)
+
+    def test_compressed_requests(self):
+        """Test encoded request bodies are decoded, and bad ones rejected."""
+        from pycdn.utils.compression import compress
+
+        body = json.dumps({"package_name": "math", "function_name": "fsum",
+                           **serialize_args([0.5] * 2000)}).encode()
+        response = self.client.post("/execute", content=compress(body, "gzip"),
+                                    headers={"Content-Encoding": "gzip",
+                                             "Content-Type": "application/json"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.json()["result"]), 1000.0)
+
+        bomb = compress(b"0" * (2 * 1024 * 1024), "gzip")
+        for content, encoding, status in [(body, "br", 415), (b"not gzip", "gzip", 400),
+                                          (bomb, "gzip", 413)]:
+            response = self.client.post("/execute", content=content,
+                                        headers={"Content-Encoding": encoding})
+            self.assertEqual(response.status_code, status)
+
+        stats = self.client.get("/stats/compression").json()["requests"]
+        self.assertEqual(stats["compressed"], 1)
+        self.assertEqual(stats["bytes_uncompressed"], len(body))
+
+    def test_streamed_response_chunks_decodable(self):
+        """Test chunked responses are compressed chunk by chunk, each decodable on arrival."""
+        import zlib
+        from pycdn.server.middleware import CompressionMiddleware
+        from pycdn.utils.compression import CompressionStats
+
+        lines = [json.dumps({"__type__": "Event", "n": i}).encode() * 20 for i in range(3)]
+
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            for line in lines:
+                await send({"type": "http.response.body", "body": line, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+
+        stats = CompressionStats()
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        middleware = CompressionMiddleware(app, threshold=1024, response_stats=stats)
+        scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+        asyncio.run(middleware(scope, receive, send))
+
+        headers = dict(sent[0]["headers"])
+        self.assertEqual(headers[b"content-encoding"], b"gzip")
+        self.assertNotIn(b"content-length", headers)
+        decoder = zlib.decompressobj(31)
+        for line, message in zip(lines, sent[1:]):
+            self.assertTrue(message["more_body"])
+            self.assertEqual(decoder.decompress(message["body"]), line)
+        self.assertFalse(sent[-1]["more_body"])
+        decoder.decompress(sent[-1]["body"])
+        self.assertTrue(decoder.eof)
+        self.assertEqual(stats.snapshot()["bytes_uncompressed"], sum(map(len, lines)))
+
+    def test_incompressible_sent_raw(self):
+        """Test bodies that barely shrink are sent uncompressed."""
+        from pycdn.utils.compression import compress_if_smaller
+
+        noise = os.urandom(512 * 1024)
+        self.assertIsNone(compress_if_smaller(noise, "gzip"))
+        self.assertIsNotNone(compress_if_smaller(b"abc" * 100000, "gzip"))
+
+
+class TestResultSpilling(unittest.TestCase):
+    """Test cases for spilling large results to disk and serving them in ranges."""
+
+    def setUp(self):
+        """Connect a test client that accepts chunked transfers to a low-threshold server."""
+        from fastapi.testclient import TestClient
+        from pycdn.utils.transfer import CHUNKED, TRANSFER_HEADER
+
+        self.server = CDNServer(spill_threshold=256 * 1024, spill_chunk_size=100000)
+        self.client = TestClient(self.server.app)
+        self.headers = {TRANSFER_HEADER: CHUNKED}
+        self.request = {"package_name": "os", "function_name": "urandom", **serialize_args(300000)}
+
+    def test_large_results_spilled(self):
+        """Test large results come back as a transfer descriptor downloadable in checksummed ranges."""
+        import hashlib
+        from pycdn.utils.common import deserialize_result
+
+        envelope = self.client.post("/execute", json=self.request, headers=self.headers).json()
+        self.assertEqual(envelope["serialization_method"], "spilled")
+        self.assertIsNone(envelope["result"])
+        transfer = envelope["transfer"]
+        self.assertEqual(len(transfer["checksums"]), -(-transfer["size"] // 100000))
+
+        url = f"/results/{transfer['id']}"
+        chunks = []
+        for index, checksum in enumerate(transfer["checksums"]):
+            start = index * 100000
+            end = min(start + 100000, transfer["size"]) - 1
+            response = self.client.get(url, headers={"Range": f"bytes={start}-{end}",
+                                                     "Accept-Encoding": "gzip"})
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response.headers["content-range"],
+                             f"bytes {start}-{end}/{transfer['size']}")
+            self.assertNotIn("content-encoding", response.headers)
+            self.assertEqual(hashlib.sha256(response.content).hexdigest(), checksum)
+            chunks.append(response.content)
+
+        whole = self.client.get(url)
+        self.assertEqual(whole.status_code, 200)
+        self.assertTrue(whole.content == b"".join(chunks))
+        self.assertEqual(self.client.get(url, headers={"Range": "bytes=-10"}).content, chunks[-1][-10:])
+        self.assertEqual(self.client.get(url, headers={"Range": f"bytes={transfer['size']}-"}).status_code, 416)
+
+        self.assertTrue(self.client.delete(url).json()["deleted"])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(os.listdir(self.server.results.directory), [])
+
+        stats = self.client.get("/stats/results").json()
+        self.assertEqual((stats["spilled"], stats["bytes_spilled"]), (1, transfer["size"]))
+
+    def test_small_results_and_old_clients_inline(self):
+        """Test results stay inline below the threshold or when the client does not announce support."""
+        from pycdn.utils.common import deserialize_result
+
+        inline = self.client.post("/execute", json=self.request).json()
+        self.assertEqual(inline["serialization_method"], "cloudpickle")
+        self.assertEqual(len(deserialize_result(inline)), 300000)
+
+        small = {"package_name": "os", "function_name": "urandom", **serialize_args(1000)}
+        response = self.client.post("/execute", json=small, headers=self.headers).json()
+        self.assertNotEqual(response["serialization_method"], "spilled")
+        self.assertEqual(self.server.results.stats["spilled"], 0)
+
+    def test_expired_results_removed(self):
+        """Test spilled results are deleted once their TTL passes."""
+        from pycdn.server.results import ResultStore
+        from pycdn.utils.transfer import SPILLED
+
+        store = ResultStore(threshold=10, chunk_size=4, ttl=0.0)
+        envelope = store.spill(serialize_result("x" * 100))
+        self.assertEqual(envelope["serialization_method"], SPILLED)
+        store.spill(serialize_result("y" * 100))
+        self.assertEqual(len(os.listdir(store.directory)), 1)
+        with self.assertRaises(KeyError):
+            store.open_range(envelope["transfer"]["id"], None)
+
+
+class TestInteractiveSessions(unittest.TestCase):
+    """Test cases for persistent interactive shell sessions."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        from fastapi.testclient import TestClient
+        self.server = CDNServer()
+        self.client = TestClient(self.server.app)
+
+    def _run(self, websocket, command):
+        websocket.send_json({"type": "command", "command": command})
+        output = ""
+        while True:
+            message = websocket.receive_json()
+            if message["type"] == "stdout":
+                output += message["data"]
+            else:
+                return output, message
+
+    def test_state_persists_between_commands(self):
+        """Test commands share one shell, so directory and variables carry over."""
+        with self.client as client, client.websocket_connect("/interactive/os") as websocket:
+            start = websocket.receive_json()
+            self.assertEqual(start["type"], "session_start")
+            self.assertFalse(start["resumed"])
+
+            self.assertEqual(self._run(websocket, "cd /tmp && greeting=hello"),
+                             ("", {"type": "command_complete", "return_code": 0}))
+            output, done = self._run(websocket, "echo $greeting from $(pwd); false")
+
+        self.assertEqual(output, "hello from /tmp\n")
+        self.assertEqual(done["return_code"], 1)
+
+    def test_input_forwarding(self):
+        """Test input frames reach a program reading its stdin."""
+        with self.client as client, client.websocket_connect("/interactive/os") as websocket:
+            websocket.receive_json()
+            websocket.send_json({"type": "command", "command": "read name; echo hello $name"})
+            websocket.send_json({"type": "input", "data": "world\n"})
+            self.assertEqual(websocket.receive_json(), {"type": "stdout", "data": "hello world\n"})
+            self.assertEqual(websocket.receive_json()["type"], "command_complete")
+
+            # A second command while one is running is refused, not fed to it as input
+            websocket.send_json({"type": "command", "command": "sleep 30"})
+            websocket.send_json({"type": "command", "command": "echo too soon"})
+            self.assertEqual(websocket.receive_json()["type"], "error")
+            websocket.send_json({"type": "interrupt"})
+            self.assertEqual(websocket.receive_json()["return_code"], 130)
+
+    def test_resume_session(self):
+        """Test a session outlives its socket and can be re-attached by ID."""
+        with self.client as client:
+            with client.websocket_connect("/interactive/os") as websocket:
+                session_id = websocket.receive_json()["session_id"]
+                self._run(websocket, "counter=41")
+
+            with client.websocket_connect(f"/interactive/os?session_id={session_id}") as websocket:
+                start = websocket.receive_json()
+                output, _ = self._run(websocket, "echo $((counter + 1))")
+
+            self.assertEqual(client.get("/stats/sessions").json()["sessions"], 1)
+
+        self.assertEqual(start["session_id"], session_id)
+        self.assertTrue(start["resumed"])
+        self.assertEqual(output, "42\n")
+        # Server shutdown closes the shells
+        self.assertEqual(self.server.sessions.sessions, {})
+
+    def test_exit_ends_session(self):
+        """Test the shell exiting is reported and the session forgotten."""
+        with self.client as client, client.websocket_connect("/interactive/os") as websocket:
+            websocket.receive_json()
+            _, done = self._run(websocket, "exit 7")
+            self.assertEqual(done, {"type": "session_end", "return_code": 7})
+            self.assertEqual(client.get("/stats/sessions").json()["sessions"], 0)
+
+    def test_idle_sessions_reaped(self):
+        """Test detached sessions past the idle timeout are closed."""
+        from pycdn.server.sessions import SessionManager
+
+        async def scenario():
+            manager = SessionManager(idle_timeout=60)
+            session, _ = await manager.open("os")
+            self.assertEqual(await manager.reap(), 0)
+            session.last_active -= 61
+            self.assertEqual(await manager.reap(), 1)
+            return session
+
+        session = asyncio.run(scenario())
+        self.assertTrue(session.closed)
+        self.assertIsNotNone(session.process.returncode)
+
+    def test_output_backpressure(self):
+        """Test a full output queue pauses reading until the client drains it."""
+        from pycdn.server.sessions import SessionManager
+
+        async def scenario():
+            manager = SessionManager(max_pending=4)
+            session, _ = await manager.open("os")
+            session.run_command("head -c 2000000 /dev/zero | tr '\\0' x")
+            await asyncio.sleep(0.5)
+            paused, queued = session.paused, session._events.qsize()
+
+            received = 0
+            while True:
+                kind, value = await session.next_event()
+                if kind != "stdout":
+                    break
+                received += len(value)
+            await manager.close_all()
+            return paused, queued, received, value
+
+        paused, queued, received, status = asyncio.run(scenario())
+        self.assertTrue(paused)
+        self.assertLessEqual(queued, 8)
+        self.assertEqual(received, 2000000)
+        self.assertEqual(status, 0)
+
+
+class TestCredentialStore(unittest.TestCase):
+    """Test cases for the server-side credential store."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        from pycdn.server.credentials import CredentialStore
+        self.store = CredentialStore(default_ttl=60)
+
+    def test_resolve_arguments(self):
+        """Test handles are replaced anywhere in call arguments."""
+        handle, _ = self.store.register("sk-secret")
+        marker = {"__pycdn_credential__": handle}
+
+        args, kwargs = self.store.resolve_arguments(
+            ({"init_kwargs": {"api_key": marker}},), {"token": marker, "n": 1}
+        )
+
+        self.assertEqual(args[0]["init_kwargs"]["api_key"], "sk-secret")
+        self.assertEqual(kwargs, {"token": "sk-secret", "n": 1})
+
+    def test_expired_handle(self):
+        """Test expired or unknown handles raise CredentialExpiredError."""
+        from pycdn.server.credentials import CredentialExpiredError
+
+        handle, _ = self.store.register("sk-secret", ttl=0.01)
+        time.sleep(0.02)
+
+        with self.assertRaises(CredentialExpiredError):
+            self.store.resolve(handle)
+        with self.assertRaises(CredentialExpiredError):
+            self.store.resolve_arguments((), {"api_key": {"__pycdn_credential__": "unknown"}})
+
+    def test_runtime_reports_expired_handle(self):
+        """Test execution with a stale handle returns a typed error."""
+        runtime = PackageRuntime()
+        serialized = serialize_args(key={"__pycdn_credential__": "missing"})
+
+        result = runtime.execute_remote_function("os", "getenv", serialized)
+
+        self.assertFalse(result["success"])
+        self.assertEqual(result["error_type"], "CredentialExpiredError")
+
 
 if __name__ == "__main__":
     # Run tests with verbose output